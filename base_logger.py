@@ -1,6 +1,13 @@
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import sys
+import json
+import queue
+import time
+import atexit
+import threading
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 import shutil
 from colorama import Fore, Style, init as colorama_init
@@ -14,9 +21,20 @@ os.makedirs(log_dir, exist_ok=True)
 # Formatter config
 log_format = '%(levelname)s: %(asctime)s | %(name)s | %(funcName)s:%(lineno)d %(connector)s %(message)s'
 date_format = '%Y-%m-%dT%H:%M:%S %z'
+# "text" or "json"
+LOG_OUTPUT_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+DEFAULT_LOG_LEVEL = logging.INFO
 
+# Rotated files are gzipped here so neither the listener thread nor a request ever waits on compression
+_compression_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
 
-class ColoredFormatter(logging.Formatter):
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, fmt=log_format, datefmt=date_format):
+        super().__init__(fmt=fmt, datefmt=datefmt, defaults={"connector": "->"})
+
+
+class ColoredFormatter(TextFormatter):
     COLORS = {
         "DEBUG": Fore.CYAN,
         "INFO": Fore.GREEN,
@@ -26,15 +44,67 @@ class ColoredFormatter(logging.Formatter):
     }
 
     def format(self, record):
+        # Color a copy; the same record is also written to the log file by another handler
+        record = logging.makeLogRecord(record.__dict__)
         color = self.COLORS.get(record.levelname, "")
         reset = Style.RESET_ALL
         record.levelname = f"{color}{record.levelname}{reset}"
         record.name = f"{Fore.GREEN}{record.name}{reset}"
-        record.msg = f"{Fore.YELLOW + Style.BRIGHT}{record.msg}{reset}"
+        record.msg = f"{Fore.YELLOW + Style.BRIGHT}{record.getMessage()}{reset}"
+        record.args = None
         record.connector = f"{Fore.YELLOW + Style.BRIGHT}->{reset}"
         return super().format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record, date_format),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `burst` records per call site through every `interval` seconds.
+
+    Records are counted per (file, line), so one noisy statement cannot starve the rest of the logger. The next record
+    emitted from a throttled call site reports how many were dropped. Filtering runs before the message is formatted.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: dict[tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+
 def compress_old_log(source_path):
     gz_path = f"{source_path}.gz"
     with open(source_path, 'rb') as src_file:
@@ -44,38 +114,76 @@ def compress_old_log(source_path):
     return gz_path
 
 
+def rotate_and_compress(source, dest):
+    os.rename(source, dest)
+    _compression_executor.submit(compress_old_log, dest)
+
+
+# Lock files of the claimed log slot, kept open for the life of the process
+_log_slot_locks = []
+
+
+def log_file_name() -> str:
+    """
+    TimedRotatingFileHandler is not safe across processes, so with several workers each process writes its own
+    app-{slot}.log. Slots are claimed with an exclusive lock, so a restarted worker reuses a free slot instead of
+    starting a new file.
+    """
+    if os.getenv("WORKERS", "1").strip().lower() == "1":
+        return "app.log"
+    try:
+        import fcntl
+    except ImportError:
+        return f"app-{os.getpid()}.log"
+    slot = 0
+    while True:
+        lock_file = open(os.path.join(log_dir, f"app-{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            slot += 1
+            continue
+        _log_slot_locks.append(lock_file)
+        return f"app-{slot}.log"
+
+
 def setup_logger():
     logger = logging.getLogger()
-    log_level = logging.INFO
-    logger.setLevel(log_level)
+    logger.setLevel(DEFAULT_LOG_LEVEL)
 
     if logger.handlers:
         return logger  # Prevent duplicate handlers
 
     # Console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(ColoredFormatter(fmt=log_format, datefmt=date_format))
-    logger.addHandler(console_handler)
+    # Handlers pass everything; levels are decided per logger so they can be changed at runtime
+    console_handler.setLevel(logging.NOTSET)
+    if LOG_OUTPUT_FORMAT == "json":
+        console_handler.setFormatter(JsonFormatter())
+    elif console_handler.stream.isatty():
+        console_handler.setFormatter(ColoredFormatter())
+    else:
+        console_handler.setFormatter(TextFormatter())
 
     # File handler
     file_handler = TimedRotatingFileHandler(
-        filename=os.path.join(log_dir, "app.log"),
+        filename=os.path.join(log_dir, log_file_name()),
         when="H",
         interval=1,
         backupCount=168,
         encoding="utf-8"
     )
-    file_handler.setLevel(log_level)
-    file_handler.setFormatter(logging.Formatter(fmt=log_format, datefmt=date_format))
-
-    def custom_namer(name):
-        if name.endswith(".log"):
-            compress_old_log(name)
-        return name
+    file_handler.setLevel(logging.NOTSET)
+    file_handler.setFormatter(JsonFormatter() if LOG_OUTPUT_FORMAT == "json" else TextFormatter())
+    file_handler.rotator = rotate_and_compress
 
-    file_handler.namer = custom_namer
-    logger.addHandler(file_handler)
+    # Callers only enqueue records; the listener thread does all formatting and I/O
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
 
     logger.propagate = False  # Optional: prevent bubbling to root
 
@@ -89,3 +197,47 @@ setup_logger()
 # Modules should use this:
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
+
+
+def get_rate_limited_logger(name: str, burst: int = 10, interval: float = 60.0) -> logging.Logger:
+    """
+    Logger for high-frequency paths; each call site emits at most `burst` records per `interval` seconds.
+    """
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter(burst=burst, interval=interval))
+    return logger
+
+
+_runtime_overrides: set[str] = set()
+
+
+def get_log_levels() -> dict[str, str]:
+    """
+    Explicitly configured logger levels, including the root logger.
+    """
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in logging.Logger.manager.loggerDict.items():
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
+
+
+def apply_log_levels(levels: dict[str, str]) -> None:
+    """
+    Apply runtime logger levels; loggers previously overridden but missing from `levels` are reset.
+
+    :param levels: mapping of logger name ("root" for the root logger) to level name
+    """
+    global _runtime_overrides
+    for name in _runtime_overrides - levels.keys():
+        if name == "root":
+            logging.getLogger().setLevel(DEFAULT_LOG_LEVEL)
+        else:
+            logging.getLogger(name).setLevel(logging.NOTSET)
+    for name, level in levels.items():
+        level_no = logging.getLevelName(level.upper())
+        if not isinstance(level_no, int):
+            continue
+        logging.getLogger(None if name == "root" else name).setLevel(level_no)
+    _runtime_overrides = set(levels.keys())
@@ -0,0 +1,94 @@
+"""
+CPU cost of the pure-redirect endpoints with and without the fast redirect middleware.
+
+    python -m benchmarks.bench_redirects [iterations] [redis_url]
+
+Requests are sent straight to the ASGI app, so the numbers cover the whole middleware stack, routing and handlers but
+no HTTP parsing. Redis is required (default: redis://REDIS_HOST/15); the URL templates the handlers read are written
+to that database, so do not point it at the production database.
+"""
+import os
+import sys
+import time
+import asyncio
+from redis import asyncio as aioredis
+
+os.environ.setdefault("IS_DEV", "true")
+
+from config import REDIS_HOST  # noqa: E402
+from main import app  # noqa: E402
+from utils.fast_redirect import FastRedirectMiddleware  # noqa: E402
+
+ENDPOINTS = [
+    "/cn/static/raw/AvatarIcon/UI_AvatarIcon_Furina.png",
+    "/global/static/zip/ItemIcon.zip",
+    "/cn/metadata/CHS/Avatar/10000089.json",
+    "/global/enka/100000001",
+    "/fj/client/feature.json",
+]
+URL_TEMPLATES = {
+    **{f"url:{region}:{name}": f"https://{region}.example.com/{name}/{{file_path}}"
+       for region in ("china", "global", "fujian")
+       for name in ("static:raw:tiny", "static:zip:tiny", "metadata", "client-feature")},
+    "url:china:enka-network": "https://enka.example.com/api/uid/{uid}",
+    "url:global:enka-network": "https://enka.network/api/uid/{uid}",
+}
+HEADERS = [
+    (b"host", b"api.snapgenshin.com"),
+    (b"user-agent", b"Snap Hutao/1.14.7.0"),
+    (b"x-hutao-device-id", b"bench-device"),
+]
+
+
+async def request(path: str) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": HEADERS,
+             "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8080)}
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(label: str, iterations: int) -> float:
+    for path in ENDPOINTS:
+        status = await request(path)
+        if status != 301:
+            raise RuntimeError(f"{path} answered {status}")
+    start = time.process_time()
+    for i in range(iterations):
+        await request(ENDPOINTS[i % len(ENDPOINTS)])
+    per_request = (time.process_time() - start) / iterations
+    print(f"  {label:<12} {per_request * 1_000_000:8.1f} us/redirect  {1 / per_request:10.0f} redirects/s per core")
+    return per_request
+
+
+async def run(redis_pool: aioredis.ConnectionPool, iterations: int) -> None:
+    redis_client = aioredis.Redis.from_pool(redis_pool)
+    await redis_client.mset(URL_TEMPLATES)
+    app.state.redis = redis_pool
+
+    print(f"{len(ENDPOINTS)} redirect endpoints, {iterations} requests")
+    after = await measure("fast path", iterations)
+    # Rebuild the stack without the middleware for the baseline
+    user_middleware = app.user_middleware
+    app.user_middleware = [m for m in user_middleware if m.cls is not FastRedirectMiddleware]
+    app.middleware_stack = None
+    before = await measure("FastAPI", iterations)
+    app.user_middleware = user_middleware
+    app.middleware_stack = None
+    print(f"  speedup      {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"redis://{REDIS_HOST}/15"
+    asyncio.run(run(aioredis.ConnectionPool.from_url(url), n))
@@ -0,0 +1,70 @@
+"""
+Per-response CPU cost of the response serialization paths.
+
+    python -m benchmarks.bench_serialization [iterations]
+
+Compares, for a /patch/hutao and a /strategy/all sized payload:
+- baseline: StandardResponse through response_model validation and the standard JSONResponse (previous default)
+- orjson: the same validation, rendered by the ORJSONResponse default class
+- fast path: `standard_response`, skipping response_model validation
+"""
+import sys
+import time
+import asyncio
+from datetime import datetime
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from mysql_app.schemas import StandardResponse
+from utils.PatchMeta import PatchMeta, MirrorMeta
+from utils.responses import ORJSONResponse, standard_response
+
+
+def patch_payload() -> dict:
+    mirrors = [MirrorMeta(url=f"https://mirror-{i}.example.com/Snap.Hutao.1.14.7.0.msix", mirror_name=f"Mirror {i}",
+                          mirror_type="direct") for i in range(6)]
+    data = PatchMeta(version="1.14.7.0", validation="a" * 64, cache_time=datetime.now(),
+                     file_name="Snap.Hutao.1.14.7.0.msix", mirrors=mirrors).model_dump(mode="json")
+    data["urls"] = [m["url"] for m in data["mirrors"]]
+    data["sha256"] = data["validation"]
+    return data
+
+
+def strategy_payload() -> dict:
+    return {str(10000002 + i): {"mys_strategy_id": 1000 + i, "hoyolab_strategy_id": 2000 + i} for i in range(120)}
+
+
+async def measure(label: str, render, iterations: int) -> float:
+    for _ in range(min(iterations, 200)):
+        await render()
+    start = time.process_time()
+    for _ in range(iterations):
+        await render()
+    per_response = (time.process_time() - start) / iterations * 1_000_000
+    print(f"  {label:<10} {per_response:8.1f} us/response")
+    return per_response
+
+
+async def main(iterations: int) -> None:
+    field = create_model_field(name="Response_bench", type_=StandardResponse, mode="serialization")
+    for name, payload in (("patch", patch_payload()), ("strategy", strategy_payload())):
+        async def baseline():
+            content = await serialize_response(field=field, response_content=StandardResponse(data=payload))
+            return JSONResponse(content).body
+
+        async def orjson_default():
+            content = await serialize_response(field=field, response_content=StandardResponse(data=payload))
+            return ORJSONResponse(content).body
+
+        async def fast_path():
+            return standard_response(data=payload).body
+
+        print(f"{name} payload ({len(await fast_path())} bytes)")
+        before = await measure("baseline", baseline, iterations)
+        await measure("orjson", orjson_default, iterations)
+        after = await measure("fast path", fast_path, iterations)
+        print(f"  speedup    {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
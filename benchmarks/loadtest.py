@@ -0,0 +1,233 @@
+"""
+Load test of the hot endpoints against local stand-ins.
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python -m benchmarks.loadtest [--duration 10] [--concurrency 32] [--endpoint patch-hutao-cn ...]
+
+By default the suite boots the mock upstream (benchmarks/mock_upstream.py) and the app with uvicorn, pointed at the
+local Redis and MySQL from benchmarks/docker-compose.yml (override with REDIS_HOST and MYSQL_*). Use --base-url to
+drive an app that is already running instead.
+
+Each endpoint is driven for --duration seconds by --concurrency concurrent clients. Throughput, p50 and p99 latency
+and the error count are reported per endpoint and checked against benchmarks/thresholds.json; the exit status is 1
+if any endpoint regressed. --output saves the results as JSON, and --baseline fails endpoints that are more than
+--tolerance slower than a saved run.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+import httpx
+from redis import asyncio as aioredis
+from utils.scheduler import SCHEDULER_NEXT_RUN_KEY
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+DEFAULT_THRESHOLDS = os.path.join(BENCHMARKS_DIR, "thresholds.json")
+CLIENT_USER_AGENT = "Snap Hutao/1.14.7.0"
+
+
+def device_headers() -> dict:
+    # A new device per request, so the active user and client version writes are exercised too
+    return {"x-hutao-device-id": uuid.uuid4().hex}
+
+
+# name -> (path, per-request headers)
+ENDPOINTS = {
+    "patch-hutao-cn": ("/cn/patch/hutao", device_headers),
+    "patch-hutao-global": ("/global/patch/hutao", device_headers),
+    "patch-hutao-deployment": ("/cn/patch/hutao-deployment", None),
+    "static-raw": ("/cn/static/raw/AvatarIcon/UI_AvatarIcon_Furina.png", None),
+    "static-zip": ("/global/static/zip/ItemIcon.zip", lambda: {"x-hutao-archive": "minimum"}),
+    "metadata-file": ("/cn/metadata/CHS/Avatar/10000002.json", None),
+    "metadata-list": ("/cn/metadata/list?lang=CHS", None),
+    "enka": ("/global/enka/100000001", None),
+    "client-feature": ("/cn/client/LaunchGame.json", None),
+    "strategy-all": ("/cn/strategy/all", None),
+    "ip": ("/global/ip", None),
+}
+
+
+class EndpointResult:
+    def __init__(self, name: str, duration: float, latencies: list[float], errors: int):
+        self.name = name
+        self.requests = len(latencies) + errors
+        self.errors = errors
+        self.rps = self.requests / duration
+        latencies.sort()
+        self.p50_ms = percentile(latencies, 0.50) * 1000
+        self.p99_ms = percentile(latencies, 0.99) * 1000
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "rps": round(self.rps, 1),
+                "p50_ms": round(self.p50_ms, 2), "p99_ms": round(self.p99_ms, 2)}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+async def drive(client: httpx.AsyncClient, name: str, duration: float, concurrency: int) -> EndpointResult:
+    path, header_factory = ENDPOINTS[name]
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            headers = header_factory() if header_factory else None
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return EndpointResult(name, time.perf_counter() - start, latencies, errors)
+
+
+def check(result: EndpointResult, thresholds: dict, baseline: dict | None, tolerance: float) -> list[str]:
+    failures = []
+    limit = thresholds.get(result.name, {})
+    if result.errors / max(result.requests, 1) > limit.get("max_error_rate", 0.0):
+        failures.append(f"{result.errors} errors")
+    if "min_rps" in limit and result.rps < limit["min_rps"]:
+        failures.append(f"{result.rps:.0f} rps < {limit['min_rps']}")
+    if "max_p99_ms" in limit and result.p99_ms > limit["max_p99_ms"]:
+        failures.append(f"p99 {result.p99_ms:.1f} ms > {limit['max_p99_ms']}")
+    previous = (baseline or {}).get(result.name)
+    if previous:
+        if result.rps < previous["rps"] * (1 - tolerance):
+            failures.append(f"{result.rps:.0f} rps, baseline {previous['rps']:.0f}")
+        if result.p99_ms > previous["p99_ms"] * (1 + tolerance):
+            failures.append(f"p99 {result.p99_ms:.1f} ms, baseline {previous['p99_ms']:.1f}")
+    return failures
+
+
+async def wait_until_ready(base_url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/global/ip")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{base_url} did not become ready in {timeout:.0f}s")
+
+
+async def prepare_redis(redis_host: str) -> None:
+    """
+    Keep the scheduler from running jobs whose upstream has no stand-in (strategy sites) during the test.
+    """
+    redis_client = aioredis.Redis.from_url(f"redis://{redis_host}")
+    try:
+        await redis_client.hset(SCHEDULER_NEXT_RUN_KEY, "avatar-strategy", time.time() + 24 * 60 * 60)
+    finally:
+        await redis_client.aclose()
+
+
+def start_stand_ins(app_port: int, mock_port: int) -> list[subprocess.Popen]:
+    """
+    Start the mock upstream and the app; Redis and MySQL are expected to be running already.
+    """
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    env = {
+        **os.environ,
+        "SERVER_TYPE": os.environ.get("SERVER_TYPE", "dev"),
+        "REDIS_HOST": os.environ.get("REDIS_HOST", "127.0.0.1:6379"),
+        "MYSQL_HOST": os.environ.get("MYSQL_HOST", "127.0.0.1"),
+        "MYSQL_USER": os.environ.get("MYSQL_USER", "root"),
+        "MYSQL_PASSWORD": os.environ.get("MYSQL_PASSWORD", "root"),
+        "MYSQL_DATABASE": os.environ.get("MYSQL_DATABASE", "dgpstudio_generic_api"),
+        "GITHUB_API_URL": f"{mock_url}/github",
+        "STATIC_ARCHIVE_URL": f"{mock_url}/static-archive",
+        "WHITE_LIST_REPOSITORIES": json.dumps({"DGP-Studio/Snap.Hutao": "Snap Hutao/{ver}.0"}),
+    }
+    processes = [subprocess.Popen([sys.executable, "-m", "benchmarks.mock_upstream", str(mock_port)], cwd=REPO_DIR,
+                                  env=env)]
+    processes.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                       "--port", str(app_port), "--no-access-log"], cwd=REPO_DIR, env=env))
+    return processes
+
+
+def print_report(results: list[EndpointResult], failures: dict[str, list[str]]) -> None:
+    print(f"{'endpoint':<24} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        status = "REGRESSED: " + "; ".join(failures[result.name]) if failures[result.name] else "ok"
+        print(f"{result.name:<24} {result.requests:>9} {result.errors:>7} {result.rps:>9.1f} {result.p50_ms:>8.2f} "
+              f"{result.p99_ms:>8.2f}  {status}")
+
+
+async def run(args) -> int:
+    processes = []
+    base_url = args.base_url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.app_port}"
+        await prepare_redis(os.environ.get("REDIS_HOST", "127.0.0.1:6379"))
+        processes = start_stand_ins(args.app_port, args.mock_port)
+    try:
+        await wait_until_ready(base_url, args.startup_timeout)
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["endpoints"]
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        headers = {"User-Agent": CLIENT_USER_AGENT}
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=10.0) as client:
+            results = []
+            for name in args.endpoint or ENDPOINTS:
+                # Warm up caches and connections before measuring
+                await drive(client, name, args.warmup, args.concurrency)
+                results.append(await drive(client, name, args.duration, args.concurrency))
+
+        failures = {result.name: check(result, thresholds, baseline, args.tolerance) for result in results}
+        print_report(results, failures)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump({"duration": args.duration, "concurrency": args.concurrency,
+                           "endpoints": {result.name: result.to_dict() for result in results}}, f, indent=2)
+        return 1 if any(failures.values()) else 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the hot endpoints of the Generic API")
+    parser.add_argument("--base-url", help="Test an already running app instead of starting one")
+    parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS), help="Endpoint to test, repeatable")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per endpoint")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="Regression thresholds JSON")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression from the baseline")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--app-port", type=int, default=18080)
+    parser.add_argument("--mock-port", type=int, default=18081)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args(sys.argv[1:]))))
@@ -0,0 +1,115 @@
+"""
+Local stand-in for GitHub, the static archive CDN and the Cloudflare cache purge API, used by the load test.
+
+    python -m benchmarks.mock_upstream [port]
+
+Point the app at it with GITHUB_API_URL=http://127.0.0.1:<port>/github,
+STATIC_ARCHIVE_URL=http://127.0.0.1:<port>/static-archive and CLOUDFLARE_API_URL=http://127.0.0.1:<port>/cloudflare
+(with any CLOUDFLARE_ZONE_ID and CLOUDFLARE_PURGE_TOKEN). Responses carry only the fields the app reads; the purges
+received are listed at /cloudflare/purges.
+"""
+import sys
+import hashlib
+import uvicorn
+from fastapi import FastAPI, Response, Body
+
+SNAP_HUTAO_VERSION = "1.14.7"
+DEPLOYMENT_VERSION = "1.16.0"
+ALPHA_RUN_ID = 12345678
+STATIC_COMMIT = "0123456789abcdef0123456789abcdef01234567"
+STATIC_ARCHIVES = ["AchievementIcon.zip", "AvatarIcon.zip", "EmotionIcon.zip", "EmotionIcon-Minimum.zip", "ItemIcon.zip",
+                   "ItemIcon-Minimum.zip", "NameCardPic.zip"]
+METADATA_LANGUAGES = ["CHS", "CHT", "EN", "JP"]
+METADATA_FILES = ["Achievement.json", "Avatar.json", "Material.json", "Weapon.json"] + \
+                 [f"Avatar/{10000002 + i}.json" for i in range(100)]
+STATIC_FILES = [f"AvatarIcon/UI_AvatarIcon_{i}.png" for i in range(100)] + \
+               [f"ItemIcon/UI_ItemIcon_{100000 + i}.png" for i in range(500)]
+
+app = FastAPI(title="Generic API mock upstream", openapi_url=None)
+purges: list[dict] = []
+
+
+def release(repo: str, tag: str) -> dict:
+    if repo == "Snap.Hutao.Deployment":
+        name = "Snap.Hutao.Deployment.exe"
+    else:
+        name = f"Snap.Hutao.{tag}.0.msix"
+    return {
+        "tag_name": tag,
+        "prerelease": False,
+        "assets": [{
+            "name": name,
+            "browser_download_url": f"https://github.com/DGP-Studio/{repo}/releases/download/{tag}/{name}",
+            "digest": f"sha256:{hashlib.sha256(name.encode()).hexdigest()}"
+        }]
+    }
+
+
+@app.get("/github/repos/{owner}/{repo}/releases/latest")
+async def latest_release(owner: str, repo: str) -> dict:
+    return release(repo, DEPLOYMENT_VERSION if repo == "Snap.Hutao.Deployment" else SNAP_HUTAO_VERSION)
+
+
+@app.get("/github/repos/{owner}/{repo}/releases")
+async def releases(owner: str, repo: str, page: int = 1) -> list[dict]:
+    major, minor, patch = (int(part) for part in SNAP_HUTAO_VERSION.split("."))
+    return [release(repo, f"{major}.{minor}.{patch - i}") for i in range(4)] if page == 1 else []
+
+
+@app.get("/github/repos/{owner}/{repo}/pulls")
+async def pulls(owner: str, repo: str) -> list[dict]:
+    return []
+
+
+@app.get("/github/repos/{owner}/{repo}/issues")
+async def issues(owner: str, repo: str) -> list[dict]:
+    return [{"number": i, "title": f"Issue {i}", "labels": [{"name": "BUG"}], "user": {"login": "tester"},
+             "created_at": "2025-01-01T00:00:00Z"} for i in range(20)]
+
+
+@app.get("/github/repos/{owner}/{repo}/actions/workflows/alpha.yml/runs")
+async def alpha_runs(owner: str, repo: str) -> dict:
+    return {"workflow_runs": [{"id": ALPHA_RUN_ID, "conclusion": "success", "head_branch": "develop"}]}
+
+
+@app.get("/github/repos/{owner}/{repo}/actions/runs/{run_id}/artifacts")
+async def alpha_artifacts(owner: str, repo: str, run_id: int) -> dict:
+    return {"artifacts": [{"id": 1, "name": f"Snap.Hutao.Alpha-{SNAP_HUTAO_VERSION}.1", "expired": False}]}
+
+
+@app.get("/github/repos/{owner}/{repo}/git/trees/main")
+async def repo_tree(owner: str, repo: str) -> dict:
+    if repo == "Snap.Static":
+        return {"tree": [{"path": file, "type": "blob"} for file in STATIC_FILES]}
+    return {"tree": [{"path": f"Genshin/{lang}/{file}", "type": "blob"}
+                     for lang in METADATA_LANGUAGES for file in METADATA_FILES]}
+
+
+@app.get("/static-archive/{quality}/file_info.json")
+async def static_file_info(quality: str) -> list[dict]:
+    return [{"name": name, "size": 1024 * 1024 * (i + 1)} for i, name in enumerate(STATIC_ARCHIVES)]
+
+
+@app.get("/static-archive/{quality}/meta.json")
+async def static_meta(quality: str) -> dict:
+    return {"time": "05/06/2025 13:03:40", "commit": STATIC_COMMIT}
+
+
+@app.get("/static-archive/{quality}/{file_name}")
+async def static_archive(quality: str, file_name: str) -> Response:
+    return Response(file_name.encode() * 1024, media_type="application/zip")
+
+
+@app.post("/cloudflare/zones/{zone_id}/purge_cache")
+async def purge_cache(zone_id: str, body: dict = Body(...)) -> dict:
+    purges.append({"zone_id": zone_id, **body})
+    return {"success": True, "errors": [], "messages": [], "result": {"id": zone_id}}
+
+
+@app.get("/cloudflare/purges")
+async def list_purges() -> list[dict]:
+    return purges
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 18081, log_level="warning")
@@ -104,7 +104,6 @@ if __name__ == "__main__":
         "fastapi_service_name": f"{IMAGE_NAME}-{SERVER_TYPE}-server",
         "fastapi_container_name": f"{IMAGE_NAME}-{SERVER_TYPE}-server",
         "redis_service_name": f"{IMAGE_NAME}-{SERVER_TYPE}-redis",
-        "scheduled_tasks_service_name": f"{IMAGE_NAME}-{SERVER_TYPE}-scheduled-tasks",
         "tunnel_service_name": f"{IMAGE_NAME}-{SERVER_TYPE}-tunnel",
     }
 
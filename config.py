@@ -24,6 +24,8 @@ github_headers = {
     "Authorization": f"Bearer {os.environ.get('GITHUB_PAT')}",
     "X-GitHub-Api-Version": "2022-11-28"
 }
+# Secret of the GitHub webhooks posting to /webhook/github; the endpoint rejects every delivery while it is empty
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
 
 API_TOKEN = os.environ.get("API_TOKEN")
 
@@ -31,10 +33,28 @@ HOMA_SERVER_IP = os.environ.get("HOMA_SERVER_IP", None)
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 
+# Number of server processes; "auto" starts one per CPU core
+_workers = os.getenv("WORKERS", "1").strip().lower()
+WORKERS = max(os.cpu_count() or 1, 1) if _workers == "auto" else max(int(_workers), 1)
+
+# Upstream base URLs; benchmarks point them at a local mock server
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+STATIC_ARCHIVE_URL = os.getenv("STATIC_ARCHIVE_URL", "https://static-archive.snapgenshin.cn").rstrip("/")
+CLOUDFLARE_API_URL = os.getenv("CLOUDFLARE_API_URL", "https://api.cloudflare.com/client/v4").rstrip("/")
+
+# Zone in front of the tunnel and a token with the Cache Purge permission; edge purges are skipped while either is empty
+CLOUDFLARE_ZONE_ID = os.getenv("CLOUDFLARE_ZONE_ID", "")
+CLOUDFLARE_PURGE_TOKEN = os.getenv("CLOUDFLARE_PURGE_TOKEN", "")
+
+# Bearer token required to scrape /metrics; leave empty to expose it without authentication
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 if not IS_DEV:
     SENTRY_URL = f"http://{os.getenv('SENTRY_TOKEN')}@{socket.gethostbyname('host.docker.internal')}:9510/5"
 else:
     SENTRY_URL = None
+# Share of sampled transactions that are also profiled
+SENTRY_PROFILES_SAMPLE_RATE = float(os.getenv("SENTRY_PROFILES_SAMPLE_RATE", "0.1"))
 
 # FastAPI Config
 TOS_URL = "https://hut.ao/statements/tos.html"
@@ -2,25 +2,45 @@ from config import env_result
 import uvicorn
 import os
 import json
+import asyncio
+import multiprocessing
 from redis import asyncio as aioredis
 from fastapi import FastAPI, APIRouter, Request, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 from contextlib import asynccontextmanager
 from routers import (enka_network, metadata, patch_next, static, net, wallpaper, strategy, crowdin, system_email,
-                     client_feature, issue, git_repository)
+                     client_feature, issue, git_repository, logging_config, scheduled_jobs, jobs, stats, webhook)
 from cloudflare_security_utils import mgnt
 from base_logger import get_logger
 from config import (MAIN_SERVER_DESCRIPTION, TOS_URL, CONTACT_INFO, LICENSE_INFO, VALID_PROJECT_KEYS,
-                    IS_DEBUG, IS_DEV, SERVER_TYPE, REDIS_HOST, SENTRY_URL, BUILD_NUMBER, CURRENT_COMMIT_HASH)
+                    IS_DEBUG, IS_DEV, SERVER_TYPE, REDIS_HOST, SENTRY_URL, BUILD_NUMBER, CURRENT_COMMIT_HASH,
+                    METRICS_TOKEN, SENTRY_PROFILES_SAMPLE_RATE, WORKERS)
 from utils.redis_tools import init_redis_data, reinit_redis_data
+from utils.stats import migrate_legacy_active_user_keys
+from utils.email_queue import EmailWorkerPool
+from utils.counters import counters
+from utils.patch_notifier import patch_notifier
+from utils.runtime_config import runtime_config
+from utils.scheduler import scheduler
+from utils.jobs import job_runner
+from utils.startup import claim_startup_refresh, finish_startup_refresh
+from utils.responses import ORJSONResponse
+from utils.region import resolve_region
+from utils.fast_redirect import FastRedirectMiddleware
+from utils.edge_cache import EdgeCacheMiddleware
+from utils.sentry_sampling import route_sampler
+from utils.metrics import (registry, MetricsMiddleware, instrument_redis, instrument_httpx, instrument_sqlalchemy,
+                           monitor_event_loop_lag, worker_metrics)
 import sentry_sdk
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk import set_user
 
 logger = get_logger("main")
+instrument_redis()
+instrument_httpx()
 
 
 @asynccontextmanager
@@ -33,9 +53,9 @@ async def lifespan(app: FastAPI):
     # Create cache folder
     os.makedirs("cache", exist_ok=True)
     
-    # Initialize database tables
-    from mysql_app.init_db import init_database
-    init_database()
+    from mysql_app.database import engine
+    instrument_sqlalchemy(engine)
+    event_loop_monitor = asyncio.create_task(monitor_event_loop_lag())
     
     # Redis connection
     redis_pool = aioredis.ConnectionPool.from_url(f"redis://{REDIS_HOST}", db=0)
@@ -43,29 +63,77 @@ async def lifespan(app: FastAPI):
     redis_client = aioredis.Redis.from_pool(connection_pool=redis_pool)
     logger.info("Redis connection established")
 
-    # Patch module lifespan
-    try:
-        redis_cached_version = await redis_client.get("snap-hutao:version")
-        redis_cached_version = redis_cached_version.decode("utf-8")
-        logger.info(f"Got mirrors from Redis: {redis_cached_version}")
-    except (TypeError, AttributeError):
-        for key in VALID_PROJECT_KEYS:
-            r = await redis_client.set(f"{key}:version", json.dumps({"version": None}))
-            logger.info(f"Set [{key}:mirrors] to Redis: {r}")
-    # Initial patch metadata
-    from routers.patch_next import (update_snap_hutao_latest_version, update_snap_hutao_deployment_version,
-                                    fetch_snap_hutao_alpha_latest_version)
-    await update_snap_hutao_latest_version(redis_client)
-    await update_snap_hutao_deployment_version(redis_client)
-    await fetch_snap_hutao_alpha_latest_version(redis_client)
-
-    # Initial Redis data
-    await reinit_redis_data(redis_client)
-    await init_redis_data(redis_client)
+    # Runtime settings shared by all workers, e.g. logger levels
+    await runtime_config.start(redis_pool)
+
+    # One worker refreshes upstream data and seeds Redis; the others wait for it, then serve from Redis
+    startup_token = await claim_startup_refresh(redis_client)
+    if startup_token:
+        startup_refreshed = False
+        try:
+            # Initialize database tables
+            from mysql_app.init_db import init_database
+            init_database()
+
+            # Patch module lifespan
+            try:
+                redis_cached_version = await redis_client.get("snap-hutao:version")
+                redis_cached_version = redis_cached_version.decode("utf-8")
+                logger.info(f"Got mirrors from Redis: {redis_cached_version}")
+            except (TypeError, AttributeError):
+                for key in VALID_PROJECT_KEYS:
+                    r = await redis_client.set(f"{key}:version", json.dumps({"version": None}))
+                    logger.info(f"Set [{key}:mirrors] to Redis: {r}")
+            # Initial patch metadata
+            from routers.patch_next import (update_snap_hutao_latest_version, update_snap_hutao_deployment_version,
+                                            fetch_snap_hutao_alpha_latest_version)
+            await update_snap_hutao_latest_version(redis_client)
+            # The installer checksum is left to the scheduler, so downloading it does not hold up startup
+            await update_snap_hutao_deployment_version(redis_client, compute_checksum=False)
+            await fetch_snap_hutao_alpha_latest_version(redis_client)
+
+            # Initial Redis data
+            await reinit_redis_data(redis_client)
+            await init_redis_data(redis_client)
+            await migrate_legacy_active_user_keys(redis_client)
+            startup_refreshed = True
+        finally:
+            await finish_startup_refresh(redis_client, startup_token, startup_refreshed)
+
+    # Each worker has its own registry; publish it so a scrape of any worker covers all of them
+    if WORKERS > 1:
+        worker_metrics.start(redis_pool)
+
+    # Batched counters
+    counters.start(redis_pool)
+
+    # Wakes up clients watching for Snap Hutao version changes
+    patch_notifier.start(redis_pool)
+
+    # Email delivery workers
+    email_workers = EmailWorkerPool(redis_pool)
+    email_workers.start()
+
+    # Periodic upstream refreshes and daily rollups; only the elected leader runs them
+    from scheduled_tasks import register_jobs, register_job_kinds
+    register_jobs(scheduler)
+    scheduler.start(redis_pool)
+
+    # Tracked admin jobs, run by whichever process claims them
+    register_job_kinds(job_runner)
+    job_runner.start(redis_pool)
 
     logger.info("ending lifespan startup")
     yield
-    from mysql_app.database import engine
+    if WORKERS > 1:
+        await worker_metrics.stop()
+    await job_runner.stop()
+    await scheduler.stop()
+    await email_workers.stop()
+    await patch_notifier.stop()
+    await counters.stop()
+    await runtime_config.stop()
+    event_loop_monitor.cancel()
     engine.dispose()
     logger.info("entering lifespan shutdown")
 
@@ -91,7 +159,7 @@ def get_commit_hash_desc():
     return commit_desc
 
 
-def identify_user(request: Request) -> None:
+async def identify_user(request: Request) -> None:
     # Extract headers
     reqable_id = request.headers.get("Reqable-Id", None)
     device_id = request.headers.get("x-hutao-device-id", None)
@@ -117,18 +185,20 @@ else:
     sentry_sdk.init(
         dsn=SENTRY_URL,
         send_default_pii=True,
-        traces_sample_rate=1.0,
+        # Per-route rates, adjustable at runtime through the config:sentry-sample-rates Redis hash
+        traces_sampler=route_sampler,
         integrations=[
             StarletteIntegration(
                 transaction_style="url",
-                failed_request_status_codes={403, *range(500, 599)},
+                failed_request_status_codes={*range(500, 599)},
             ),
             FastApiIntegration(
                 transaction_style="url",
-                failed_request_status_codes={403, *range(500, 599)},
+                failed_request_status_codes={*range(500, 599)},
             ),
         ],
-        profiles_sample_rate=1.0,
+        # Relative to sampled transactions
+        profiles_sample_rate=SENTRY_PROFILES_SAMPLE_RATE,
         release=f"generic-api@{BUILD_NUMBER}-{SERVER_TYPE}+{CURRENT_COMMIT_HASH}",
         environment=SERVER_TYPE,
         dist=CURRENT_COMMIT_HASH,
@@ -146,79 +216,61 @@ app = FastAPI(redoc_url=None,
               openapi_url="/openapi.json",
               lifespan=lifespan,
               debug=IS_DEBUG,
+              default_response_class=ORJSONResponse,
               dependencies=[Depends(identify_user)])
 
-china_root_router = APIRouter(tags=["China Router"], prefix="/cn")
-global_root_router = APIRouter(tags=["Global Router"], prefix="/global")
-fujian_root_router = APIRouter(tags=["Fujian Router"], prefix="/fj")
+# Every regional API is served under /cn, /global and /fj by the same routes; the region is resolved once per request
+region_router = APIRouter(prefix="/{region:region}", dependencies=[Depends(resolve_region)])
 
 # Enka Network API Routers
-china_root_router.include_router(enka_network.china_router)
-global_root_router.include_router(enka_network.global_router)
-fujian_root_router.include_router(enka_network.fujian_router)
+region_router.include_router(enka_network.router)
 
 # Hutao Metadata API Routers
-china_root_router.include_router(metadata.china_router)
-global_root_router.include_router(metadata.global_router)
-fujian_root_router.include_router(metadata.fujian_router)
+region_router.include_router(metadata.router)
 
 # Patch API Routers
-china_root_router.include_router(patch_next.china_router)
-global_root_router.include_router(patch_next.global_router)
-fujian_root_router.include_router(patch_next.fujian_router)
+region_router.include_router(patch_next.router)
 
 # Static API Routers
-china_root_router.include_router(static.china_router)
-global_root_router.include_router(static.global_router)
-fujian_root_router.include_router(static.fujian_router)
+region_router.include_router(static.router)
 
 # Network API Routers
-china_root_router.include_router(net.china_router)
-global_root_router.include_router(net.global_router)
-fujian_root_router.include_router(net.fujian_router)
+region_router.include_router(net.router)
 
 # Wallpaper API Routers
-china_root_router.include_router(wallpaper.china_router)
-global_root_router.include_router(wallpaper.global_router)
-fujian_root_router.include_router(wallpaper.fujian_router)
+region_router.include_router(wallpaper.router)
 
 # Strategy API Routers
-china_root_router.include_router(strategy.china_router)
-global_root_router.include_router(strategy.global_router)
-fujian_root_router.include_router(strategy.fujian_router)
+region_router.include_router(strategy.router)
 
 # Crowdin Localization API Routers
-china_root_router.include_router(crowdin.china_router)
-global_root_router.include_router(crowdin.global_router)
-fujian_root_router.include_router(crowdin.fujian_router)
+region_router.include_router(crowdin.router)
 
 # Client feature routers
-china_root_router.include_router(client_feature.china_router)
-global_root_router.include_router(client_feature.global_router)
-fujian_root_router.include_router(client_feature.fujian_router)
+region_router.include_router(client_feature.router)
 
-china_root_router.include_router(mgnt.public_router)
-global_root_router.include_router(mgnt.public_router)
-fujian_root_router.include_router(mgnt.public_router)
+region_router.include_router(mgnt.public_router)
 
-china_root_router.include_router(issue.china_router)
-global_root_router.include_router(issue.global_router)
-fujian_root_router.include_router(issue.fujian_router)
+region_router.include_router(issue.router)
 
 # Git Repository Management API Routers
-china_root_router.include_router(git_repository.china_router)
-global_root_router.include_router(git_repository.global_router)
-fujian_root_router.include_router(git_repository.fujian_router)
+region_router.include_router(git_repository.router)
 
 app.include_router(system_email.admin_router)
+app.include_router(logging_config.admin_router)
+app.include_router(scheduled_jobs.admin_router)
+app.include_router(jobs.admin_router)
+app.include_router(stats.admin_router)
+app.include_router(webhook.router)
 app.include_router(mgnt.router)
 app.include_router(mgnt.public_router)
 
-app.include_router(china_root_router)
-app.include_router(global_root_router)
-app.include_router(fujian_root_router)
+app.include_router(region_router)
 
 
+# Innermost, so fast redirects and 304 responses still get CORS headers and metrics
+app.add_middleware(EdgeCacheMiddleware)
+app.add_middleware(FastRedirectMiddleware, routes=app.routes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -226,26 +278,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/", response_class=RedirectResponse, status_code=301)
-@china_root_router.get("/", response_class=RedirectResponse, status_code=301)
-@global_root_router.get("/", response_class=RedirectResponse, status_code=301)
-@fujian_root_router.get("/", response_class=RedirectResponse, status_code=301)
 async def root():
     return "https://hut.ao"
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return PlainTextResponse("Forbidden", status_code=403)
+    if WORKERS > 1:
+        redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+        body = registry.render_workers(await worker_metrics.collect(redis_client))
+    else:
+        body = registry.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/error")
-@china_root_router.get("/error")
-@global_root_router.get("/error")
-@fujian_root_router.get("/error")
 async def get_sample_error():
     raise RuntimeError(
         "This is endpoint for debug purpose; you should receive a Runtime error with this message in debug mode, else you will only see a 500 error")
 
 
+SHUTDOWN_TIMEOUT = 10  # seconds
+
+
 if __name__ == "__main__":
+    # Worker processes of the frozen executable re-run it; this hands them over to multiprocessing
+    multiprocessing.freeze_support()
     if env_result:
         logger.info(".env file is loaded")
-    uvicorn.run(app, host="0.0.0.0", port=8080, proxy_headers=True, forwarded_allow_ips="*")
+    # log_config=None routes uvicorn's loggers through the root queue handler instead of its own blocking handlers;
+    # open version watch and event stream requests are cut after SHUTDOWN_TIMEOUT so they cannot hold up a restart
+    if WORKERS > 1:
+        # Workers are spawned processes that re-run this module first, so the app is taken from there instead of
+        # importing it a second time as "main"
+        logger.info(f"Starting {WORKERS} workers")
+        uvicorn.run("__main__:app", workers=WORKERS, host="0.0.0.0", port=8080, proxy_headers=True,
+                    forwarded_allow_ips="*", log_config=None, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8080, proxy_headers=True, forwarded_allow_ips="*", log_config=None,
+                    timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
@@ -86,20 +86,35 @@ def get_all_avatar_strategy(db: Session) -> list[models.AvatarStrategy] | None:
     return cast(list[models.AvatarStrategy], result) if result else None
 
 def dump_daily_active_user_stats(db: Session, stats: schemas.DailyActiveUserStats) -> schemas.DailyActiveUserStats:
-    db_stats = models.DailyActiveUserStats(**stats.model_dump())
-    db.add(db_stats)
+    # Merge so that recomputing a day from its retained Redis key overwrites the earlier row
+    db_stats = db.merge(models.DailyActiveUserStats(**stats.model_dump()))
     db.commit()
     db.refresh(db_stats)
     return db_stats
 
 def dump_daily_email_sent_stats(db: Session, stats: schemas.DailyEmailSentStats) -> schemas.DailyEmailSentStats:
-    db_stats = models.DailyEmailSentStats(**stats.model_dump())
-    db.add(db_stats)
+    # Merge so that re-running the rollup for a day overwrites instead of failing on the primary key
+    db_stats = db.merge(models.DailyEmailSentStats(**stats.model_dump()))
     db.commit()
     db.refresh(db_stats)
     return db_stats
 
 
+def dump_client_version_stats(db: Session, stats: list[schemas.ClientVersionStats]) -> int:
+    for stat in stats:
+        db.merge(models.ClientVersionStats(**stat.model_dump()))
+    db.commit()
+    return len(stats)
+
+
+def get_client_version_stats(db: Session, start: date, end: date,
+                             version: str | None = None) -> list[models.ClientVersionStats]:
+    query = db.query(models.ClientVersionStats).filter(models.ClientVersionStats.date.between(start, end))
+    if version:
+        query = query.filter(models.ClientVersionStats.version == version)
+    return query.order_by(models.ClientVersionStats.date, models.ClientVersionStats.version).all()
+
+
 def get_all_git_repositories(db: Session, region: str | None = None) -> list[models.GitRepository]:
     """
     Get all git repositories from database, optionally filtered by region.
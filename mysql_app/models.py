@@ -33,7 +33,7 @@ class AvatarStrategy(Base):
         return {field.name: getattr(self, field.name) for field in self.__table__.c}
 
     def __repr__(self):
-        return f"models.AvatarStrategy({self.__dict__()})"
+        return f"models.AvatarStrategy({self.to_dict()})"
 
 
 class DailyActiveUserStats(Base):
@@ -44,11 +44,11 @@ class DailyActiveUserStats(Base):
     global_user = Column(Integer, nullable=False)
     unknown = Column(Integer, nullable=False)
 
-    def __dict__(self):
+    def to_dict(self):
         return {field.name: getattr(self, field.name) for field in self.__table__.c}
 
     def __repr__(self):
-        return f"models.DailyActiveUserStats({self.__dict__()})"
+        return f"models.DailyActiveUserStats({self.to_dict()})"
 
 
 class DailyEmailSentStats(Base):
@@ -59,11 +59,25 @@ class DailyEmailSentStats(Base):
     sent = Column(Integer, nullable=False)
     failed = Column(Integer, nullable=False)
 
-    def __dict__(self):
+    def to_dict(self):
+        return {field.name: getattr(self, field.name) for field in self.__table__.c}
+
+    def __repr__(self):
+        return f"models.DailyEmailSentStats({self.to_dict()})"
+
+
+class ClientVersionStats(Base):
+    __tablename__ = "client_version_stats"
+
+    date = Column(Date, primary_key=True, index=True)
+    version = Column(String(64), primary_key=True, index=True)
+    users = Column(Integer, nullable=False)
+
+    def to_dict(self):
         return {field.name: getattr(self, field.name) for field in self.__table__.c}
 
     def __repr__(self):
-        return f"models.DailyEmailSentStats({self.__dict__()})"
+        return f"models.ClientVersionStats({self.to_dict()})"
 
 
 class GitRepository(Base):
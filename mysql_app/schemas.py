@@ -74,6 +74,15 @@ class DailyEmailSentStats(BaseModel):
         from_attributes = True
 
 
+class ClientVersionStats(BaseModel):
+    date: datetime.date
+    version: str
+    users: int
+
+    class Config:
+        from_attributes = True
+
+
 class PatchMetadata(BaseModel):
     version: str
     release_date: datetime.date
@@ -3,9 +3,7 @@ from mysql_app.schemas import StandardResponse
 import httpx
 import os
 
-china_router = APIRouter(tags=["Localization"], prefix="/localization")
-global_router = APIRouter(tags=["Localization"], prefix="/localization")
-fujian_router = APIRouter(tags=["Localization"], prefix="/localization")
+router = APIRouter(tags=["Localization"], prefix="/localization")
 
 API_KEY = os.environ.get("CROWDIN_API_KEY", None)
 CROWDIN_HOST = "https://api.crowdin.com/api/v2"
@@ -35,9 +33,7 @@ def fetch_snap_hutao_translation_process():
     return result_output
 
 
-@china_router.get("/status", response_model=StandardResponse)
-@global_router.get("/status", response_model=StandardResponse)
-@fujian_router.get("/status", response_model=StandardResponse)
+@router.get("/status", response_model=StandardResponse)
 async def get_latest_status() -> StandardResponse:
     status = fetch_snap_hutao_translation_process()
     return StandardResponse(
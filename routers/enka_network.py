@@ -2,57 +2,22 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
 from redis import asyncio as aioredis
 from cloudflare_security_utils.safety import validate_client_is_updated
+from utils.fast_redirect import fast_redirect
 
 
-china_router = APIRouter(tags=["Enka Network"], prefix="/enka")
-global_router = APIRouter(tags=["Enka Network"], prefix="/enka")
-fujian_router = APIRouter(tags=["Enka Network"], prefix="/enka")
+router = APIRouter(tags=["Enka Network"], prefix="/enka")
 
 
-@china_router.get("/{uid}", dependencies=[Depends(validate_client_is_updated)])
-@fujian_router.get("/{uid}", dependencies=[Depends(validate_client_is_updated)])
-async def cn_get_enka_raw_data(request: Request, uid: str) -> RedirectResponse:
-    """
-    Handle requests to Enka-API detail data
-
-    :param request: Request object
-
-    :param uid: User's in-game UID
-
-    :return: HTTP 301 redirect to Enka-API
-    """
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-
-    endpoint = await redis_client.get("url:china:enka-network")
-    endpoint = endpoint.decode("utf-8").format(uid=uid)
-
-    return RedirectResponse(endpoint, status_code=301)
+def _enka_redis_region(request: Request) -> str:
+    # Fujian shares the China endpoints
+    return "global" if request.state.region_group == "global" else "china"
 
 
-@global_router.get("/{uid}", dependencies=[Depends(validate_client_is_updated)])
-async def global_get_enka_raw_data(request: Request, uid: str) -> RedirectResponse:
+@router.get("/{uid}", dependencies=[Depends(validate_client_is_updated)])
+@fast_redirect(validate_client_is_updated)
+async def get_enka_raw_data(request: Request, uid: str) -> RedirectResponse:
     """
-    Handle requests to Enka-API detail data.
-
-    :param request: Request object
-
-    :param uid: User's in-game UID
-
-    :return: HTTP 301 redirect to Enka-API (Origin Endpoint)
-    """
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-
-    endpoint = await redis_client.get("url:global:enka-network")
-    endpoint = endpoint.decode("utf-8").format(uid=uid)
-
-    return RedirectResponse(endpoint, status_code=301)
-
-
-@china_router.get("/{uid}/info", dependencies=[Depends(validate_client_is_updated)])
-@fujian_router.get("/{uid}/info", dependencies=[Depends(validate_client_is_updated)])
-async def cn_get_enka_info_data(request: Request, uid: str) -> RedirectResponse:
-    """
-    Handle requests to Enka-API info data.
+    Handle requests to Enka-API detail data
 
     :param request: Request object
 
@@ -62,14 +27,15 @@ async def cn_get_enka_info_data(request: Request, uid: str) -> RedirectResponse:
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
 
-    endpoint = await redis_client.get("url:china:enka-network-info")
+    endpoint = await redis_client.get(f"url:{_enka_redis_region(request)}:enka-network")
     endpoint = endpoint.decode("utf-8").format(uid=uid)
 
     return RedirectResponse(endpoint, status_code=301)
 
 
-@global_router.get("/{uid}/info", dependencies=[Depends(validate_client_is_updated)])
-async def global_get_enka_info_data(request: Request, uid: str) -> RedirectResponse:
+@router.get("/{uid}/info", dependencies=[Depends(validate_client_is_updated)])
+@fast_redirect(validate_client_is_updated)
+async def get_enka_info_data(request: Request, uid: str) -> RedirectResponse:
     """
     Handle requests to Enka-API info data.
 
@@ -77,11 +43,11 @@ async def global_get_enka_info_data(request: Request, uid: str) -> RedirectRespo
 
     :param uid: User's in-game UID
 
-    :return: HTTP 301 redirect to Enka-API (Origin Endpoint)
+    :return: HTTP 301 redirect to Enka-API
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
 
-    endpoint = await redis_client.get("url:global:enka-network-info")
+    endpoint = await redis_client.get(f"url:{_enka_redis_region(request)}:enka-network-info")
     endpoint = endpoint.decode("utf-8").format(uid=uid)
 
     return RedirectResponse(endpoint, status_code=301)
@@ -1,20 +1,20 @@
 import httpx
 import json
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 from redis import asyncio as aioredis
 from mysql_app.schemas import StandardResponse
 from utils.stats import record_device_id
+from utils.metrics import record_cache
+from utils.response_cache import cached_response, render_standard_response, invalidate
 from base_logger import get_logger
-from config import github_headers
+from config import github_headers, GITHUB_API_URL
 
 logger = get_logger(__name__)
 
-china_router = APIRouter(tags=["Issue"], prefix="/issue")
-global_router = APIRouter(tags=["Issue"], prefix="/issue")
-fujian_router = APIRouter(tags=["Issue"], prefix="/issue")
+router = APIRouter(tags=["Issue"], prefix="/issue")
 
-GITHUB_ISSUES_URL = "https://api.github.com/repos/DGP-Studio/Snap.Hutao/issues"
+GITHUB_ISSUES_URL = f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Hutao/issues"
 CACHE_KEY = "issues:hutao:open:bug"
 CACHE_TTL_SECONDS = 600
 
@@ -73,29 +73,59 @@ def _calc_bug_stats(issues: List[Dict[str, Any]]) -> Dict[str, int]:
     return stat
 
 
-@china_router.get("/bug", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-@global_router.get("/bug", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-@fujian_router.get("/bug", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-async def get_open_bug_issues(request: Request) -> StandardResponse:
+async def apply_issue_event(redis_client: aioredis.client.Redis, issue: Dict[str, Any]) -> bool:
+    """
+    Update the cached open bug list with an issue from an issues webhook, without querying GitHub.
+
+    :return: False if nothing is cached; the next request fetches the full list
+    """
+    async def apply(pipe) -> int | None:
+        cached = await pipe.get(CACHE_KEY)
+        if not cached:
+            return None
+        issues = [i for i in json.loads(cached)["details"] if i["number"] != issue["number"]]
+        if issue.get("state") == "open" and (issue.get("type") or {}).get("name") == "Bug":
+            issues = sorted(issues + _prune_issue_fields([issue]), key=lambda i: i["number"], reverse=True)
+        data = {"details": issues, "stat": _calc_bug_stats(issues)}
+        pipe.multi()
+        pipe.set(CACHE_KEY, json.dumps(data, ensure_ascii=False), keepttl=True)
+        return len(issues)
+
+    # Watched, so webhooks for different issues arriving together do not drop each other's changes
+    open_bugs = await redis_client.transaction(apply, CACHE_KEY, value_from_callable=True)
+    if open_bugs is None:
+        return False
+    await invalidate(redis_client, "issue:bug")
+    logger.info(f"Applied issue #{issue['number']} to the cached bug list, {open_bugs} open bugs")
+    return True
+
+
+@router.get("/bug", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
+async def get_open_bug_issues(request: Request) -> Response:
     """Return open 'Bug' issues"""
     redis_client: aioredis.client.Redis = aioredis.Redis.from_pool(request.app.state.redis)
 
-    # Try cache first
-    cached = await redis_client.get(CACHE_KEY)
-    if cached:
-        try:
-            data = json.loads(cached)
-            return StandardResponse(retcode=0, message="From cache", data=data)
-        except Exception as e:
-            logger.warning(f"Failed to decode cached issues: {e}")
+    async def render() -> bytes:
+        # Try cache first
+        cached = await redis_client.get(CACHE_KEY)
+        record_cache("issues", cached is not None)
+        if cached:
+            try:
+                data = json.loads(cached)
+                return render_standard_response(retcode=0, message="From cache", data=data)
+            except Exception as e:
+                logger.warning(f"Failed to decode cached issues: {e}")
 
-    # Fetch from GitHub and cache
-    try:
+        # Fetch from GitHub and cache
         issues = _fetch_open_bug_issues()
         stat = _calc_bug_stats(issues)
         data = {"details": issues, "stat": stat}
         await redis_client.set(CACHE_KEY, json.dumps(data, ensure_ascii=False), ex=CACHE_TTL_SECONDS)
-        return StandardResponse(retcode=0, message="Fetched from GitHub", data=data)
+        return render_standard_response(retcode=0, message="Fetched from GitHub", data=data)
+
+    try:
+        return await cached_response(redis_client, request.headers, "issue:bug", "open", render,
+                                     ttl=CACHE_TTL_SECONDS)
     except httpx.HTTPError as e:
         logger.error(f"GitHub API error: {e}")
         return StandardResponse(
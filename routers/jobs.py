@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Response, Request, Body
+from redis import asyncio as aioredis
+from utils.authentication import verify_api_token
+from utils.jobs import job_runner, job_queue, get_job, list_jobs
+from mysql_app.schemas import StandardResponse
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+admin_router = APIRouter(tags=["Jobs"], prefix="/jobs")
+
+
+@admin_router.get("", dependencies=[Depends(verify_api_token)])
+async def list_tracked_jobs(request: Request, limit: int = 20) -> StandardResponse:
+    """
+    List the most recently queued jobs, newest first, with the job kinds and the size of the job queue.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    return StandardResponse(data={
+        "kinds": [kind.describe() for kind in job_runner.kinds.values()],
+        "queue": await job_queue.size(redis_client),
+        "jobs": await list_jobs(redis_client, limit)
+    })
+
+
+@admin_router.get("/{job_id}", dependencies=[Depends(verify_api_token)])
+async def get_tracked_job(job_id: str, response: Response, request: Request) -> StandardResponse:
+    """
+    Get a job: its status (queued, running, succeeded or failed), progress, attempts and result or error.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    job = await get_job(redis_client, job_id)
+    if job is None:
+        response.status_code = 404
+        return StandardResponse(retcode=404, message="Job not found")
+    return StandardResponse(data=job)
+
+
+@admin_router.post("/{kind}", dependencies=[Depends(verify_api_token)])
+async def queue_tracked_job(kind: str, response: Response, request: Request,
+                            params: dict = Body(default={})) -> StandardResponse:
+    """
+    Queue a job of the given kind with the keyword arguments in the body. If the same job is already queued or
+    running, its ID is returned instead.
+    """
+    if kind not in job_runner.kinds:
+        response.status_code = 404
+        return StandardResponse(retcode=404, message=f"Job kind {kind} not found")
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    job_id, queued = await job_runner.enqueue(redis_client, kind, params)
+    response.status_code = 202
+    return StandardResponse(message=f"{kind} job {'queued' if queued else 'already queued'}", data={"id": job_id})
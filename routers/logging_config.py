@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, Response, Request
+from redis import asyncio as aioredis
+from pydantic import BaseModel
+from utils.authentication import verify_api_token
+from utils.runtime_config import runtime_config
+from mysql_app.schemas import StandardResponse
+from base_logger import get_logger, get_log_levels, apply_log_levels
+
+
+logger = get_logger(__name__)
+admin_router = APIRouter(tags=["Logging"], prefix="/logging")
+LOG_LEVELS_REDIS_KEY = "config:log-levels"
+VALID_LOG_LEVELS = {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}
+
+
+class LogLevelRequest(BaseModel):
+    logger: str
+    level: str
+
+
+@admin_router.get("/levels", dependencies=[Depends(verify_api_token)])
+async def get_logger_levels(request: Request) -> StandardResponse:
+    """
+    Get the runtime logger levels stored in Redis and the levels currently active in this worker.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    configured = await redis_client.hgetall(LOG_LEVELS_REDIS_KEY)
+    return StandardResponse(data={
+        "configured": {k.decode("utf-8"): v.decode("utf-8") for k, v in configured.items()},
+        "active": get_log_levels()
+    })
+
+
+@admin_router.put("/levels", dependencies=[Depends(verify_api_token)])
+async def set_logger_level(level_request: LogLevelRequest, response: Response, request: Request) -> StandardResponse:
+    """
+    Set the level of a logger at runtime. Use `root` as the logger name for the root logger. Every worker picks the
+    change up within a few seconds.
+    """
+    level = level_request.level.upper()
+    if level not in VALID_LOG_LEVELS:
+        response.status_code = 400
+        return StandardResponse(retcode=400, message=f"Invalid log level: {level_request.level}")
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    await redis_client.hset(LOG_LEVELS_REDIS_KEY, level_request.logger, level)
+    await runtime_config.refresh(redis_client)
+    logger.warning(f"Log level of {level_request.logger} set to {level}")
+    return StandardResponse(data=get_log_levels())
+
+
+@admin_router.delete("/levels/{logger_name}", dependencies=[Depends(verify_api_token)])
+async def reset_logger_level(logger_name: str, response: Response, request: Request) -> StandardResponse:
+    """
+    Drop the runtime override of a logger so it falls back to its default level.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    if not await redis_client.hdel(LOG_LEVELS_REDIS_KEY, logger_name):
+        response.status_code = 404
+        return StandardResponse(retcode=404, message=f"No runtime level set for {logger_name}")
+    await runtime_config.refresh(redis_client)
+    logger.warning(f"Log level of {logger_name} reset")
+    return StandardResponse(data=get_log_levels())
+
+
+runtime_config.register(LOG_LEVELS_REDIS_KEY, apply_log_levels)
@@ -1,20 +1,23 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, HTTPException
 from fastapi.responses import RedirectResponse
 from redis import asyncio as aioredis
 from mysql_app.schemas import StandardResponse
 from cloudflare_security_utils.safety import validate_client_is_updated
+from utils.metrics import record_cache
+from utils.fast_redirect import fast_redirect
+from utils.response_cache import cached_response, render_standard_response, invalidate
+from config import GITHUB_API_URL
 from base_logger import get_logger
 import httpx
 import os
 
-china_router = APIRouter(tags=["Hutao Metadata"], prefix="/metadata")
-global_router = APIRouter(tags=["Hutao Metadata"], prefix="/metadata")
-fujian_router = APIRouter(tags=["Hutao Metadata"], prefix="/metadata")
+router = APIRouter(tags=["Hutao Metadata"], prefix="/metadata")
 logger = get_logger(__name__)
+METADATA_FILE_LIST_TTL = 15 * 60  # seconds
 
 
 async def fetch_metadata_repo_file_list(redis_client: aioredis.Redis) -> None:
-    api_endpoint = "https://api.github.com/repos/DGP-Studio/Snap.Metadata/git/trees/main?recursive=1"
+    api_endpoint = f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Metadata/git/trees/main?recursive=1"
     headers = {
         "Authorization": f"Bearer {os.getenv('GITHUB_PAT')}",
     }
@@ -32,28 +35,72 @@ async def fetch_metadata_repo_file_list(redis_client: aioredis.Redis) -> None:
         languages.add(lang)
 
     async with redis_client.pipeline() as pipe:
+        # Rebuild each set in the same transaction so files removed upstream do not linger
+        for lang in languages:
+            pipe.delete(f"metadata:{lang}")
         for file_path in valid_files:
             parts = file_path.split("/")
             if len(parts) < 3:
                 continue
             file_language = parts[1].upper()
             sub_path = '/'.join(parts[2:])
-            logger.info(f"Adding metadata file {sub_path} to metadata:{file_language}")
             # Do not await; add to queue
             pipe.sadd(f"metadata:{file_language}", sub_path)
 
         # 为每个语言集合设置过期时间
         for lang in languages:
             # Do not await; add to queue
-            pipe.expire(f"metadata:{lang}", 15 * 60)
+            pipe.expire(f"metadata:{lang}", METADATA_FILE_LIST_TTL)
+
+        await pipe.execute()
+    await invalidate(redis_client, "metadata:list")
+    logger.info("Cached %d metadata files in %d languages", len(valid_files), len(languages))
+
+
+async def apply_metadata_repo_push(redis_client: aioredis.Redis, commits: list[dict]) -> bool:
+    """
+    Apply the files added and removed by a push to Snap.Metadata to the cached file lists, without querying GitHub.
 
+    :param commits: commits of the push webhook, oldest first
+
+    :return: False if a file list is not cached and a full refresh is needed instead
+    """
+    added, removed = set(), set()
+    for commit in commits:
+        for file_path in commit.get("added", []):
+            removed.discard(file_path)
+            added.add(file_path)
+        for file_path in commit.get("removed", []):
+            added.discard(file_path)
+            removed.add(file_path)
+
+    changes: dict[str, tuple[list, list]] = {}
+    for file_paths, index in ((added, 0), (removed, 1)):
+        for file_path in file_paths:
+            parts = file_path.split("/")
+            if len(parts) < 3 or not file_path.endswith(".json"):
+                continue
+            changes.setdefault(parts[1].upper(), ([], []))[index].append("/".join(parts[2:]))
+    if not changes:
+        return True
+    # A missing set would be recreated without its other files and without expiry
+    if await redis_client.exists(*[f"metadata:{lang}" for lang in changes]) != len(changes):
+        return False
+
+    async with redis_client.pipeline() as pipe:
+        for lang, (lang_added, lang_removed) in changes.items():
+            if lang_added:
+                pipe.sadd(f"metadata:{lang}", *lang_added)
+            if lang_removed:
+                pipe.srem(f"metadata:{lang}", *lang_removed)
         await pipe.execute()
+    await invalidate(redis_client, "metadata:list")
+    logger.info("Applied metadata push: %d files added, %d removed", len(added), len(removed))
+    return True
 
 
-@china_router.get("/list", dependencies=[Depends(validate_client_is_updated)])
-@global_router.get("/list", dependencies=[Depends(validate_client_is_updated)])
-@fujian_router.get("/list", dependencies=[Depends(validate_client_is_updated)])
-async def metadata_list_handler(request: Request, lang: str) -> StandardResponse:
+@router.get("/list", dependencies=[Depends(validate_client_is_updated)])
+async def metadata_list_handler(request: Request, lang: str) -> Response:
     """
     List all available metadata files.
 
@@ -64,34 +111,29 @@ async def metadata_list_handler(request: Request, lang: str) -> StandardResponse
     lang = lang.upper()
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
 
-    if request.url.path.startswith("/cn"):
-        metadata_endpoint = await redis_client.get("url:china:metadata")
-    elif request.url.path.startswith("/global"):
-        metadata_endpoint = await redis_client.get("url:global:metadata")
-    elif request.url.path.startswith("/fj"):
-        metadata_endpoint = await redis_client.get("url:fujian:metadata")
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
-    metadata_endpoint = metadata_endpoint.decode("utf-8")
+    async def render() -> bytes:
+        metadata_endpoint = await redis_client.get(f"url:{request.state.redis_region}:metadata")
+        metadata_endpoint = metadata_endpoint.decode("utf-8")
 
-    metadata_file_list = await redis_client.smembers(f"metadata:{lang}")
-    if not metadata_file_list:
-        await fetch_metadata_repo_file_list(redis_client)
         metadata_file_list = await redis_client.smembers(f"metadata:{lang}")
-        logger.info(f"{len(metadata_file_list)} metadata files are available: {metadata_file_list}")
-    if not metadata_file_list:
-        raise HTTPException(status_code=404, detail="No metadata files found")
-    metadata_file_list = [file.decode("utf-8") for file in metadata_file_list]
-    download_links = [metadata_endpoint.format(file_path=f"{lang}/{file}") for file in metadata_file_list]
-
-    return StandardResponse(
-        data=download_links
-    )
-
-
-@china_router.get("/template", dependencies=[Depends(validate_client_is_updated)])
-@global_router.get("/template", dependencies=[Depends(validate_client_is_updated)])
-@fujian_router.get("/template", dependencies=[Depends(validate_client_is_updated)])
+        record_cache("metadata_file_list", bool(metadata_file_list))
+        if not metadata_file_list:
+            await fetch_metadata_repo_file_list(redis_client)
+            metadata_file_list = await redis_client.smembers(f"metadata:{lang}")
+            logger.debug("%d metadata files are available for %s: %s", len(metadata_file_list), lang,
+                         metadata_file_list)
+        if not metadata_file_list:
+            raise HTTPException(status_code=404, detail="No metadata files found")
+        metadata_file_list = [file.decode("utf-8") for file in metadata_file_list]
+        download_links = [metadata_endpoint.format(file_path=f"{lang}/{file}") for file in metadata_file_list]
+        return render_standard_response(data=download_links)
+
+    # The file lists expire, so their responses must not outlive them
+    return await cached_response(redis_client, request.headers, "metadata:list",
+                                 f"{request.state.redis_region}:{lang}", render, ttl=METADATA_FILE_LIST_TTL)
+
+
+@router.get("/template", dependencies=[Depends(validate_client_is_updated)])
 async def metadata_template_handler(request: Request) -> StandardResponse:
     """
     Get the metadata template.
@@ -100,14 +142,7 @@ async def metadata_template_handler(request: Request) -> StandardResponse:
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
 
-    if request.url.path.startswith("/cn"):
-        metadata_endpoint = await redis_client.get("url:china:metadata")
-    elif request.url.path.startswith("/global"):
-        metadata_endpoint = await redis_client.get("url:global:metadata")
-    elif request.url.path.startswith("/fj"):
-        metadata_endpoint = await redis_client.get("url:fujian:metadata")
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
+    metadata_endpoint = await redis_client.get(f"url:{request.state.redis_region}:metadata")
     metadata_endpoint = metadata_endpoint.decode("utf-8")
     metadata_endpoint = metadata_endpoint.replace("{file_path}", "{0}")
     return StandardResponse(
@@ -115,46 +150,9 @@ async def metadata_template_handler(request: Request) -> StandardResponse:
     )
 
 
-@china_router.get("/{file_path:path}", dependencies=[Depends(validate_client_is_updated)])
-async def china_metadata_request_handler(request: Request, file_path: str) -> RedirectResponse:
-    """
-    Handle requests to metadata files.
-
-    :param request: Request object
-
-    :param file_path: Path to the metadata file
-
-    :return: HTTP 301 redirect to the file based on censorship status of the file
-    """
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-
-    china_metadata_endpoint = await redis_client.get("url:china:metadata")
-    china_metadata_endpoint = china_metadata_endpoint.decode("utf-8").format(file_path=file_path)
-
-    return RedirectResponse(china_metadata_endpoint, status_code=301)
-
-
-@global_router.get("/{file_path:path}", dependencies=[Depends(validate_client_is_updated)])
-async def global_metadata_request_handler(request: Request, file_path: str) -> RedirectResponse:
-    """
-    Handle requests to metadata files.
-
-    :param request: Request object
-
-    :param file_path: Path to the metadata file
-
-    :return: HTTP 301 redirect to the file based on censorship status of the file
-    """
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-
-    global_metadata_endpoint = await redis_client.get("url:global:metadata")
-    global_metadata_endpoint = global_metadata_endpoint.decode("utf-8").format(file_path=file_path)
-
-    return RedirectResponse(global_metadata_endpoint, status_code=301)
-
-
-@fujian_router.get("/{file_path:path}", dependencies=[Depends(validate_client_is_updated)])
-async def fujian_metadata_request_handler(request: Request, file_path: str) -> RedirectResponse:
+@router.get("/{file_path:path}", dependencies=[Depends(validate_client_is_updated)])
+@fast_redirect(validate_client_is_updated)
+async def metadata_request_handler(request: Request, file_path: str) -> RedirectResponse:
     """
     Handle requests to metadata files.
 
@@ -166,7 +164,7 @@ async def fujian_metadata_request_handler(request: Request, file_path: str) -> R
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
 
-    fujian_metadata_endpoint = await redis_client.get("url:fujian:metadata")
-    fujian_metadata_endpoint = fujian_metadata_endpoint.decode("utf-8").format(file_path=file_path)
+    metadata_endpoint = await redis_client.get(f"url:{request.state.redis_region}:metadata")
+    metadata_endpoint = metadata_endpoint.decode("utf-8").format(file_path=file_path)
 
-    return RedirectResponse(fujian_metadata_endpoint, status_code=301)
+    return RedirectResponse(metadata_endpoint, status_code=301)
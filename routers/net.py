@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request
 from mysql_app.schemas import StandardResponse
 
-china_router = APIRouter(tags=["Network"])
-global_router = APIRouter(tags=["Network"])
-fujian_router = APIRouter(tags=["Network"])
+router = APIRouter(tags=["Network"])
+NETWORK_DIVISIONS = {
+    "cn": "China",
+    "global": "Oversea",
+    "fj": "Fujian - China"
+}
 
 
-@china_router.get("/ip", response_model=StandardResponse)
-@global_router.get("/ip", response_model=StandardResponse)
-@fujian_router.get("/ip", response_model=StandardResponse)
+@router.get("/ip", response_model=StandardResponse)
 def get_client_ip_geo(request: Request) -> StandardResponse:
     """
     Get the client's IP address and division.
@@ -17,15 +18,7 @@ def get_client_ip_geo(request: Request) -> StandardResponse:
 
     :return: Standard response with the client's IP address and division
     """
-    req_path = request.url.path
-    if req_path.startswith("/cn"):
-        division = "China"
-    elif req_path.startswith("/global"):
-        division = "Oversea"
-    elif req_path.startswith("/fj"):
-        division = "Fujian - China"
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
+    division = NETWORK_DIVISIONS[request.state.region]
 
     return StandardResponse(
         retcode=0,
@@ -36,9 +29,7 @@ def get_client_ip_geo(request: Request) -> StandardResponse:
         }
     )
 
-@china_router.get("/ips")
-@global_router.get("/ips")
-@fujian_router.get("/ips")
+@router.get("/ips")
 def return_ip_addr(request: Request):
     """
     Get the client's IP address.
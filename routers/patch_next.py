@@ -1,50 +1,75 @@
 import httpx
 import os
+import asyncio
+import hashlib
 from redis import asyncio as aioredis
 import json
-from fastapi import APIRouter, Response, status, Request, Depends
-from fastapi.responses import RedirectResponse
+import orjson
+from fastapi import APIRouter, Response, status, Request, Depends, Header, Query
+from fastapi.responses import RedirectResponse, StreamingResponse
 from datetime import datetime
 from pydantic.json import pydantic_encoder
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from fastapi.encoders import jsonable_encoder
 from utils.dgp_utils import update_recent_versions
 from utils.PatchMeta import PatchMeta, MirrorMeta
+from utils.mirrors import (mirrors_key, parse_mirrors, get_mirrors, set_mirror, delete_mirror, clear_mirrors,
+                           migrate_legacy_mirrors)
+from utils.mirror_selection import rank_mirrors, select_mirror
+from utils.rollout import (ROLLOUT_REDIS_KEY, PREVIOUS_PATCH_REDIS_KEY, serves_new_version, start_rollout, get_rollout,
+                           update_rollout)
+from utils.patch_notifier import patch_notifier, publish_patch_change
 from utils.authentication import verify_api_token
+from utils.jobs import job_runner
 from utils.stats import record_device_id
+from utils.metrics import record_cache
+from utils.responses import ORJSONResponse, standard_response
 from mysql_app.schemas import StandardResponse
-from config import github_headers, VALID_PROJECT_KEYS
+from config import github_headers, VALID_PROJECT_KEYS, GITHUB_API_URL
 from base_logger import get_logger
-from typing import Literal
+from typing import Literal, Optional
 
 logger = get_logger(__name__)
-china_router = APIRouter(tags=["Patch"], prefix="/patch")
-global_router = APIRouter(tags=["Patch"], prefix="/patch")
-fujian_router = APIRouter(tags=["Patch"], prefix="/patch")
+router = APIRouter(tags=["Patch"], prefix="/patch")
+# Version change notifications; clients hold a request open instead of polling /patch/hutao
+WATCH_DEFAULT_TIMEOUT = 60  # seconds
+# Below the 100 s Cloudflare allows a proxied request, which otherwise ends the poll with a 524
+WATCH_MAX_TIMEOUT = 90  # seconds
+SSE_HEARTBEAT_INTERVAL = 30  # seconds
+SSE_RETRY_INTERVAL = 10  # seconds
+# Installers of releases without an asset digest are hashed once per version
+DEPLOYMENT_CHECKSUM_TIMEOUT = 60  # seconds
+DEPLOYMENT_CHECKSUM_TTL = 90 * 24 * 60 * 60  # seconds
+# Seeded into the China mirror list of every new Snap Hutao Deployment version
+STATIC_DEPLOYMENT_MIRRORS = [
+    MirrorMeta(
+        url="https://api.qhy04.com/hutaocdn/deployment",
+        mirror_name="QHY CDN",
+        mirror_type="direct"
+    )
+]
 
 
-def fetch_snap_hutao_github_latest_version() -> PatchMeta:
+def snap_hutao_patch_meta_from_release(github_meta: dict) -> PatchMeta:
     """
-    ## Fetch Snap Hutao GitHub Latest Version
+    ## Build Snap Hutao Patch Metadata from a GitHub Release
+
+    Extracts the MSIX asset download URL and, if available, its SHA256 digest from a GitHub release object, as
+    returned by the releases API and sent in release webhooks.
 
-    Fetches the latest release metadata from GitHub for Snap Hutao. Extracts the MSIX asset download URL and, if available, the SHA256SUMS.
-    
     **Restrictions:**
-    - Requires valid GitHub headers.
     - Raises ValueError if the MSIX asset is missing.
     """
 
     # Output variables
     github_msix_url = None
     sha256sums_value = None
-    github_meta = httpx.get("https://api.github.com/repos/DGP-Studio/Snap.Hutao/releases/latest",
-                            headers=github_headers).json()
 
     # Release asset (MSIX)
     for asset in github_meta["assets"]:
         if asset["name"].endswith(".msix"):
             github_msix_url = asset["browser_download_url"]
-            sha256sums_value = asset.get("digest", None).replace("sha256:", "").strip()
+            sha256sums_value = (asset.get("digest") or "").replace("sha256:", "").strip()
 
     if github_msix_url is None:
         raise ValueError("Failed to get Snap Hutao latest version from GitHub")
@@ -58,16 +83,32 @@ def fetch_snap_hutao_github_latest_version() -> PatchMeta:
 
     github_path_meta = PatchMeta(
         version=github_meta["tag_name"] + ".0",
-        validation=sha256sums_value if sha256sums_value else None,
+        validation=sha256sums_value,
         cache_time=datetime.now(),
         file_name=github_file_name,
         mirrors=[github_mirror]
     )
-    logger.debug(f"GitHub data fetched: {github_path_meta}")
+    logger.debug("GitHub data fetched: %s", github_path_meta)
     return github_path_meta
 
 
-async def update_snap_hutao_latest_version(redis_client: aioredis.client.Redis) -> dict:
+def fetch_snap_hutao_github_latest_version() -> PatchMeta:
+    """
+    ## Fetch Snap Hutao GitHub Latest Version
+
+    Fetches the latest release metadata from GitHub for Snap Hutao.
+    
+    **Restrictions:**
+    - Requires valid GitHub headers.
+    - Raises ValueError if the MSIX asset is missing.
+    """
+    github_meta = httpx.get(f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Hutao/releases/latest",
+                            headers=github_headers).json()
+    return snap_hutao_patch_meta_from_release(github_meta)
+
+
+async def update_snap_hutao_latest_version(redis_client: aioredis.client.Redis,
+                                           github_release: dict | None = None) -> dict:
     """
     ## Update Snap Hutao Latest Version (GitHub)
 
@@ -76,49 +117,110 @@ async def update_snap_hutao_latest_version(redis_client: aioredis.client.Redis)
     **Restrictions:**
     - Expects a valid Redis client.
     - Assumes data in Redis is correctly formatted.
-    """
-    github_message = ""
 
+    :param github_release: release object of a release webhook; GitHub is queried when omitted
+    """
     # handle GitHub release
-    github_patch_meta = fetch_snap_hutao_github_latest_version()
-    cn_patch_meta = github_patch_meta.model_copy(deep=True)
-    logger.debug(f"GitHub data: {github_patch_meta}")
+    if github_release is None:
+        github_patch_meta = await asyncio.to_thread(fetch_snap_hutao_github_latest_version)
+    else:
+        github_patch_meta = snap_hutao_patch_meta_from_release(github_release)
+    logger.debug("GitHub data: %s", github_patch_meta)
 
     # Clear mirror URL if the version is updated
-    try:
-        redis_cached_version = await redis_client.get("snap-hutao:version")
-        redis_cached_version = str(redis_cached_version.decode("utf-8"))
-        if redis_cached_version != github_patch_meta.version:
-            logger.info(f"Find update for Snap Hutao version: {redis_cached_version} -> {github_patch_meta.version}")
-            # Re-initial the mirror list with empty data
-            logger.info(
-                f"Found unmatched version, clearing mirrors URL. Deleting version [{redis_cached_version}]: {await redis_client.delete(f'snap-hutao:mirrors:{redis_cached_version}')}")
-            logger.info(
-                f"Set Snap Hutao latest version to Redis: {await redis_client.set('snap-hutao:version', github_patch_meta.version)}")
-        else:
-            try:
-                current_mirrors = await redis_client.get(f"snap-hutao:mirrors:{cn_patch_meta.version}")
-                current_mirrors = json.loads(current_mirrors)
-            except TypeError:
-                current_mirrors = []
-            for m in current_mirrors:
-                this_mirror = MirrorMeta(**m)
-                cn_patch_meta.mirrors.append(this_mirror)
-    except AttributeError:
-        pass
-
-    return_data = {
-        "global": github_patch_meta.model_dump(),
-        "cn": cn_patch_meta.model_dump(),
-        "github_message": github_message,
-        "gitlab_message": github_message
-    }
-    logger.info(f"Set Snap Hutao latest version to Redis: {await redis_client.set('snap-hutao:patch',
-                                                                                  json.dumps(return_data, default=str))}")
+    redis_cached_version = await redis_client.get("snap-hutao:version")
+    redis_cached_version = redis_cached_version.decode("utf-8") if redis_cached_version else None
+    if redis_cached_version != github_patch_meta.version:
+        logger.info("Find update for Snap Hutao version: %s -> %s", redis_cached_version, github_patch_meta.version)
+        if redis_cached_version:
+            deleted = await clear_mirrors(redis_client, "snap-hutao", redis_cached_version)
+            logger.info("Found unmatched version, clearing mirrors URL. Deleting version [%s]: %s",
+                        redis_cached_version, deleted)
+        set_result = await redis_client.set("snap-hutao:version", github_patch_meta.version)
+        logger.info("Set Snap Hutao latest version to Redis: %s", set_result)
+        # Keep serving the replaced version to devices outside the rollout cohort
+        await start_rollout(redis_client, await redis_client.get("snap-hutao:patch"), github_patch_meta.version)
+    else:
+        await migrate_legacy_mirrors(redis_client, "snap-hutao", github_patch_meta.version)
+
+    return await build_snap_hutao_patch(redis_client, github_patch_meta)
+
+
+async def build_snap_hutao_patch(redis_client: aioredis.client.Redis,
+                                 github_patch_meta: PatchMeta | None = None) -> dict:
+    """
+    ## Build Snap Hutao Patch Metadata
+
+    Combines the GitHub release metadata with the overridden mirror URLs into `snap-hutao:patch`. Without
+    `github_patch_meta`, the release already cached in `snap-hutao:patch` is reused, so mirror changes need no GitHub
+    call. The mirror hash is watched while building; a concurrent mirror change makes the build start over, so the
+    payload never misses a mirror.
+    """
+    if github_patch_meta is None:
+        github_patch_meta = PatchMeta(**orjson.loads(await redis_client.get("snap-hutao:patch"))["global"])
+    key = mirrors_key("snap-hutao", github_patch_meta.version)
+
+    async def build(pipe) -> dict:
+        cn_patch_meta = github_patch_meta.model_copy(deep=True)
+        overridden_mirrors = parse_mirrors(await pipe.hgetall(key))
+        if overridden_mirrors:
+            # China downloads go to the overridden mirrors; GitHub stays listed as the fallback
+            for mirror in cn_patch_meta.mirrors:
+                mirror.weight = 0
+        cn_patch_meta.mirrors.extend(overridden_mirrors)
+        return_data = {
+            "global": github_patch_meta.model_dump(),
+            "cn": cn_patch_meta.model_dump(),
+            "github_message": "",
+            "gitlab_message": ""
+        }
+        pipe.multi()
+        pipe.set("snap-hutao:patch", json.dumps(return_data, default=str))
+        return return_data
+
+    return_data = await redis_client.transaction(build, key, value_from_callable=True)
+    logger.info("Set Snap Hutao patch metadata to Redis for version %s", github_patch_meta.version)
+    await publish_patch_change(redis_client, github_patch_meta.version)
     return return_data
 
 
-async def update_snap_hutao_deployment_version(redis_client: aioredis.client.Redis) -> dict:
+async def get_snap_hutao_deployment_checksum(redis_client: aioredis.client.Redis, version: str, url: str,
+                                             compute: bool = True) -> str:
+    """
+    ## Get Snap Hutao Deployment Checksum
+
+    SHA256 of a Snap Hutao Deployment installer whose release asset carries no digest. It is computed once per
+    version by streaming the installer and cached in `snap-hutao-deployment:sha256:{version}`.
+
+    **Restrictions:**
+    - Returns an empty string if the download fails; it is retried on the next refresh.
+    - Only reads the cached checksum when `compute` is False.
+    """
+    key = f"snap-hutao-deployment:sha256:{version}"
+    cached_checksum = await redis_client.get(key)
+    if cached_checksum is not None:
+        return cached_checksum.decode("utf-8")
+    if not compute:
+        return ""
+    sha256 = hashlib.sha256()
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=DEPLOYMENT_CHECKSUM_TIMEOUT) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    sha256.update(chunk)
+    except httpx.HTTPError as e:
+        logger.warning("Failed to compute SHA256 of Snap Hutao Deployment %s: %r", version, e)
+        return ""
+    checksum = sha256.hexdigest()
+    await redis_client.set(key, checksum, ex=DEPLOYMENT_CHECKSUM_TTL)
+    logger.info("Computed SHA256 of Snap Hutao Deployment %s: %s", version, checksum)
+    return checksum
+
+
+async def update_snap_hutao_deployment_version(redis_client: aioredis.client.Redis,
+                                               github_release: dict | None = None,
+                                               compute_checksum: bool = True) -> dict:
     """
     ## Update Snap Hutao Deployment Latest Version (GitHub)
 
@@ -127,60 +229,82 @@ async def update_snap_hutao_deployment_version(redis_client: aioredis.client.Red
     **Restrictions:**
     - Raises ValueError if the executable asset is not found.
     - Requires a valid Redis client.
+
+    :param github_release: release object of a release webhook; GitHub is queried when omitted
+    :param compute_checksum: False to skip downloading the installer of a release without an asset digest, leaving
+    its checksum to the next refresh
     """
-    github_meta = httpx.get("https://api.github.com/repos/DGP-Studio/Snap.Hutao.Deployment/releases/latest",
-                            headers=github_headers).json()
+    if github_release is None:
+        async with httpx.AsyncClient() as client:
+            github_meta = (await client.get(
+                f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Hutao.Deployment/releases/latest",
+                headers=github_headers)).json()
+    else:
+        github_meta = github_release
     exe_file_name = None
     github_exe_url = None
+    sha256sums_value = None
     for asset in github_meta["assets"]:
         if asset["name"].endswith(".exe"):
             github_exe_url = asset["browser_download_url"]
             exe_file_name = asset["name"]
+            sha256sums_value = (asset.get("digest") or "").replace("sha256:", "").strip()
     if github_exe_url is None:
         raise ValueError("Failed to get Snap Hutao Deployment latest version from GitHub")
+    if not sha256sums_value:
+        sha256sums_value = await get_snap_hutao_deployment_checksum(redis_client, github_meta["tag_name"] + ".0",
+                                                                    github_exe_url, compute_checksum)
     github_patch_meta = PatchMeta(
         version=github_meta["tag_name"] + ".0",
-        validation="",
+        validation=sha256sums_value,
         cache_time=datetime.now(),
         file_name=exe_file_name,
         mirrors=[MirrorMeta(url=github_exe_url, mirror_name="GitHub", mirror_type="direct")]
     )
-    cn_patch_meta = github_patch_meta.model_copy(deep=True)
-    static_deployment_mirror_list = [
-        MirrorMeta(
-            url="https://api.qhy04.com/hutaocdn/deployment",
-            mirror_name="QHY CDN",
-            mirror_type="direct"
-        )
-    ]
-    cn_patch_meta.mirrors = static_deployment_mirror_list
 
     current_cached_version = await redis_client.get("snap-hutao-deployment:version")
-    current_cached_version = current_cached_version.decode("utf-8")
-    logger.info(f"Current cached version: {current_cached_version}; Latest GitHub version: {cn_patch_meta.version}")
-    if current_cached_version != cn_patch_meta.version:
-        logger.info(
-            f"Found unmatched version, clearing mirrors. Setting Snap Hutao Deployment latest version to Redis: {await redis_client.set('snap-hutao-deployment:version', cn_patch_meta.version)}")
-        logger.info(
-            f"Reinitializing mirrors for Snap Hutao Deployment: {await redis_client.set(f'snap-hutao-deployment:mirrors:{cn_patch_meta.version}', json.dumps(cn_patch_meta.mirrors, default=pydantic_encoder))}")
+    current_cached_version = current_cached_version.decode("utf-8") if current_cached_version else None
+    logger.info("Current cached version: %s; Latest GitHub version: %s", current_cached_version,
+                github_patch_meta.version)
+    if current_cached_version != github_patch_meta.version:
+        set_result = await redis_client.set("snap-hutao-deployment:version", github_patch_meta.version)
+        logger.info("Found unmatched version, clearing mirrors. Setting Snap Hutao Deployment latest version to "
+                    "Redis: %s", set_result)
     else:
-        try:
-            current_mirrors = json.loads(
-                await redis_client.get(f"snap-hutao-deployment:mirrors:{cn_patch_meta.version}"))
-            for m in current_mirrors:
-                this_mirror = MirrorMeta(**m)
-                cn_patch_meta.mirrors.append(this_mirror)
-        except TypeError:
-            # New initialization
-            mirror_json = json.dumps(cn_patch_meta.mirrors, default=pydantic_encoder)
-            await redis_client.set(f"snap-hutao-deployment:mirrors:{cn_patch_meta.version}", mirror_json)
-
-    return_data = {
-        "global": github_patch_meta.model_dump(),
-        "cn": cn_patch_meta.model_dump()
-    }
-    logger.info(f"Set Snap Hutao Deployment latest version to Redis: "
-                f"{await redis_client.set('snap-hutao-deployment:patch', json.dumps(return_data, default=pydantic_encoder))}")
+        await migrate_legacy_mirrors(redis_client, "snap-hutao-deployment", github_patch_meta.version)
+    if not await redis_client.exists(mirrors_key("snap-hutao-deployment", github_patch_meta.version)):
+        for mirror in STATIC_DEPLOYMENT_MIRRORS:
+            await set_mirror(redis_client, "snap-hutao-deployment", github_patch_meta.version, mirror)
+        logger.info("Reinitializing mirrors for Snap Hutao Deployment %s", github_patch_meta.version)
+
+    return await build_snap_hutao_deployment_patch(redis_client, github_patch_meta)
+
+
+async def build_snap_hutao_deployment_patch(redis_client: aioredis.client.Redis,
+                                            github_patch_meta: PatchMeta | None = None) -> dict:
+    """
+    ## Build Snap Hutao Deployment Patch Metadata
+
+    Writes `snap-hutao-deployment:patch` from the GitHub release metadata and the mirror hash, the same way as
+    `build_snap_hutao_patch`. China endpoints are served only the mirrors from the hash.
+    """
+    if github_patch_meta is None:
+        github_patch_meta = PatchMeta(**orjson.loads(await redis_client.get("snap-hutao-deployment:patch"))["global"])
+    key = mirrors_key("snap-hutao-deployment", github_patch_meta.version)
+
+    async def build(pipe) -> dict:
+        cn_patch_meta = github_patch_meta.model_copy(deep=True)
+        cn_patch_meta.mirrors = parse_mirrors(await pipe.hgetall(key))
+        return_data = {
+            "global": github_patch_meta.model_dump(),
+            "cn": cn_patch_meta.model_dump()
+        }
+        pipe.multi()
+        pipe.set("snap-hutao-deployment:patch", json.dumps(return_data, default=pydantic_encoder))
+        return return_data
+
+    return_data = await redis_client.transaction(build, key, value_from_callable=True)
+    logger.info("Set Snap Hutao Deployment patch metadata to Redis for version %s", github_patch_meta.version)
     return return_data
 
 
@@ -195,8 +319,9 @@ async def fetch_snap_hutao_alpha_latest_version(redis_client: aioredis.client.Re
     - Requires valid GitHub Actions response.
     """
     # Fetch the workflow runs
-    github_meta = httpx.get("https://api.github.com/repos/DGP-Studio/Snap.Hutao/actions/workflows/alpha.yml/runs",
-                            headers=github_headers)
+    async with httpx.AsyncClient() as client:
+        github_meta = await client.get(f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Hutao/actions/workflows/alpha.yml/runs",
+                                       headers=github_headers)
     runs = github_meta.json()["workflow_runs"]
 
     # Find the latest successful run
@@ -207,10 +332,11 @@ async def fetch_snap_hutao_alpha_latest_version(redis_client: aioredis.client.Re
         return None
 
     run_id = latest_successful_run["id"]
-    artifacts_url = f"https://api.github.com/repos/DGP-Studio/Snap.Hutao/actions/runs/{run_id}/artifacts"
+    artifacts_url = f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Hutao/actions/runs/{run_id}/artifacts"
 
     # Fetch artifacts for the successful run
-    artifacts_response = httpx.get(artifacts_url, headers=github_headers)
+    async with httpx.AsyncClient() as client:
+        artifacts_response = await client.get(artifacts_url, headers=github_headers)
     artifacts = artifacts_response.json()["artifacts"]
 
     # Extract asset download URLs
@@ -244,158 +370,146 @@ async def fetch_snap_hutao_alpha_latest_version(redis_client: aioredis.client.Re
     resp = await redis_client.set("snap-hutao-alpha:patch",
                                   json.dumps(github_path_meta.model_dump(), default=str),
                                   ex=60 * 10)
-    logger.info(f"Set Snap Hutao Alpha latest version to Redis: {resp} {github_path_meta}")
+    logger.info("Set Snap Hutao Alpha latest version %s to Redis: %s", github_path_meta.version, resp)
+    logger.debug("Snap Hutao Alpha patch data: %s", github_path_meta)
     return github_path_meta.model_dump()
 
 
-# Snap Hutao
-@china_router.get("/hutao", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-@fujian_router.get("/hutao", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-async def generic_get_snap_hutao_latest_version_china_endpoint(request: Request) -> StandardResponse:
+async def snap_hutao_patch_for(redis_client: aioredis.client.Redis, region: str, device_id: str | None) -> dict:
     """
-    ## Get Snap Hutao Latest Version (China Endpoint)
-
-    Returns the latest Snap Hutao version metadata from Redis for China users, including mirror URLs and SHA256 validation.
-    
-    **Restrictions:**
-    - Expects valid JSON data from Redis.
+    Snap Hutao patch metadata served to a device: the version of its rollout cohort, with the mirrors of the region.
     """
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-
-    snap_hutao_latest_version = await redis_client.get("snap-hutao:patch")
-    snap_hutao_latest_version = json.loads(snap_hutao_latest_version)
+    snap_hutao_latest_version, rollout = await redis_client.mget("snap-hutao:patch", ROLLOUT_REDIS_KEY)
+    snap_hutao_latest_version = orjson.loads(snap_hutao_latest_version)
+    if rollout is not None and not serves_new_version(orjson.loads(rollout), snap_hutao_latest_version["cn"]["version"],
+                                                       device_id):
+        previous_version = await redis_client.get(PREVIOUS_PATCH_REDIS_KEY)
+        if previous_version is not None:
+            snap_hutao_latest_version = orjson.loads(previous_version)
 
     # For compatibility purposes
-    return_data = snap_hutao_latest_version["cn"]
-    urls = [m["url"] for m in snap_hutao_latest_version["cn"]["mirrors"] if "archive" not in m["url"]]
-    urls.reverse()
+    return_data = snap_hutao_latest_version[region]
+    urls = [m["url"] for m in rank_mirrors(return_data["mirrors"]) if "archive" not in m["url"]]
     return_data["urls"] = urls
     return_data["sha256"] = snap_hutao_latest_version["cn"]["validation"]
-
-    """
-    try:
-        allowed_user_agents = await redis_client.get("allowed_user_agents")
-        allowed_user_agents = json.loads(allowed_user_agents)
-        current_ua = request.headers.get("User-Agent", "")
-        if allowed_user_agents:
-            if current_ua in allowed_user_agents:
-                retcode = 0
-                message = f"CN endpoint reached. {snap_hutao_latest_version['gitlab_message']}"
-            else:
-                retcode = 418
-                message = "过时的客户端，请更新到最新版本。"
-        else:
-            retcode = 0
-            message = "CN endpoint reached."
-    except TypeError:
-        retcode = 0
-        message = "CN endpoint reached."
-    """
-
-
-    return StandardResponse(
-        retcode = 0,
-        message = "CN endpoint reached.",
-        data=return_data
-    )
+    return return_data
 
 
-@china_router.get("/hutao/download")
-@fujian_router.get("/hutao/download")
-async def get_snap_hutao_latest_download_direct_china_endpoint(request: Request) -> RedirectResponse:
+# Snap Hutao
+@router.get("/hutao", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
+async def generic_get_snap_hutao_latest_version(request: Request,
+                                                x_hutao_device_id: Optional[str] = Header(None)) -> ORJSONResponse:
     """
-    ## Redirect to Snap Hutao Download (China Endpoint)
+    ## Get Snap Hutao Latest Version
 
-    Redirects the user to the primary download link for the Snap Hutao China version, appending SHA256 checksum if available.
+    Returns the latest Snap Hutao version metadata from Redis, including mirror URLs and SHA256 validation. China and
+    Fujian endpoints get the China mirrors, the global endpoint gets the global mirrors. While a new version is being
+    rolled out, devices outside the rollout cohort still get the previous version.
     
     **Restrictions:**
-    - Assumes available mirror URLs in Redis.
+    - Expects valid JSON data from Redis.
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    snap_hutao_latest_version = await redis_client.get("snap-hutao:patch")
-    snap_hutao_latest_version = json.loads(snap_hutao_latest_version)
-    checksum_value = snap_hutao_latest_version["cn"]["validation"]
-    headers = {
-        "X-Checksum-Sha256": checksum_value
-    } if checksum_value else {}
-    return RedirectResponse(snap_hutao_latest_version["cn"]["mirrors"][-1]["url"], status_code=301, headers=headers)
+    region = request.state.region_group
+    return_data = await snap_hutao_patch_for(redis_client, region, x_hutao_device_id)
+    return standard_response(
+        retcode=0,
+        message="Global endpoint reached." if region == "global" else "CN endpoint reached.",
+        data=return_data
+    )
 
 
-@global_router.get("/hutao", response_model=StandardResponse, dependencies=[Depends(record_device_id)])
-async def generic_get_snap_hutao_latest_version_global_endpoint(request: Request) -> StandardResponse:
+@router.get("/hutao/watch", response_model=StandardResponse)
+async def watch_snap_hutao_latest_version(request: Request, version: str,
+                                          timeout: int = Query(default=WATCH_DEFAULT_TIMEOUT, ge=1,
+                                                               le=WATCH_MAX_TIMEOUT),
+                                          x_hutao_device_id: Optional[str] = Header(None)) -> Response:
     """
-    ## Get Snap Hutao Latest Version (Global Endpoint)
+    ## Watch Snap Hutao Latest Version (Long Polling)
+
+    Returns the same metadata as `/patch/hutao` as soon as the version served to the device differs from `version`,
+    either right away or when a new version is published or the rollout reaches the device. Replaces polling
+    `/patch/hutao` on a timer; call again after each response.
 
-    Retrieves the Snap Hutao latest version metadata from Redis for global users, merging mirror URLs and validation data.
-    
     **Restrictions:**
-    - Expects properly structured Redis data.
+    - Returns HTTP 204 with no body if nothing changed within `timeout` seconds (default 60, at most 90).
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    snap_hutao_latest_version = await redis_client.get("snap-hutao:patch")
-    snap_hutao_latest_version = json.loads(snap_hutao_latest_version)
-
-    # For compatibility purposes
-    return_data = snap_hutao_latest_version["global"]
-    urls = [m["url"] for m in snap_hutao_latest_version["global"]["mirrors"] if "archive" not in m["url"]]
-    urls.reverse()
-    return_data["urls"] = urls
-    return_data["sha256"] = snap_hutao_latest_version["cn"]["validation"]
-
-
-    """
-    try:
-        allowed_user_agents = await redis_client.get("allowed_user_agents")
-        allowed_user_agents = json.loads(allowed_user_agents)
-        current_ua = request.headers.get("User-Agent", "")
-        if allowed_user_agents:
-            if current_ua in allowed_user_agents:
-                retcode = 0
-                message = f"Global endpoint reached. {snap_hutao_latest_version['github_message']}"
-            else:
-                retcode = 418
-                message = "Outdated client, please update to the latest version. 过时的客户端版本，请更新到最新版本。"
-        else:
-            retcode = 0
-            message = "Global endpoint reached."
-    except TypeError:
-        retcode = 0
-        message = "Global endpoint reached."
-
-    message = message if isinstance(message, str) else message[0]
-    """
-
-    return StandardResponse(
-        retcode=0,
-        message="Global endpoint reached.",
-        data=return_data
-    )
-
-
-@global_router.get("/hutao/download")
-async def get_snap_hutao_latest_download_direct_china_endpoint(request: Request) -> RedirectResponse:
+    region = request.state.region_group
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        change = patch_notifier.next_change()
+        return_data = await snap_hutao_patch_for(redis_client, region, x_hutao_device_id)
+        if return_data["version"] != version:
+            return standard_response(
+                retcode=0,
+                message="Global endpoint reached." if region == "global" else "CN endpoint reached.",
+                data=return_data
+            )
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0 or not await patch_notifier.wait(change, remaining):
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/hutao/events")
+async def stream_snap_hutao_latest_version(request: Request, version: Optional[str] = None,
+                                           last_event_id: Optional[str] = Header(None),
+                                           x_hutao_device_id: Optional[str] = Header(None)) -> StreamingResponse:
+    """
+    ## Stream Snap Hutao Latest Version (Server-Sent Events)
+
+    Sends a `version` event carrying the same metadata as `/patch/hutao` whenever the version served to the device
+    changes, starting with the current one unless it equals `version`. Event IDs are versions, so a reconnecting
+    `EventSource` resumes from the last version it received. A comment is sent every 30 seconds to keep the
+    connection open through proxies.
     """
-    ## Redirect to Snap Hutao Download (Global Endpoint)
-
-    Redirects the user to the primary download link for the Snap Hutao global version, with checksum in headers if available.
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    region = request.state.region_group
+
+    async def events():
+        current_version = version or last_event_id
+        yield f"retry: {SSE_RETRY_INTERVAL * 1000}\n\n"
+        while True:
+            change = patch_notifier.next_change()
+            return_data = await snap_hutao_patch_for(redis_client, region, x_hutao_device_id)
+            if return_data["version"] != current_version:
+                current_version = return_data["version"]
+                yield f"event: version\nid: {current_version}\ndata: {orjson.dumps(return_data).decode()}\n\n"
+            if not await patch_notifier.wait(change, SSE_HEARTBEAT_INTERVAL):
+                if await request.is_disconnected():
+                    return
+                yield ": heartbeat\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/hutao/download")
+async def get_snap_hutao_latest_download_direct(request: Request,
+                                                x_hutao_device_id: Optional[str] = Header(None)) -> RedirectResponse:
+    """
+    ## Redirect to Snap Hutao Download
+
+    Redirects the user to a healthy mirror of the Snap Hutao version of the endpoint region, appending SHA256 checksum
+    if available. Mirrors are chosen by weight and the same device is always sent to the same mirror. While a new
+    version is being rolled out, devices outside the rollout cohort still get the previous version.
     
     **Restrictions:**
-    - Assumes valid global mirror data exists in Redis.
+    - Assumes available mirror URLs in Redis.
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    snap_hutao_latest_version = await redis_client.get("snap-hutao:patch")
-    snap_hutao_latest_version = json.loads(snap_hutao_latest_version)
-    checksum_value = snap_hutao_latest_version["global"]["validation"]
+    region = request.state.region_group
+    patch_data = await snap_hutao_patch_for(redis_client, region, x_hutao_device_id)
+    checksum_value = patch_data["validation"]
     headers = {
         "X-Checksum-Sha256": checksum_value
     } if checksum_value else {}
-    return RedirectResponse(snap_hutao_latest_version["global"]["mirrors"][-1]["url"], status_code=301, headers=headers)
+    mirror = select_mirror(patch_data["mirrors"], x_hutao_device_id or request.client.host)
+    return RedirectResponse(mirror["url"], status_code=301, headers=headers)
 
 
-@china_router.get("/alpha", include_in_schema=True, response_model=StandardResponse)
-@global_router.get("/alpha", include_in_schema=True, response_model=StandardResponse)
-@fujian_router.get("/alpha", include_in_schema=True, response_model=StandardResponse)
-async def generic_patch_snap_hutao_alpha_latest_version(request: Request) -> StandardResponse:
+@router.get("/alpha", include_in_schema=True, response_model=StandardResponse)
+async def generic_patch_snap_hutao_alpha_latest_version(request: Request) -> ORJSONResponse:
     """
     ## Update Snap Hutao Alpha Latest Version
 
@@ -406,11 +520,12 @@ async def generic_patch_snap_hutao_alpha_latest_version(request: Request) -> Sta
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     cached_data = await redis_client.get("snap-hutao-alpha:patch")
+    record_cache("snap_hutao_alpha", cached_data is not None)
     if not cached_data:
         cached_data = await fetch_snap_hutao_alpha_latest_version(redis_client)
     else:
-        cached_data = json.loads(cached_data)
-    return StandardResponse(
+        cached_data = orjson.loads(cached_data)
+    return standard_response(
         retcode=0,
         message="Alpha means testing",
         data=cached_data
@@ -418,139 +533,162 @@ async def generic_patch_snap_hutao_alpha_latest_version(request: Request) -> Sta
 
 
 # Snap Hutao Deployment
-@china_router.get("/hutao-deployment", response_model=StandardResponse)
-@fujian_router.get("/hutao-deployment", response_model=StandardResponse)
-async def generic_get_snap_hutao_latest_version_china_endpoint(request: Request) -> StandardResponse:
+@router.get("/hutao-deployment", response_model=StandardResponse)
+async def generic_get_snap_hutao_deployment_latest_version(request: Request) -> ORJSONResponse:
     """
-    ## Get Snap Hutao Deployment Latest Version (China Endpoint)
+    ## Get Snap Hutao Deployment Latest Version
 
-    Retrieves the latest Snap Hutao Deployment metadata from Redis for China users and prepares mirror URLs.
+    Retrieves the latest Snap Hutao Deployment metadata from Redis for the endpoint region and prepares mirror URLs.
     
     **Restrictions:**
     - Data must be available in Redis with proper formatting.
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    region = request.state.region_group
     snap_hutao_deployment_latest_version = await redis_client.get("snap-hutao-deployment:patch")
-    snap_hutao_deployment_latest_version = json.loads(snap_hutao_deployment_latest_version)
+    snap_hutao_deployment_latest_version = orjson.loads(snap_hutao_deployment_latest_version)
 
     # For compatibility purposes
-    return_data = snap_hutao_deployment_latest_version["cn"]
-    urls = [m["url"] for m in snap_hutao_deployment_latest_version["cn"]["mirrors"] if "archive" not in m["url"]]
-    urls.reverse()
+    return_data = snap_hutao_deployment_latest_version[region]
+    urls = [m["url"] for m in rank_mirrors(return_data["mirrors"]) if "archive" not in m["url"]]
     return_data["urls"] = urls
     return_data["sha256"] = snap_hutao_deployment_latest_version["cn"]["validation"]
 
-    return StandardResponse(
+    return standard_response(
         retcode=0,
-        message="CN endpoint reached",
+        message="Global endpoint reached" if region == "global" else "CN endpoint reached",
         data=return_data
     )
 
 
-@china_router.get("/hutao-deployment/download")
-@fujian_router.get("/hutao-deployment/download")
-async def get_snap_hutao_latest_download_direct_china_endpoint(request: Request) -> RedirectResponse:
+@router.get("/hutao-deployment/download")
+async def get_snap_hutao_deployment_latest_download_direct(
+        request: Request, x_hutao_device_id: Optional[str] = Header(None)) -> RedirectResponse:
     """
-    ## Redirect to Snap Hutao Deployment Download (China Endpoint)
+    ## Redirect to Snap Hutao Deployment Download
 
-    Redirects to the primary download URL of the Snap Hutao Deployment version in China as listed in Redis.
+    Redirects to a healthy mirror of the Snap Hutao Deployment version of the endpoint region, chosen by weight and
+    stable per device, appending SHA256 checksum if available.
     
     **Restrictions:**
     - Assumes a valid mirror list exists.
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    region = request.state.region_group
     snap_hutao_deployment_latest_version = await redis_client.get("snap-hutao-deployment:patch")
     snap_hutao_deployment_latest_version = json.loads(snap_hutao_deployment_latest_version)
-    return RedirectResponse(snap_hutao_deployment_latest_version["cn"]["mirrors"][-1]["url"], status_code=301)
+    checksum_value = snap_hutao_deployment_latest_version[region]["validation"]
+    headers = {
+        "X-Checksum-Sha256": checksum_value
+    } if checksum_value else {}
+    mirror = select_mirror(snap_hutao_deployment_latest_version[region]["mirrors"],
+                           x_hutao_device_id or request.client.host)
+    return RedirectResponse(mirror["url"], status_code=301, headers=headers)
+
+
+async def refresh_project_version(redis_client: aioredis.client.Redis, project: str) -> dict | None:
+    """
+    Refresh the latest version of a project from GitHub; run as the `project-version` job.
+
+    :param project: snap-hutao, snap-hutao-deployment or snap-hutao-alpha
+    """
+    if project == "snap-hutao":
+        new_version = await update_snap_hutao_latest_version(redis_client)
+        await update_recent_versions(redis_client)
+    elif project == "snap-hutao-deployment":
+        new_version = await update_snap_hutao_deployment_version(redis_client)
+    elif project == "snap-hutao-alpha":
+        new_version = await fetch_snap_hutao_alpha_latest_version(redis_client)
+        await update_recent_versions(redis_client)
+    else:
+        raise ValueError(f"Unknown project {project}")
+    return new_version
 
 
-@global_router.get("/hutao-deployment", response_model=StandardResponse)
-async def generic_get_snap_hutao_latest_version_global_endpoint(request: Request) -> StandardResponse:
+@router.patch("/{project}", include_in_schema=True, response_model=StandardResponse)
+async def generic_patch_latest_version(request: Request, response: Response, project: str) -> StandardResponse:
     """
-    ## Get Snap Hutao Deployment Latest Version (Global Endpoint)
+    ## Update Project Latest Version
 
-    Retrieves and returns the latest Snap Hutao Deployment version metadata for global users from Redis.
+    Queues a `project-version` job refreshing the latest version of a project and its Redis cache. Follow it with
+    `/jobs/{id}`; the job result is the new patch metadata.
     
     **Restrictions:**
-    - Expects both global and China data to be available for merging.
+    - Valid project key required; otherwise returns HTTP 404.
     """
+    if project not in ("snap-hutao", "snap-hutao-deployment", "snap-hutao-alpha"):
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return StandardResponse(retcode=404, message=f"Project {project} not found")
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    snap_hutao_deployment_latest_version = await redis_client.get("snap-hutao-deployment:patch")
-    snap_hutao_deployment_latest_version = json.loads(snap_hutao_deployment_latest_version)
+    job_id, queued = await job_runner.enqueue(redis_client, "project-version", {"project": project})
+    response.status_code = status.HTTP_202_ACCEPTED
+    return StandardResponse(message=f"Refresh of {project} {'queued' if queued else 'already queued'}",
+                            data={"id": job_id})
 
-    # For compatibility purposes
-    return_data = snap_hutao_deployment_latest_version["global"]
-    urls = [m["url"] for m in snap_hutao_deployment_latest_version["global"]["mirrors"] if "archive" not in m["url"]]
-    urls.reverse()
-    return_data["urls"] = urls
-    return_data["sha256"] = snap_hutao_deployment_latest_version["cn"]["validation"]
 
-    return StandardResponse(message="Global endpoint reached",
-                            data=return_data)
+class MirrorCreateModel(BaseModel):
+    key: Literal["snap-hutao", "snap-hutao-deployment", "snap-hutao-alpha"]
+    url: str
+    mirror_name: str
+    mirror_type: Literal["direct", "browser"]
+    weight: int = Field(default=1, ge=0)
 
 
-@global_router.get("/hutao-deployment/download")
-async def get_snap_hutao_latest_download_direct_china_endpoint(request: Request) -> RedirectResponse:
+class RolloutUpdateModel(BaseModel):
+    percent: Optional[float] = Field(default=None, ge=0, le=100)
+    step: Optional[float] = Field(default=None, ge=0, le=100)
+    interval: Optional[int] = Field(default=None, gt=0)
+
+
+@router.get("/rollout", tags=["Management"], include_in_schema=True,
+            dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
+async def get_snap_hutao_rollout(request: Request) -> StandardResponse:
     """
-    ## Redirect to Snap Hutao Deployment Download (Global Endpoint)
+    ## Get Snap Hutao Rollout
 
-    Redirects to the primary download URL for the Snap Hutao Deployment version (global) as stored in Redis.
-    
-    **Restrictions:**
-    - Valid mirror data must exist.
+    Returns the staged rollout of the latest Snap Hutao version: the share of devices offered it, and how the share
+    grows (`step` percent every `interval` seconds).
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    snap_hutao_deployment_latest_version = await redis_client.get("snap-hutao-deployment:patch")
-    snap_hutao_deployment_latest_version = json.loads(snap_hutao_deployment_latest_version)
-    return RedirectResponse(snap_hutao_deployment_latest_version["global"]["mirrors"][-1]["url"], status_code=301)
+    return StandardResponse(data=await get_rollout(redis_client))
 
 
-@china_router.patch("/{project}", include_in_schema=True, response_model=StandardResponse)
-@global_router.patch("/{project}", include_in_schema=True, response_model=StandardResponse)
-@fujian_router.patch("/{project}", include_in_schema=True, response_model=StandardResponse)
-async def generic_patch_latest_version(request: Request, response: Response, project: str) -> StandardResponse:
+@router.post("/rollout", tags=["Management"], include_in_schema=True,
+             dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
+async def update_snap_hutao_rollout(response: Response, request: Request,
+                                    rollout_update: RolloutUpdateModel) -> StandardResponse:
     """
-    ## Update Project Latest Version
+    ## Update Snap Hutao Rollout
 
-    Updates the latest version for a given project by calling the corresponding update function. Refreshes Redis cache accordingly.
+    Sets the share of devices offered the latest Snap Hutao version, or how it grows. A step of 0 pauses the
+    rollout; a percent of 100 completes it.
     
     **Restrictions:**
-    - Valid project key required; otherwise returns HTTP 404.
+    - Returns HTTP 404 if no rollout was started.
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    new_version = None
-    if project == "snap-hutao":
-        new_version = await update_snap_hutao_latest_version(redis_client)
-        await update_recent_versions(redis_client)
-    elif project == "snap-hutao-deployment":
-        new_version = await update_snap_hutao_deployment_version(redis_client)
-    elif project == "snap-hutao-alpha":
-        new_version = await fetch_snap_hutao_alpha_latest_version(redis_client)
-        await update_recent_versions(redis_client)
-    else:
+    rollout = await update_rollout(redis_client, percent=rollout_update.percent, step=rollout_update.step,
+                                   interval=rollout_update.interval)
+    if rollout is None:
         response.status_code = status.HTTP_404_NOT_FOUND
-    response.status_code = status.HTTP_201_CREATED
-    return StandardResponse(data={"version": new_version})
+        return StandardResponse(retcode=404, message="No rollout in progress")
+    return StandardResponse(message=f"Rollout of {rollout['version']} at {rollout['percent']:g}%", data=rollout)
 
 
-class MirrorCreateModel(BaseModel):
-    key: Literal["snap-hutao", "snap-hutao-deployment", "snap-hutao-alpha"]
-    url: str
-    mirror_name: str
-    mirror_type: Literal["direct", "browser"]
+PATCH_BUILDERS = {
+    "snap-hutao": build_snap_hutao_patch,
+    "snap-hutao-deployment": build_snap_hutao_deployment_patch
+}
 
 
-@china_router.post("/mirror", tags=["Management"], include_in_schema=True,
-                   dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@global_router.post("/mirror", tags=["Management"], include_in_schema=True,
-                    dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@fujian_router.post("/mirror", tags=["Management"], include_in_schema=True,
-                    dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
+@router.post("/mirror", tags=["Management"], include_in_schema=True,
+             dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
 async def add_mirror_url(response: Response, request: Request, mirror: MirrorCreateModel) -> StandardResponse:
     """
     ## Add or Update Mirror URL
 
-    Adds a new mirror URL or updates an existing one for a specified project. The function validates the request and updates Redis.
+    Adds a new mirror URL or updates an existing one for a specified project. The mirror is written with a single
+    HSET and the patch metadata is rebuilt from the cached release, without calling GitHub.
     
     **Restrictions:**
     - The project key must be one of the predefined VALID_PROJECT_KEYS.
@@ -561,38 +699,24 @@ async def add_mirror_url(response: Response, request: Request, mirror: MirrorCre
     mirror_url = mirror.url
     mirror_name = mirror.mirror_name
     mirror_type = mirror.mirror_type
-    current_version = await redis_client.get(f"{project_key}:version")
-    current_version = current_version.decode("utf-8")
-    project_mirror_redis_key = f"{project_key}:mirrors:{current_version}"
 
     if not mirror_url or not mirror_name or not mirror_type or project_key not in VALID_PROJECT_KEYS:
         response.status_code = status.HTTP_400_BAD_REQUEST
         return StandardResponse(message="Invalid request")
 
-    try:
-        mirror_list = json.loads(await redis_client.get(project_mirror_redis_key))
-    except TypeError:
-        mirror_list = []
-    current_mirror_names = [m["mirror_name"] for m in mirror_list]
-    if mirror_name in current_mirror_names:
-        method = "updated"
-        for m in mirror_list:
-            if m["mirror_name"] == mirror_name:
-                m["url"] = mirror_url
-    else:
-        method = "added"
-        mirror_list.append(MirrorMeta(mirror_name=mirror_name, url=mirror_url, mirror_type=mirror_type))
+    current_version = await redis_client.get(f"{project_key}:version")
+    current_version = current_version.decode("utf-8")
+    await migrate_legacy_mirrors(redis_client, project_key, current_version)
+    added = await set_mirror(redis_client, project_key, current_version,
+                             MirrorMeta(mirror_name=mirror_name, url=mirror_url, mirror_type=mirror_type,
+                                        weight=mirror.weight))
+    method = "added" if added else "updated"
     logger.info(f"{method.capitalize()} {mirror_name} mirror URL for {project_key} to {mirror_url}")
 
-    update_result = await redis_client.set(project_mirror_redis_key, json.dumps(mirror_list, default=pydantic_encoder))
-    logger.info(f"Set {project_mirror_redis_key} to Redis: {update_result}")
-
-    if project_key == "snap-hutao":
-        await update_snap_hutao_latest_version(redis_client)
-    elif project_key == "snap-hutao-deployment":
-        await update_snap_hutao_deployment_version(redis_client)
+    await PATCH_BUILDERS[project_key](redis_client)
+    mirror_list = [m.model_dump() for m in await get_mirrors(redis_client, project_key, current_version)]
     response.status_code = status.HTTP_201_CREATED
-    logger.info(f"Latest overwritten URL data: {mirror_list}")
+    logger.debug("Latest overwritten URL data: %s", mirror_list)
     return StandardResponse(message=f"Successfully {method} {mirror_name} mirror URL for {project_key}",
                             data=mirror_list)
 
@@ -602,18 +726,15 @@ class MirrorDeleteModel(BaseModel):
     mirror_name: str
 
 
-@china_router.delete("/mirror", tags=["Management"], include_in_schema=True,
-                     dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@global_router.delete("/mirror", tags=["Management"], include_in_schema=True,
-                      dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@fujian_router.delete("/mirror", tags=["Management"], include_in_schema=True,
-                      dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
+@router.delete("/mirror", tags=["Management"], include_in_schema=True,
+               dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
 async def delete_mirror_url(response: Response, request: Request,
                             delete_request: MirrorDeleteModel) -> StandardResponse:
     """
     ## Delete Mirror URL
 
-    Deletes a mirror URL for a specified project. If mirror_name is "all", clears the mirror list.
+    Deletes a mirror URL for a specified project with a single HDEL. If mirror_name is "all", clears the mirror list.
+    The patch metadata is rebuilt from the cached release, without calling GitHub.
     
     **Restrictions:**
     - The project must be one of the predefined VALID_PROJECT_KEYS.
@@ -622,53 +743,34 @@ async def delete_mirror_url(response: Response, request: Request,
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     project_key = delete_request.project_name
     mirror_name = delete_request.mirror_name
-    current_version = await redis_client.get(f"{project_key}:version")
-    current_version = current_version.decode("utf-8")
-    project_mirror_redis_key = f"{project_key}:mirrors:{current_version}"
 
     if not mirror_name or project_key not in VALID_PROJECT_KEYS:
         response.status_code = status.HTTP_400_BAD_REQUEST
         return StandardResponse(message="Invalid request")
 
-    try:
-        mirror_list = json.loads(await redis_client.get(project_mirror_redis_key))
-    except TypeError:
-        mirror_list = []
-    current_mirror_names = [m["mirror_name"] for m in mirror_list]
-    if mirror_name in current_mirror_names:
+    current_version = await redis_client.get(f"{project_key}:version")
+    current_version = current_version.decode("utf-8")
+    await migrate_legacy_mirrors(redis_client, project_key, current_version)
+    if await delete_mirror(redis_client, project_key, current_version, mirror_name):
         method = "deleted"
-        # Remove the url
-        for m in mirror_list:
-            if m["mirror_name"] == mirror_name:
-                mirror_list.remove(m)
     elif mirror_name == "all":
         method = "cleared"
-        mirror_list = []
+        await clear_mirrors(redis_client, project_key, current_version)
     else:
         method = "not found"
     logger.info(f"{method.capitalize()} {mirror_name} mirror URL for {project_key}")
 
-    # Overwrite mirror link to Redis
-    update_result = await redis_client.set(project_mirror_redis_key, json.dumps(mirror_list, default=pydantic_encoder))
-    logger.info(f"Set {project_mirror_redis_key} to Redis: {update_result}")
-
     # Refresh project patch
-    if project_key == "snap-hutao":
-        await update_snap_hutao_latest_version(redis_client)
-    elif project_key == "snap-hutao-deployment":
-        await update_snap_hutao_deployment_version(redis_client)
+    await PATCH_BUILDERS[project_key](redis_client)
+    mirror_list = [m.model_dump() for m in await get_mirrors(redis_client, project_key, current_version)]
     response.status_code = status.HTTP_201_CREATED
-    logger.info(f"Latest overwritten URL data: {mirror_list}")
+    logger.debug("Latest overwritten URL data: %s", mirror_list)
     return StandardResponse(message=f"Successfully {method} {mirror_name} mirror URL for {project_key}",
                             data=mirror_list)
 
 
-@china_router.get("/mirror", tags=["Management"], include_in_schema=True,
-                  dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@global_router.get("/mirror", tags=["Management"], include_in_schema=True,
-                   dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
-@fujian_router.get("/mirror", tags=["Management"], include_in_schema=True,
-                   dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
+@router.get("/mirror", tags=["Management"], include_in_schema=True,
+            dependencies=[Depends(verify_api_token)], response_model=StandardResponse)
 async def get_mirror_url(request: Request, project: str) -> StandardResponse:
     """
     ## Get Overridden Mirror URLs
@@ -682,11 +784,9 @@ async def get_mirror_url(request: Request, project: str) -> StandardResponse:
     if project not in VALID_PROJECT_KEYS:
         return StandardResponse(message="Invalid request")
     current_version = await redis_client.get(f"{project}:version")
-    project_mirror_redis_key = f"{project}:mirrors:{current_version}"
+    current_version = current_version.decode("utf-8")
+    await migrate_legacy_mirrors(redis_client, project, current_version)
 
-    try:
-        mirror_list = json.loads(await redis_client.get(project_mirror_redis_key))
-    except TypeError:
-        mirror_list = []
+    mirror_list = [m.model_dump() for m in await get_mirrors(redis_client, project, current_version)]
     return StandardResponse(message=f"Overwritten URL data for {project}",
                             data=mirror_list)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Response, Request
+from redis import asyncio as aioredis
+from utils.authentication import verify_api_token
+from utils.scheduler import scheduler
+from mysql_app.schemas import StandardResponse
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+admin_router = APIRouter(tags=["Scheduler"], prefix="/scheduler")
+
+
+@admin_router.get("/jobs", dependencies=[Depends(verify_api_token)])
+async def list_scheduled_jobs(request: Request) -> StandardResponse:
+    """
+    List registered jobs with their schedule, next run and last run, and the instance currently holding leadership.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    return StandardResponse(data=await scheduler.status(redis_client))
+
+
+@admin_router.get("/jobs/{job_name}/history", dependencies=[Depends(verify_api_token)])
+async def get_scheduled_job_history(job_name: str, response: Response, request: Request,
+                                    limit: int = 20) -> StandardResponse:
+    """
+    Get the most recent runs of a job, newest first.
+    """
+    if job_name not in scheduler.jobs:
+        response.status_code = 404
+        return StandardResponse(retcode=404, message=f"Job {job_name} not found")
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    return StandardResponse(data=await scheduler.history(redis_client, job_name, limit))
+
+
+@admin_router.post("/jobs/{job_name}/run", dependencies=[Depends(verify_api_token)])
+async def run_scheduled_job(job_name: str, response: Response, request: Request) -> StandardResponse:
+    """
+    Run a job as soon as possible. The scheduler leader picks it up on its next tick, so it still runs only once
+    across the cluster.
+    """
+    if job_name not in scheduler.jobs:
+        response.status_code = 404
+        return StandardResponse(retcode=404, message=f"Job {job_name} not found")
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    await scheduler.trigger(redis_client, job_name)
+    logger.info(f"Job {job_name} triggered manually")
+    return StandardResponse(message=f"Job {job_name} scheduled to run")
@@ -1,44 +1,72 @@
 import os
 import httpx
 import json
+import hashlib
 import asyncio  # added asyncio import
 import aiofiles
+from typing import Optional
 from redis import asyncio as aioredis
-from fastapi import APIRouter, Depends, Request, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, status
 from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from mysql_app.schemas import StandardResponse
 from utils.authentication import verify_api_token
+from utils.metrics import record_cache
+from utils.fast_redirect import fast_redirect
+from utils.jobs import job_runner, report_progress
+from utils.scheduler import scheduler
+from utils.edge_cache import PRIVATE_CACHE_CONTROL
+from config import STATIC_ARCHIVE_URL, GITHUB_API_URL, github_headers
 from base_logger import get_logger
 
 
+logger = get_logger(__name__)
+router = APIRouter(tags=["Static"], prefix="/static")
+STATIC_RAW_FILE_INDEX_KEY = "static:raw:files"
+STATIC_RAW_FILE_INDEX_TTL = 2 * 60 * 60  # seconds; refreshed every 30 minutes
+# A missing index is rebuilt by the scheduler at most once per interval, however many requests miss it
+STATIC_RAW_FILE_INDEX_REBUILD_INTERVAL = 60  # seconds
+STATIC_RAW_BATCH_LIMIT = 1000  # paths per request
+
+
 class StaticUpdateURL(BaseModel):
     type: str
     url: str
 
 
-logger = get_logger(__name__)
-china_router = APIRouter(tags=["Static"], prefix="/static")
-global_router = APIRouter(tags=["Static"], prefix="/static")
-fujian_router = APIRouter(tags=["Static"], prefix="/static")
+class StaticRawBatch(BaseModel):
+    paths: list[str] = Field(max_length=STATIC_RAW_BATCH_LIMIT)
+    quality: Optional[str] = None
+
 
+def static_sha256_key(archive_quality: str, commit_hash: str) -> str:
+    """
+    Redis hash of archive name (without .zip) -> SHA-256 hex digest, for one commit of the static archive
+    """
+    return f"static-sha256:{archive_quality}:{commit_hash}"
+
+
+async def prune_static_checksums(redis_client: aioredis.Redis, archive_quality: str, commit_hash: str) -> int:
+    """
+    Delete the archive checksums of every commit but the current one of an archive quality
 
-@china_router.get("/zip/{file_path:path}")
-@global_router.get("/zip/{file_path:path}")
-@fujian_router.get("/zip/{file_path:path}")
+    :return: number of checksum hashes deleted
+    """
+    current_key = static_sha256_key(archive_quality, commit_hash).encode("utf-8")
+    keys = [key for key in await redis_client.keys(static_sha256_key(archive_quality, "*")) if key != current_key]
+    if keys:
+        await redis_client.delete(*keys)
+        logger.info(f"Deleted the {archive_quality} archive checksums of {len(keys)} superseded commits")
+    return len(keys)
+
+
+@router.get("/zip/{file_path:path}")
+@fast_redirect()
 async def get_zip_resource(file_path: str, request: Request) -> RedirectResponse:
     """
     Endpoint used to redirect to the zipped static file
     """
-    req_path = request.url.path
-    if req_path.startswith("/cn"):
-        region = "china"
-    elif req_path.startswith("/global"):
-        region = "global"
-    elif req_path.startswith("/fj"):
-        region = "fujian"
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
+    region = request.state.redis_region
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     quality = request.headers.get("x-hutao-quality", "high").lower()  # high/original
     archive_type = request.headers.get("x-hutao-archive", "minimum").lower()  # minimum/full
@@ -47,19 +75,25 @@ async def get_zip_resource(file_path: str, request: Request) -> RedirectResponse
         if file_path == "ItemIcon.zip" or file_path == "EmotionIcon.zip":
             file_path = file_path.replace(".zip", "-Minimum.zip")
 
+    # Checksum of the archive of the current commit, hashed when it was uploaded to the CDN
+    archive_quality = "original" if quality in ["original", "raw"] else "tiny"
+    commit_hash = await redis_client.get(f"commit:static-archive:{archive_quality}")
+    headers = {}
+    if commit_hash:
+        commit_hash = commit_hash.decode("utf-8")
+        checksum = await redis_client.hget(static_sha256_key(archive_quality, commit_hash),
+                                           file_path.replace(".zip", ""))
+        if checksum:
+            headers["X-Checksum-Sha256"] = checksum.decode("utf-8")
+
     # For china and fujian: try to use real-time commit hash from Redis.
-    if region in ("china", "fujian"):
-        archive_quality = "original" if quality in ["original", "raw"] else "tiny"
-        commit_key = f"commit:static-archive:{archive_quality}"
-        commit_hash = await redis_client.get(commit_key)
-        if commit_hash:
-            commit_hash = commit_hash.decode("utf-8")
-            real_key = f"static-cdn:{archive_quality}:{commit_hash}:{file_path.replace('.zip', '')}"
-            real_url = await redis_client.get(real_key)
-            if real_url:
-                real_url = real_url.decode("utf-8")
-                logger.debug(f"Redirecting to real-time zip URL: {real_url}")
-                return RedirectResponse(real_url.format(file_path=file_path), status_code=301)
+    if region in ("china", "fujian") and commit_hash:
+        real_key = f"static-cdn:{archive_quality}:{commit_hash}:{file_path.replace('.zip', '')}"
+        real_url = await redis_client.get(real_key)
+        if real_url:
+            real_url = real_url.decode("utf-8")
+            logger.debug("Redirecting to real-time zip URL: %s", real_url)
+            return RedirectResponse(real_url.format(file_path=file_path), status_code=301, headers=headers)
 
     # Fallback using template URL from Redis.
     if quality == "high":
@@ -70,13 +104,13 @@ async def get_zip_resource(file_path: str, request: Request) -> RedirectResponse
         raise HTTPException(status_code=422, detail=f"{quality} is not a valid quality value")
     resource_endpoint = await redis_client.get(fallback_key)
     resource_endpoint = resource_endpoint.decode("utf-8")
-    logger.debug(f"Redirecting to fallback template zip URL: {resource_endpoint.format(file_path=file_path)}")
-    return RedirectResponse(resource_endpoint.format(file_path=file_path), status_code=301)
+    redirect_url = resource_endpoint.format(file_path=file_path)
+    logger.debug("Redirecting to fallback template zip URL: %s", redirect_url)
+    return RedirectResponse(redirect_url, status_code=301, headers=headers)
 
 
-@china_router.get("/raw/{file_path:path}")
-@global_router.get("/raw/{file_path:path}")
-@fujian_router.get("/raw/{file_path:path}")
+@router.get("/raw/{file_path:path}")
+@fast_redirect()
 async def get_raw_resource(file_path: str, request: Request) -> RedirectResponse:
     """
     Endpoint used to redirect to the raw static file
@@ -87,15 +121,7 @@ async def get_raw_resource(file_path: str, request: Request) -> RedirectResponse
 
     :return: 301 Redirect to the raw file
     """
-    req_path = request.url.path
-    if req_path.startswith("/cn"):
-        region = "china"
-    elif req_path.startswith("/global"):
-        region = "global"
-    elif req_path.startswith("/fj"):
-        region = "fujian"
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
+    region = request.state.redis_region
 
     quality = request.headers.get("x-hutao-quality", "high").lower()
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
@@ -108,34 +134,135 @@ async def get_raw_resource(file_path: str, request: Request) -> RedirectResponse
         raise HTTPException(status_code=422, detail=f"{quality} is not a valid quality value")
     resource_endpoint = resource_endpoint.decode("utf-8")
 
-    logger.debug(f"Redirecting to {resource_endpoint.format(file_path=file_path)}")
-    return RedirectResponse(resource_endpoint.format(file_path=file_path), status_code=301)
+    redirect_url = resource_endpoint.format(file_path=file_path)
+    logger.debug("Redirecting to %s", redirect_url)
+    return RedirectResponse(redirect_url, status_code=301)
 
 
-@china_router.get("/template", response_model=StandardResponse)
-@global_router.get("/template", response_model=StandardResponse)
-@fujian_router.get("/template", response_model=StandardResponse)
-async def get_static_files_template(request: Request) -> StandardResponse:
+async def get_static_repo_tree(client: httpx.AsyncClient, tree: str, recursive: bool = True) -> dict:
+    """
+    Get a git tree of Snap.Static from GitHub, by branch name or SHA
+    """
+    api_endpoint = f"{GITHUB_API_URL}/repos/DGP-Studio/Snap.Static/git/trees/{tree}"
+    response = await client.get(api_endpoint, params={"recursive": 1} if recursive else None, headers=github_headers,
+                                timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_static_raw_file_index(redis_client: aioredis.Redis) -> int:
+    """
+    Cache the path of every file in Snap.Static, which batch raw file resolution is validated against
+
+    :param redis_client: Redis client
+
+    :return: number of files indexed
+    """
+    async with httpx.AsyncClient() as client:
+        tree = await get_static_repo_tree(client, "main")
+        if not tree.get("truncated"):
+            file_paths = [file["path"] for file in tree["tree"] if file["type"] == "blob"]
+        else:
+            # Too large for one response; list each top-level directory on its own
+            root = await get_static_repo_tree(client, "main", recursive=False)
+            file_paths = [file["path"] for file in root["tree"] if file["type"] == "blob"]
+            for directory in root["tree"]:
+                if directory["type"] != "tree":
+                    continue
+                subtree = await get_static_repo_tree(client, directory["sha"])
+                if subtree.get("truncated"):
+                    # An incomplete index would report existing files as missing
+                    raise ValueError(f"Snap.Static file tree of {directory['path']} is truncated")
+                file_paths.extend(f"{directory['path']}/{file['path']}" for file in subtree["tree"]
+                                  if file["type"] == "blob")
+    if not file_paths:
+        logger.warning("Snap.Static file tree is empty, keeping the current static raw file index")
+        return 0
+
+    async with redis_client.pipeline() as pipe:
+        # Rebuild the set in one transaction so files removed upstream do not linger
+        pipe.delete(STATIC_RAW_FILE_INDEX_KEY)
+        for i in range(0, len(file_paths), 1000):
+            pipe.sadd(STATIC_RAW_FILE_INDEX_KEY, *file_paths[i:i + 1000])
+        pipe.expire(STATIC_RAW_FILE_INDEX_KEY, STATIC_RAW_FILE_INDEX_TTL)
+        await pipe.execute()
+    logger.info("Cached %d static raw file paths", len(file_paths))
+    return len(file_paths)
+
+
+@router.post("/raw/batch", response_model=StandardResponse)
+async def resolve_raw_resources(batch: StaticRawBatch, request: Request) -> StandardResponse:
+    """
+    Endpoint used to resolve the URLs of many raw static files at once, instead of following one redirect per file
+
+    :param batch: raw file relative paths in Snap.Static, and the quality (high/original), which defaults to the
+    x-hutao-quality header
+
+    :param request: request object from FastAPI
+
+    :return: path -> URL of every file in Snap.Static, and the paths that are not; 503 while the file index is being
+    rebuilt
+    """
+    region = request.state.redis_region
+    quality = (batch.quality or request.headers.get("x-hutao-quality", "high")).lower()
+    if quality == "high":
+        template_key = f"url:{region}:static:raw:tiny"
+    elif quality == "original" or quality == "raw":
+        template_key = f"url:{region}:static:raw:original"
+    else:
+        raise HTTPException(status_code=422, detail=f"{quality} is not a valid quality value")
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+
+    index_cached = await redis_client.exists(STATIC_RAW_FILE_INDEX_KEY)
+    record_cache("static_raw_file_index", bool(index_cached))
+    if not index_cached:
+        if await redis_client.set(f"{STATIC_RAW_FILE_INDEX_KEY}:rebuild", 1, nx=True,
+                                  ex=STATIC_RAW_FILE_INDEX_REBUILD_INTERVAL):
+            await scheduler.trigger(redis_client, "static-raw-file-index")
+            logger.info("Static raw file index is missing, triggered a rebuild")
+        raise HTTPException(status_code=503, detail="Static file index is not available",
+                            headers={"Retry-After": str(STATIC_RAW_FILE_INDEX_REBUILD_INTERVAL)})
+    resource_endpoint = await redis_client.get(template_key)
+    if resource_endpoint is None:
+        raise HTTPException(status_code=500, detail="Template URL not found")
+    resource_endpoint = resource_endpoint.decode("utf-8")
+
+    file_paths = list(dict.fromkeys(file_path.lstrip("/") for file_path in batch.paths))
+    known = await redis_client.smismember(STATIC_RAW_FILE_INDEX_KEY, file_paths) if file_paths else []
+    urls = {}
+    missing = []
+    for file_path, is_known in zip(file_paths, known):
+        if is_known:
+            urls[file_path] = resource_endpoint.format(file_path=file_path)
+        else:
+            missing.append(file_path)
+    return StandardResponse(data={"urls": urls, "missing": missing})
+
+
+@router.get("/template", response_model=StandardResponse)
+async def get_static_files_template(request: Request, response: Response,
+                                    quality: Optional[str] = None) -> StandardResponse:
     """
     Endpoint used to get the template URL for static files
 
     :param request: request object from FastAPI
 
+    :param response: response object from FastAPI
+
+    :param quality: quality of the templates, overriding the x-hutao-quality header
+
     :return: 301 Redirect to the template URL
     """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    quality = request.headers.get("x-hutao-quality", "high").lower()
+    if quality is None:
+        # The edge caches by URL only, so a response chosen by a header must not be stored there
+        response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+        quality = request.headers.get("x-hutao-quality", "high")
+    quality = quality.lower()
     if quality != "original":
         quality = "tiny"
 
-    if request.url.path.startswith("/cn"):
-        region = "china"
-    elif request.url.path.startswith("/global"):
-        region = "global"
-    elif request.url.path.startswith("/fj"):
-        region = "fujian"
-    else:
-        raise HTTPException(status_code=400, detail="Invalid router")
+    region = request.state.redis_region
     try:
         zip_template = await redis_client.get(f"url:{region}:static:zip:{quality}")
         if zip_template is None:
@@ -217,14 +344,16 @@ async def list_static_files_size_by_alist(redis_client) -> dict:
 
 
 async def list_static_files_size_by_archive_json(redis_client) -> dict:
-    original_file_size_json_url = "https://static-archive.snapgenshin.cn/original/file_info.json"
-    tiny_file_size_json_url = "https://static-archive.snapgenshin.cn/tiny/file_info.json"
-    original_meta_url = "https://static-archive.snapgenshin.cn/original/meta.json"
-    tiny_meta_url = "https://static-archive.snapgenshin.cn/tiny/meta.json"
-    original_size = httpx.get(original_file_size_json_url).json()
-    tiny_size = httpx.get(tiny_file_size_json_url).json()
-    original_meta = httpx.get(original_meta_url).json()
-    tiny_meta = httpx.get(tiny_meta_url).json()
+    original_file_size_json_url = f"{STATIC_ARCHIVE_URL}/original/file_info.json"
+    tiny_file_size_json_url = f"{STATIC_ARCHIVE_URL}/tiny/file_info.json"
+    original_meta_url = f"{STATIC_ARCHIVE_URL}/original/meta.json"
+    tiny_meta_url = f"{STATIC_ARCHIVE_URL}/tiny/meta.json"
+    async with httpx.AsyncClient() as client:
+        responses = await asyncio.gather(*[client.get(url) for url in (original_file_size_json_url,
+                                                                       tiny_file_size_json_url,
+                                                                       original_meta_url,
+                                                                       tiny_meta_url)])
+    original_size, tiny_size, original_meta, tiny_meta = [response.json() for response in responses]
 
     # Calculate the total size for each category
     original_full = sum(item["size"] for item in original_size if "Minimum" not in item["name"])
@@ -256,12 +385,38 @@ async def list_static_files_size_by_archive_json(redis_client) -> dict:
     return zip_size_data
 
 
-@china_router.get("/size", response_model=StandardResponse)
-@global_router.get("/size", response_model=StandardResponse)
-@fujian_router.get("/size", response_model=StandardResponse)
+@router.get("/manifest", response_model=StandardResponse)
+async def get_static_archive_manifest(request: Request) -> StandardResponse:
+    """
+    Endpoint used to get the SHA-256 digest of every static archive of the current commits
+
+    Clients can skip downloading an archive whose digest they already hold; the same digest is sent as
+    `X-Checksum-Sha256` by the zip redirect. Archives not hashed yet are left out.
+
+    :param request: request object from FastAPI
+
+    :return: commit hash and archive name -> SHA-256 digest, for each archive quality
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    manifest = {}
+    for archive_quality in ("original", "tiny"):
+        commit_hash = await redis_client.get(f"commit:static-archive:{archive_quality}")
+        if commit_hash is None:
+            continue
+        commit_hash = commit_hash.decode("utf-8")
+        checksums = await redis_client.hgetall(static_sha256_key(archive_quality, commit_hash))
+        manifest[archive_quality] = {
+            "commit_hash": commit_hash,
+            "files": {f"{k.decode('utf-8')}.zip": v.decode("utf-8") for k, v in sorted(checksums.items())}
+        }
+    return StandardResponse(data=manifest)
+
+
+@router.get("/size", response_model=StandardResponse)
 async def get_static_files_size(request: Request) -> StandardResponse:
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     static_files_size = await redis_client.get("static_files_size")
+    record_cache("static_files_size", static_files_size is not None)
     if static_files_size:
         static_files_size = json.loads(static_files_size)
     else:
@@ -275,83 +430,132 @@ async def get_static_files_size(request: Request) -> StandardResponse:
     return response
 
 
-@china_router.get("/size/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)])
-@global_router.get("/size/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)])
-@fujian_router.get("/size/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)])
-async def reset_static_files_size(request: Request) -> StandardResponse:
+@router.get("/size/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)])
+async def reset_static_files_size(request: Request, response: Response) -> StandardResponse:
+    """
+    Queue a `static-files-size` job refreshing the static files size; follow it with `/jobs/{id}`.
+    """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    new_data = await list_static_files_size_by_archive_json(redis_client)
-    response = StandardResponse(
-        retcode=0,
-        message="Success",
-        data=new_data
-    )
-    return response
+    job_id, queued = await job_runner.enqueue(redis_client, "static-files-size")
+    response.status_code = status.HTTP_202_ACCEPTED
+    return StandardResponse(message="Static files size refresh queued" if queued else "Refresh already queued",
+                            data={"id": job_id})
 
 
-async def upload_all_static_archive_to_cdn(redis_client: aioredis.Redis):
+async def hash_static_archive(client: httpx.AsyncClient, redis_client: aioredis.Redis, file_url: str,
+                              archive_quality: str, commit_hash: str, file_name: str,
+                              local_file_path: str | None = None) -> str:
+    """
+    Stream a static archive, optionally saving it to `local_file_path`, and store its SHA-256 digest
+
+    :return: SHA-256 hex digest of the archive
+    """
+    sha256 = hashlib.sha256()
+    async with client.stream("GET", file_url, timeout=180) as response:
+        response.raise_for_status()
+        if local_file_path is None:
+            async for chunk in response.aiter_bytes():
+                sha256.update(chunk)
+        else:
+            async with aiofiles.open(local_file_path, "wb+") as f:
+                async for chunk in response.aiter_bytes():
+                    sha256.update(chunk)
+                    await f.write(chunk)
+    checksum = sha256.hexdigest()
+    await redis_client.hset(static_sha256_key(archive_quality, commit_hash), file_name, checksum)
+    logger.info(f"SHA-256 of {archive_quality} {file_name} at {commit_hash}: {checksum}")
+    return checksum
+
+
+async def upload_all_static_archive_to_cdn(redis_client: aioredis.Redis) -> dict:
     """
-    Upload all static archive to CDN
+    Upload all static archive to CDN; run as the `static-cdn-upload` job, reporting one step per archive file
 
     :param redis_client: Redis client
-    :return: True if upload is successful, False otherwise
+    :return: number of uploaded, skipped and failed files
     """
     archive_type = ["original", "tiny"]
     upload_endpoint = f"https://{os.getenv('CDN_UPLOAD_HOSTNAME')}/api/upload?name="
+    summary = {"uploaded": 0, "skipped": 0, "failed": 0}
     async with httpx.AsyncClient() as client:
+        archives = []
         for archive_quality in archive_type:
-            file_list_url = f"https://static-archive.snapgenshin.cn/{archive_quality}/file_info.json"
-            meta_url = f"https://static-archive.snapgenshin.cn/{archive_quality}/meta.json"
+            file_list_url = f"{STATIC_ARCHIVE_URL}/{archive_quality}/file_info.json"
+            meta_url = f"{STATIC_ARCHIVE_URL}/{archive_quality}/meta.json"
             file_list = (await client.get(file_list_url)).json()
             meta = (await client.get(meta_url)).json()
-            commit_hash = meta["commit"][:7]
+            archives.append((archive_quality, meta["commit"][:7], file_list))
+        total = sum(len(file_list) for _, _, file_list in archives)
+        for archive_quality, commit_hash, file_list in archives:
+            await prune_static_checksums(redis_client, archive_quality, commit_hash)
             local_dir = f"./cache/static/{archive_quality}-{commit_hash}"
             os.makedirs(local_dir, exist_ok=True)
             for archive_file in file_list:
+                await report_progress(sum(summary.values()), total)
                 file_name = archive_file["name"].replace(".zip", "")
-                if await redis_client.exists(f"static-cdn:{archive_quality}:{commit_hash}:{file_name}"):
+                file_url = f"{STATIC_ARCHIVE_URL}/{archive_quality}/{archive_file['name']}"
+                uploaded = await redis_client.exists(f"static-cdn:{archive_quality}:{commit_hash}:{file_name}")
+                hashed = await redis_client.hexists(static_sha256_key(archive_quality, commit_hash), file_name)
+                if uploaded and hashed:
                     logger.info(f"File {archive_file['name']} already exists in CDN, skipping upload")
+                    summary["skipped"] += 1
                     continue
+                if uploaded:
+                    # Uploaded before checksums were recorded; hash it without uploading again
+                    try:
+                        await hash_static_archive(client, redis_client, file_url, archive_quality, commit_hash,
+                                                  file_name)
+                        summary["skipped"] += 1
+                    except httpx.HTTPError as e:
+                        logger.error(f"Failed to hash {archive_file['name']}, error: {e}")
+                        summary["failed"] += 1
+                    continue
+                local_file_path = f"{local_dir}/{archive_file['name']}"
                 try:
-                    file_url = f"https://static-archive.snapgenshin.cn/{archive_quality}/{archive_file['name']}"
-                    # Download file asynchronously
-                    response = await client.get(file_url)
-                    local_file_path = f"{local_dir}/{archive_file['name']}"
-                    async with aiofiles.open(local_file_path, "wb+") as f:
-                        await f.write(response.content)
+                    # Download file asynchronously, hashing it as it streams to disk
+                    await hash_static_archive(client, redis_client, file_url, archive_quality, commit_hash,
+                                              file_name, local_file_path)
                     # Upload file to CDN with PUT method
                     async with aiofiles.open(local_file_path, "rb") as f:
                         file_data = await f.read()
                     upload_response = await client.put(upload_endpoint + archive_file['name'], data=file_data, timeout=180)
                     if upload_response.status_code != 200:
                         logger.error(f"Failed to upload {archive_file['name']} to CDN")
+                        summary["failed"] += 1
                     else:
                         resp_url = upload_response.text
                         if not resp_url.startswith("http"):
                             logger.error(f"Failed to upload {archive_file['name']} to CDN, response: {resp_url}")
+                            summary["failed"] += 1
                         else:
                             logger.info(f"Uploaded {archive_file['name']} to CDN, response: {resp_url}")
                             await redis_client.set(f"static-cdn:{archive_quality}:{commit_hash}:{file_name}", resp_url)
+                            summary["uploaded"] += 1
                 except Exception as e:
                     logger.error(f"Failed to upload {archive_file['name']} to CDN, error: {e}")
+                    summary["failed"] += 1
                     continue
                 finally:
                     # Offload local file removal to avoid blocking
-                    await asyncio.to_thread(os.remove, local_file_path)
+                    if os.path.exists(local_file_path):
+                        await asyncio.to_thread(os.remove, local_file_path)
+    await report_progress(total, total)
+    return summary
 
 
-@china_router.post("/cdn/upload", dependencies=[Depends(verify_api_token)])
-@global_router.post("/cdn/upload", dependencies=[Depends(verify_api_token)])
-@fujian_router.post("/cdn/upload", dependencies=[Depends(verify_api_token)])
-async def background_upload_to_cdn(request: Request, background_tasks: BackgroundTasks):
+@router.post("/cdn/upload", dependencies=[Depends(verify_api_token)])
+async def background_upload_to_cdn(request: Request, response: Response) -> StandardResponse:
+    """
+    Queue a `static-cdn-upload` job uploading the static archives to the CDN; follow it with `/jobs/{id}`.
+    """
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    background_tasks.add_task(upload_all_static_archive_to_cdn, redis_client)
-    return {"message": "Background CDN upload started."}
+    job_id, queued = await job_runner.enqueue(redis_client, "static-cdn-upload")
+    response.status_code = status.HTTP_202_ACCEPTED
+    return StandardResponse(message="Background CDN upload queued." if queued else "CDN upload already queued.",
+                            data={"id": job_id})
 
 
-@china_router.get("/cdn/resources")
-@global_router.get("/cdn/resources")
-@fujian_router.get("/cdn/resources")
+@router.get("/cdn/resources")
 async def list_cdn_resources(request: Request):
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     keys = await redis_client.keys("static-cdn:*")
@@ -371,19 +575,18 @@ async def list_cdn_resources(request: Request):
 
 async def delete_all_cdn_links(redis_client: aioredis.Redis) -> int:
     """
-    Delete all CDN links stored in Redis and return the count of keys deleted.
+    Delete all CDN links stored in Redis, with the archive checksums recorded when uploading them, and return the
+    count of keys deleted.
     """
-    keys = await redis_client.keys("static-cdn:*")
+    keys = await redis_client.keys("static-cdn:*") + await redis_client.keys(static_sha256_key("*", "*"))
     if keys:
         await redis_client.delete(*keys)
-        logger.info(f"Deleted {len(keys)} CDN link keys from Redis.")
+        logger.info(f"Deleted {len(keys)} CDN link and checksum keys from Redis.")
         return len(keys)
     logger.info("No CDN link keys found in Redis.")
     return 0
 
-@china_router.delete("/cdn/clear", dependencies=[Depends(verify_api_token)])
-@global_router.delete("/cdn/clear", dependencies=[Depends(verify_api_token)])
-@fujian_router.delete("/cdn/clear", dependencies=[Depends(verify_api_token)])
+@router.delete("/cdn/clear", dependencies=[Depends(verify_api_token)])
 async def clear_cdn_links(request: Request) -> StandardResponse:
     """
     Endpoint to clear all CDN links stored in Redis.
@@ -0,0 +1,39 @@
+import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from mysql_app import crud
+from mysql_app.schemas import StandardResponse
+from utils.dependencies import get_db
+from utils.authentication import verify_api_token
+from utils.stats import stat_date
+
+
+admin_router = APIRouter(tags=["Statistics"], prefix="/stats")
+
+
+@admin_router.get("/client-versions", dependencies=[Depends(verify_api_token)])
+def get_client_version_adoption(days: int = Query(30, ge=1, le=366), version: str | None = None,
+                                db: Session = Depends(get_db)) -> StandardResponse:
+    """
+    Client version adoption over the last `days` finished days, from the daily rollup rows.
+
+    :param days: number of days to return, ending yesterday (UTC+8)
+
+    :param version: only return this client version
+
+    :param db: Database session
+    """
+    start, end = stat_date(days), stat_date(1)
+    adoption: dict[datetime.date, dict] = {}
+    for row in crud.get_client_version_stats(db, start, end, version):
+        day = adoption.setdefault(row.date, {"date": row.date.isoformat(), "total": 0, "versions": {}})
+        day["versions"][row.version] = {"users": row.users}
+        day["total"] += row.users
+    for day in adoption.values():
+        for stat in day["versions"].values():
+            stat["share"] = round(stat["users"] / day["total"], 4) if day["total"] else 0
+    return StandardResponse(data={
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": list(adoption.values())
+    })
@@ -1,19 +1,22 @@
 import json
 import httpx
-from fastapi import Depends, APIRouter, HTTPException, Request
+import orjson
+from fastapi import Depends, APIRouter, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from utils.uigf import get_genshin_avatar_id
 from redis import asyncio as redis
 from mysql_app.schemas import AvatarStrategy, StandardResponse
-from mysql_app.crud import add_avatar_strategy, get_avatar_strategy_by_id
+from mysql_app.crud import add_avatar_strategy, get_avatar_strategy_by_id, get_all_avatar_strategy
 from utils.dependencies import get_db
+from utils.metrics import record_cache
+from utils.responses import ORJSONResponse, standard_response
+from utils.response_cache import cached_response, render_standard_response, invalidate
+from utils.edge_cache import purge_edge_cache
 from base_logger import get_logger
 
 
 logger = get_logger("strategy")
-china_router = APIRouter(tags=["Strategy"], prefix="/strategy")
-global_router = APIRouter(tags=["Strategy"], prefix="/strategy")
-fujian_router = APIRouter(tags=["Strategy"], prefix="/strategy")
+router = APIRouter(tags=["Strategy"], prefix="/strategy")
 
 """
 miyoushe_strategy_url = "https://bbs.mihoyo.com/ys/strategy/channel/map/39/{mys_strategy_id}?bbs_presentation_style=no_header"
@@ -33,7 +36,8 @@ async def refresh_miyoushe_avatar_strategy(redis_client: redis.client.Redis, db:
     """
     avatar_strategy = []
     url = "https://api-static.mihoyo.com/common/blackboard/ys_strategy/v1/home/content/list?app_sn=ys_strategy&channel_id=37"
-    response = httpx.get(url)
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url)
     if response.status_code == 200:
         data = response.json().get("data", {}).get("list", [])
     else:
@@ -76,16 +80,17 @@ async def refresh_hoyolab_avatar_strategy(redis_client: redis.client.Redis, db:
     """
     avatar_strategy = []
     url = "https://bbs-api-os.hoyolab.com/community/painter/wapi/circle/channel/guide/second_page/info"
-    response = httpx.post(url, json={
-        "id": "63b63aefc61f3cbe3ead18d9",
-        "offset": "",
-        "selector_id_list": [],
-        "size": 100
-    }, headers={
-        "Accept-Language": "zh-CN,zh;q=0.9",
-        "X-Rpc-Language": "zh-cn",
-        "X-Rpc-Show-Translated": "true"
-    })
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, json={
+            "id": "63b63aefc61f3cbe3ead18d9",
+            "offset": "",
+            "selector_id_list": [],
+            "size": 100
+        }, headers={
+            "Accept-Language": "zh-CN,zh;q=0.9",
+            "X-Rpc-Language": "zh-cn",
+            "X-Rpc-Show-Translated": "true"
+        })
     if response.status_code == 200:
         data = response.json().get("data", {}).get("grid_item_list", [])
     else:
@@ -109,10 +114,32 @@ async def refresh_hoyolab_avatar_strategy(redis_client: redis.client.Redis, db:
     return True
 
 
-@china_router.get("/item", response_model=StandardResponse)
-@global_router.get("/item", response_model=StandardResponse)
-@fujian_router.get("/item", response_model=StandardResponse)
-async def get_avatar_strategy_item(request: Request, item_id: int, db: Session=Depends(get_db)) -> StandardResponse:
+async def refresh_avatar_strategy_cache(redis_client: redis.client.Redis, db: Session) -> dict:
+    """
+    Rebuild the avatar strategy cache in Redis from MySQL
+
+    :param redis_client: redis client object
+
+    :param db: Database session
+
+    :return: strategy dict keyed by avatar ID
+    """
+    strategy_dict = {
+        str(strategy.avatar_id): {
+            "mys_strategy_id": strategy.mys_strategy_id,
+            "hoyolab_strategy_id": strategy.hoyolab_strategy_id
+        }
+        for strategy in get_all_avatar_strategy(db) or []
+    }
+    await redis_client.set("avatar_strategy", json.dumps(strategy_dict))
+    await invalidate(redis_client, "strategy:all")
+    await purge_edge_cache("strategy")
+    logger.info(f"Cached {len(strategy_dict)} avatar strategies")
+    return strategy_dict
+
+
+@router.get("/item", response_model=StandardResponse)
+async def get_avatar_strategy_item(request: Request, item_id: int, db: Session=Depends(get_db)) -> ORJSONResponse:
     """
     Get avatar strategy item by avatar ID
 
@@ -127,12 +154,13 @@ async def get_avatar_strategy_item(request: Request, item_id: int, db: Session=D
     redis_client = redis.Redis.from_pool(request.app.state.redis)
 
     if redis_client:
-        try:
-            strategy_dict = json.loads(await redis_client.get("avatar_strategy"))
-        except TypeError:
+        cached_strategy = await redis_client.get("avatar_strategy")
+        record_cache("avatar_strategy", cached_strategy is not None)
+        if cached_strategy is None:
             from cloudflare_security_utils.mgnt import refresh_avatar_strategy
             await refresh_avatar_strategy(request, "all")
-            strategy_dict = json.loads(await redis_client.get("avatar_strategy"))
+            cached_strategy = await redis_client.get("avatar_strategy")
+        strategy_dict = orjson.loads(cached_strategy)
         strategy_set = strategy_dict.get(str(item_id), {})
         if strategy_set:
             miyoushe_id = strategy_set.get("mys_strategy_id")
@@ -148,23 +176,20 @@ async def get_avatar_strategy_item(request: Request, item_id: int, db: Session=D
         else:
             miyoushe_id = None
             hoyolab_id = None
-    res = StandardResponse(
+    return standard_response(
         retcode=0,
         message="Success",
         data={
-            item_id: {
+            str(item_id): {
                 "mys_strategy_id": miyoushe_id,
                 "hoyolab_strategy_id": hoyolab_id
             }
         }
     )
-    return res
 
 
-@china_router.get("/all", response_model=StandardResponse)
-@global_router.get("/all", response_model=StandardResponse)
-@fujian_router.get("/all", response_model=StandardResponse)
-async def get_all_avatar_strategy_item(request: Request) -> StandardResponse:
+@router.get("/all", response_model=StandardResponse)
+async def get_all_avatar_strategy_item(request: Request) -> Response:
     """
     Get all avatar strategy items
 
@@ -174,14 +199,14 @@ async def get_all_avatar_strategy_item(request: Request) -> StandardResponse:
     """
     redis_client = redis.Redis.from_pool(request.app.state.redis)
 
-    try:
-        strategy_dict = json.loads(await redis_client.get("avatar_strategy"))
-    except TypeError:
-        from cloudflare_security_utils.mgnt import refresh_avatar_strategy
-        await refresh_avatar_strategy(request, "all")
-        strategy_dict = json.loads(await redis_client.get("avatar_strategy"))
-    return StandardResponse(
-        retcode=0,
-        message="Success",
-        data=strategy_dict
-    )
+    async def render() -> bytes:
+        cached_strategy = await redis_client.get("avatar_strategy")
+        record_cache("avatar_strategy", cached_strategy is not None)
+        if cached_strategy is None:
+            from cloudflare_security_utils.mgnt import refresh_avatar_strategy
+            await refresh_avatar_strategy(request, "all")
+            cached_strategy = await redis_client.get("avatar_strategy")
+        strategy_dict = orjson.loads(cached_strategy)
+        return render_standard_response(retcode=0, message="Success", data=strategy_dict)
+
+    return await cached_response(redis_client, request.headers, "strategy:all", "all", render)
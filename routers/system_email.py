@@ -1,24 +1,15 @@
-import os
 from fastapi import APIRouter, Depends, Response, Request
-from utils.stats import record_email_requested, add_email_failed_count, add_email_sent_count
+from redis import asyncio as aioredis
+from utils.stats import record_email_requested
 from utils.authentication import verify_api_token
+from utils.email_queue import enqueue_email, get_email_status, email_queue
 from pydantic import BaseModel
-from concurrent.futures import ThreadPoolExecutor
 from mysql_app.schemas import StandardResponse
-import threading
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from base_logger import get_logger
 
 
 logger = get_logger(__name__)
 admin_router = APIRouter(tags=["Email System"], prefix="/email")
-SERVER_TYPE = os.getenv("SERVER_TYPE", "dev")
-if SERVER_TYPE == "dev":
-    thread_size = 1
-else:
-    thread_size = 5
 
 
 class EmailRequest(BaseModel):
@@ -27,81 +18,48 @@ class EmailRequest(BaseModel):
     recipient: str
 
 
-class SMTPConnectionPool:
-    def __init__(self, pool_size: int = 5):
-        self.smtp_server = os.getenv("EMAIL_SERVER")
-        self.smtp_port = int(os.getenv("EMAIL_PORT"))
-        self.username = os.getenv("EMAIL_USERNAME")
-        self.password = os.getenv("EMAIL_PASSWORD")
-        self.pool_size = pool_size
-        self.pool = []
-        self.lock = threading.Lock()
-        self._create_pool()
-
-    def _create_pool(self):
-        for _ in range(self.pool_size):
-            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            server.login(self.username, self.password)
-            logger.info(f'Created SMTP connection: {self.smtp_server}')
-            self.pool.append(server)
-
-    def _create_connection(self):
-        server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-        server.login(self.username, self.password)
-        return server
-
-    def get_connection(self):
-        with self.lock:
-            if self.pool:
-                connection = self.pool.pop()
-                try:
-                    connection.noop()   # Check if connection is still active
-                    return connection
-                except smtplib.SMTPServerDisconnected:
-                    return self._create_connection()
-            else:
-                return self._create_connection()
-
-    def release_connection(self, connection):
-        with self.lock:
-            self.pool.append(connection)
-
-    def send_email(self, subject: str, content: str, recipient: str):
-        connection = self.get_connection()
-        msg = MIMEMultipart()
-        msg['From'] = self.username
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        msg.attach(MIMEText(content, 'plain'))
-
-        try:
-            connection.sendmail(self.username, recipient, msg.as_string())
-            print('Email sent successfully')
-        except Exception as e:
-            print(f'Failed to send email: {e}')
-        finally:
-            self.release_connection(connection)
-
-
-smtp_pool = SMTPConnectionPool(pool_size=thread_size)
-
-executor = ThreadPoolExecutor(max_workers=10)
-
-
 @admin_router.post("/send", dependencies=[Depends(record_email_requested), Depends(verify_api_token)])
 async def send_email(email_request: EmailRequest, response: Response, request: Request) -> StandardResponse:
+    """
+    Queue an email for delivery. The message is sent by the background email workers; use `/email/status/{id}`
+    to follow its delivery status.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     try:
-        smtp_pool.send_email(email_request.subject, email_request.content, email_request.recipient)
-        add_email_sent_count(request)
-        return StandardResponse(data={
-            "code": 0,
-            "message": "Email sent successfully"
-        })
+        message_id = await enqueue_email(redis_client, email_request.subject, email_request.content,
+                                         email_request.recipient)
     except Exception as e:
-        add_email_failed_count(request)
+        logger.error(f"Failed to queue email: {e}")
         response.status_code = 500
-        return StandardResponse(retcode=500, message=f"Failed to send email: {e}",
+        return StandardResponse(retcode=500, message=f"Failed to queue email: {e}",
                                 data={
                                     "code": 500,
-                                    "message": f"Failed to send email: {e}"
+                                    "message": f"Failed to queue email: {e}"
                                 })
+    return StandardResponse(data={
+        "code": 0,
+        "message": "Email queued successfully",
+        "id": message_id
+    })
+
+
+@admin_router.get("/status/{message_id}", dependencies=[Depends(verify_api_token)])
+async def get_email_delivery_status(message_id: str, response: Response, request: Request) -> StandardResponse:
+    """
+    Get the delivery status of a queued email: queued, sending, retrying, sent or failed.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    status = await get_email_status(redis_client, message_id)
+    if status is None:
+        response.status_code = 404
+        return StandardResponse(retcode=404, message="Email not found")
+    return StandardResponse(data=status)
+
+
+@admin_router.get("/queue", dependencies=[Depends(verify_api_token)])
+async def get_email_queue_size(request: Request) -> StandardResponse:
+    """
+    Get the number of ready, in-flight and delayed messages in the email queue.
+    """
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    return StandardResponse(data=await email_queue.size(redis_client))
@@ -2,7 +2,7 @@ import pymysql
 import json
 import random
 import httpx
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, HTTPException
 from pydantic import BaseModel
 from datetime import date
 from redis import asyncio as aioredis
@@ -12,6 +12,9 @@ from mysql_app import crud, schemas
 from mysql_app.schemas import Wallpaper, StandardResponse
 from base_logger import get_logger
 from utils.dependencies import get_db
+from utils.metrics import record_cache
+from utils.response_cache import cached_response, render_standard_response, invalidate
+from utils.edge_cache import purge_edge_cache
 
 
 class WallpaperURL(BaseModel):
@@ -19,43 +22,42 @@ class WallpaperURL(BaseModel):
 
 
 logger = get_logger(__name__)
-china_router = APIRouter(tags=["wallpaper"], prefix="/wallpaper")
-global_router = APIRouter(tags=["wallpaper"], prefix="/wallpaper")
-fujian_router = APIRouter(tags=["wallpaper"], prefix="/wallpaper")
-
-
-@china_router.get("/all", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                  tags=["Management"])
-@global_router.get("/all", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-@fujian_router.get("/all", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-async def get_all_wallpapers(db: Session=Depends(get_db)) -> schemas.StandardResponse:
+router = APIRouter(tags=["wallpaper"], prefix="/wallpaper")
+
+
+@router.get("/all", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
+            tags=["Management"])
+async def get_all_wallpapers(request: Request, db: Session=Depends(get_db)) -> Response:
     """
     Get all wallpapers in database. **This endpoint requires API token verification**
 
+    :param request: Request object from FastAPI
+
     :param db: Database session
 
     :return: A list of wallpapers objects
     """
-    wallpapers = crud.get_all_wallpapers(db)
-    wallpaper_schema = [
-        schemas.Wallpaper.model_validate(wall.to_dict())
-        for wall in wallpapers
-    ]
-    return StandardResponse(data=wallpaper_schema, message="Successfully fetched all wallpapers")
-
-
-@china_router.post("/add", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-@global_router.post("/add", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                    tags=["Management"])
-@fujian_router.post("/add", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
-                    tags=["Management"])
-async def add_wallpaper(wallpaper: schemas.Wallpaper, db: Session=Depends(get_db)):
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+
+    async def render() -> bytes:
+        wallpapers = crud.get_all_wallpapers(db)
+        wallpaper_schema = [
+            schemas.Wallpaper.model_validate(wall.to_dict()).model_dump(mode="json")
+            for wall in wallpapers
+        ]
+        return render_standard_response(data=wallpaper_schema, message="Successfully fetched all wallpapers")
+
+    return await cached_response(redis_client, request.headers, "wallpaper:all", "all", render)
+
+
+@router.post("/add", response_model=schemas.StandardResponse, dependencies=[Depends(verify_api_token)],
+             tags=["Management"])
+async def add_wallpaper(request: Request, wallpaper: schemas.Wallpaper, db: Session=Depends(get_db)):
     """
     Add a new wallpaper to database. **This endpoint requires API token verification**
 
+    :param request: Request object from FastAPI
+
     :param wallpaper: Wallpaper object
 
     :param db: Database session
@@ -67,6 +69,7 @@ async def add_wallpaper(wallpaper: schemas.Wallpaper, db: Session=Depends(get_db
     wallpaper.last_display_date = None
     wallpaper.disabled = False
     add_result = crud.add_wallpaper(db, wallpaper)
+    await invalidate(aioredis.Redis.from_pool(request.app.state.redis), "wallpaper:all")
     if add_result:
         response.data = {
             "url": add_result.url,
@@ -80,12 +83,8 @@ async def add_wallpaper(wallpaper: schemas.Wallpaper, db: Session=Depends(get_db
     return response
 
 
-@china_router.post("/disable", dependencies=[Depends(verify_api_token)], tags=["Management"],
-                   response_model=StandardResponse)
-@global_router.post("/disable", dependencies=[Depends(verify_api_token)], tags=["Management"],
-                    response_model=StandardResponse)
-@fujian_router.post("/disable", dependencies=[Depends(verify_api_token)], tags=["Management"],
-                    response_model=StandardResponse)
+@router.post("/disable", dependencies=[Depends(verify_api_token)], tags=["Management"],
+             response_model=StandardResponse)
 async def disable_wallpaper_with_url(request: Request, db: Session=Depends(get_db)) -> StandardResponse:
     """
     Disable a wallpaper with its URL, so it won't be picked by the random wallpaper picker.
@@ -104,16 +103,13 @@ async def disable_wallpaper_with_url(request: Request, db: Session=Depends(get_d
             "result": False
         })
     db_result = crud.disable_wallpaper_with_url(db, url)
+    await invalidate(aioredis.Redis.from_pool(request.app.state.redis), "wallpaper:all")
     if db_result:
         return StandardResponse(data=db_result.to_dict())
     raise HTTPException(status_code=500, detail="Failed to disable wallpaper, it may not exist")
 
 
-@china_router.post("/enable", dependencies=[Depends(verify_api_token)], tags=["Management"], response_model=StandardResponse)
-@global_router.post("/enable", dependencies=[Depends(verify_api_token)], tags=["Management"],
-                    response_model=StandardResponse)
-@fujian_router.post("/enable", dependencies=[Depends(verify_api_token)], tags=["Management"],
-                    response_model=StandardResponse)
+@router.post("/enable", dependencies=[Depends(verify_api_token)], tags=["Management"], response_model=StandardResponse)
 async def enable_wallpaper_with_url(request: Request, db: Session=Depends(get_db)) -> StandardResponse:
     """
     Enable a wallpaper with its URL, so it will be picked by the random wallpaper picker.
@@ -132,6 +128,7 @@ async def enable_wallpaper_with_url(request: Request, db: Session=Depends(get_db
             "result": False
         })
     db_result = crud.enable_wallpaper_with_url(db, url)
+    await invalidate(aioredis.Redis.from_pool(request.app.state.redis), "wallpaper:all")
     if db_result:
         return StandardResponse(data=db_result.to_dict())
     raise HTTPException(status_code=404, detail="Wallpaper not found")
@@ -152,6 +149,7 @@ async def random_pick_wallpaper(request: Request, force_refresh: bool = False, d
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
     # Check wallpaper cache from Redis
     today_wallpaper = await redis_client.get("hutao_today_wallpaper")
+    record_cache("today_wallpaper", today_wallpaper is not None and not force_refresh)
     if today_wallpaper:
         today_wallpaper = Wallpaper(**json.loads(today_wallpaper))
     if today_wallpaper and not force_refresh:
@@ -171,13 +169,13 @@ async def random_pick_wallpaper(request: Request, force_refresh: bool = False, d
     res = crud.set_last_display_date_with_index(db, today_wallpaper_model.id)
     today_wallpaper = Wallpaper(**today_wallpaper_model.to_dict())
     await redis_client.set("hutao_today_wallpaper", today_wallpaper.model_dump_json(), ex=60 * 60 * 24)
+    await invalidate(redis_client, "wallpaper:all")
+    await purge_edge_cache("wallpaper-today")
     logger.info(f"Set last display date with index {today_wallpaper_model.id}: {res}")
     return today_wallpaper
 
 
-@china_router.get("/today", response_model=StandardResponse)
-@global_router.get("/today", response_model=StandardResponse)
-@fujian_router.get("/today", response_model=StandardResponse)
+@router.get("/today", response_model=StandardResponse)
 async def get_today_wallpaper(request: Request, db: Session=Depends(get_db)) -> StandardResponse:
     """
     Get today's wallpaper
@@ -199,12 +197,8 @@ async def get_today_wallpaper(request: Request, db: Session=Depends(get_db)) ->
     return response
 
 
-@china_router.get("/refresh", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                  tags=["Management"])
-@global_router.get("/refresh", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-@fujian_router.get("/refresh", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
+@router.get("/refresh", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
+            tags=["Management"])
 async def get_today_wallpaper(request: Request, db: Session=Depends(get_db)) -> StandardResponse:
     """
     Refresh today's wallpaper. **This endpoint requires API token verification**
@@ -231,16 +225,14 @@ async def get_today_wallpaper(request: Request, db: Session=Depends(get_db)) ->
     return response
 
 
-@china_router.get("/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                  tags=["Management"])
-@global_router.get("/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-@fujian_router.get("/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
-                   tags=["Management"])
-async def reset_last_display(db: Session=Depends(get_db)) -> StandardResponse:
+@router.get("/reset", response_model=StandardResponse, dependencies=[Depends(verify_api_token)],
+            tags=["Management"])
+async def reset_last_display(request: Request, db: Session=Depends(get_db)) -> StandardResponse:
     """
     Reset last display date of all wallpapers. **This endpoint requires API token verification**
 
+    :param request: Request object from FastAPI
+
     :param db: Database session
 
     :return: StandardResponse object with result in data field
@@ -249,12 +241,11 @@ async def reset_last_display(db: Session=Depends(get_db)) -> StandardResponse:
     response.data = {
         "result": crud.reset_last_display(db)
     }
+    await invalidate(aioredis.Redis.from_pool(request.app.state.redis), "wallpaper:all")
     return response
 
 
-@china_router.get("/bing", response_model=StandardResponse)
-@global_router.get("/bing", response_model=StandardResponse)
-@fujian_router.get("/bing", response_model=StandardResponse)
+@router.get("/bing", response_model=StandardResponse)
 async def get_bing_wallpaper(request: Request) -> StandardResponse:
     """
     Get Bing wallpaper
@@ -263,29 +254,25 @@ async def get_bing_wallpaper(request: Request) -> StandardResponse:
 
     :return: StandardResponse object with Bing wallpaper data in data field
     """
-    url_path = request.url.path
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    if url_path.startswith("/global"):
+    if request.state.region == "global":
         redis_key = "bing_wallpaper_global"
         bing_api = "https://www.bing.com/HPImageArchive.aspx?format=js&idx=0&n=1&mkt=en-US"
         bing_prefix = "www"
-    elif url_path.startswith("/cn") or url_path.startswith("/fj"):
+    else:
         redis_key = "bing_wallpaper_cn"
         bing_api = "https://cn.bing.com/HPImageArchive.aspx?format=js&idx=0&n=1"
         bing_prefix = "cn"
-    else:
-        redis_key = "bing_wallpaper_global"
-        bing_api = "https://www.bing.com/HPImageArchive.aspx?format=js&idx=0&n=1&mkt=en-US"
-        bing_prefix = "www"
 
     try:
-        redis_data = await json.loads(redis_client.get(redis_key))
+        redis_data = json.loads(await redis_client.get(redis_key))
+        record_cache("bing_wallpaper", True)
         response = StandardResponse()
         response.message = f"cached: {redis_key}"
         response.data = redis_data
         return response
     except (json.JSONDecodeError, TypeError):
-        pass
+        record_cache("bing_wallpaper", False)
     # Get Bing wallpaper
     try:
         bing_output = httpx.get(bing_api).json()
@@ -323,16 +310,8 @@ async def get_genshin_launcher_wallpaper(request: Request, language: str = "en-u
     """
     language_set = ["zh-cn", "zh-tw", "en-us", "ja-jp", "ko-kr", "fr-fr", "de-de", "es-es", "pt-pt", "ru-ru", "id-id",
                     "vi-vn", "th-th"]
-    url_path = request.url.path
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    if url_path.startswith("/global"):
-        if language not in language_set:
-            language = "en-us"
-        g_type = "global"
-        redis_key = f"genshin_launcher_wallpaper_global_{language}"
-        genshin_launcher_wallpaper_api = (f"https://sdk-os-static.mihoyo.com/hk4e_global/mdk/launcher/api/content"
-                                          f"?filter_adv=true&key=gcStgarh&language={language}&launcher_id=10")
-    elif url_path.startswith("/cn"):
+    if request.state.region == "cn":
         g_type = "cn"
         redis_key = "genshin_launcher_wallpaper_cn"
         genshin_launcher_wallpaper_api = (f"https://sdk-static.mihoyo.com/hk4e_cn/mdk/launcher/api/content?filter_adv"
@@ -346,9 +325,10 @@ async def get_genshin_launcher_wallpaper(request: Request, language: str = "en-u
                                           f"?filter_adv=true&key=gcStgarh&language={language}&launcher_id=10")
     # Check Redis
     try:
-        redis_data = await json.loads(redis_client.get(redis_key))
+        redis_data = json.loads(await redis_client.get(redis_key))
     except (json.JSONDecodeError, TypeError):
         redis_data = None
+    record_cache("genshin_launcher_wallpaper", redis_data is not None)
     if redis_data is not None:
         response = StandardResponse()
         response.message = f"cached: {redis_key}"
@@ -371,9 +351,7 @@ async def get_genshin_launcher_wallpaper(request: Request, language: str = "en-u
     return response
 
 
-@china_router.get("/hoyoplay", response_model=StandardResponse)
-@global_router.get("/hoyoplay", response_model=StandardResponse)
-@fujian_router.get("/hoyoplay", response_model=StandardResponse)
+@router.get("/hoyoplay", response_model=StandardResponse)
 async def get_genshin_launcher_wallpaper(request: Request) -> StandardResponse:
     """
     Get HoYoPlay wallpaper
@@ -386,9 +364,10 @@ async def get_genshin_launcher_wallpaper(request: Request) -> StandardResponse:
     hoyoplay_api = "https://hyp-api.mihoyo.com/hyp/hyp-connect/api/getGames?launcher_id=jGHBHlcOq1&language=zh-cn"
     redis_key = "hoyoplay_cn_wallpaper"
     try:
-        redis_data = await json.loads(redis_client.get(redis_key))
+        redis_data = json.loads(await redis_client.get(redis_key))
     except (json.JSONDecodeError, TypeError):
         redis_data = None
+    record_cache("hoyoplay_wallpaper", redis_data is not None)
     if redis_data is not None:
         response = StandardResponse()
         response.message = f"cached: {redis_key}"
@@ -0,0 +1,163 @@
+import hmac
+import json
+import hashlib
+from fastapi import APIRouter, Request, Response, status, Header
+from redis import asyncio as aioredis
+from typing import Optional
+from mysql_app.schemas import StandardResponse
+from routers.patch_next import update_snap_hutao_latest_version, update_snap_hutao_deployment_version
+from routers.metadata import apply_metadata_repo_push
+from routers.issue import apply_issue_event
+from utils.dgp_utils import WHITE_LIST_REPOSITORIES
+from utils.scheduler import scheduler
+from config import GITHUB_WEBHOOK_SECRET
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+router = APIRouter(tags=["Webhook"], prefix="/webhook")
+# GitHub redelivers on timeouts and by hand; each delivery is handled once
+DELIVERY_KEY_TTL = 24 * 60 * 60  # seconds
+
+
+def verify_github_signature(body: bytes, signature: Optional[str]) -> bool:
+    if not GITHUB_WEBHOOK_SECRET or not signature:
+        return False
+    expected = "sha256=" + hmac.new(GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def parse_release_version(version: str) -> tuple[int, ...] | None:
+    try:
+        return tuple(int(part) for part in version.split("."))
+    except ValueError:
+        return None
+
+
+async def is_latest_release(redis_client: aioredis.Redis, version_key: str, tag_name: str) -> bool:
+    """
+    Whether a release is at least as new as the cached latest version, so its payload can be applied as is.
+
+    An older release that is published or edited later is not the latest one; applying it would roll the version back.
+    Unknown or unparsable versions are not trusted either.
+    """
+    cached_version = await redis_client.get(version_key)
+    if cached_version is None:
+        return False
+    release_version = parse_release_version(tag_name + ".0")
+    cached_version = parse_release_version(cached_version.decode("utf-8"))
+    return release_version is not None and cached_version is not None and release_version >= cached_version
+
+
+async def apply_release(redis_client: aioredis.Redis, payload: dict, project: str, update_func, job_name: str,
+                        display_name: str) -> str:
+    release = payload["release"]
+    # A deleted release may have been the latest one, and an older one is not; let the scheduler fetch the latest
+    if payload["action"] == "deleted" or not await is_latest_release(redis_client, f"{project}:version",
+                                                                     release["tag_name"]):
+        await scheduler.trigger(redis_client, job_name)
+        return f"Refreshing {display_name} after {release['tag_name']} was {payload['action']}"
+    await update_func(redis_client, release)
+    return f"Updated {display_name} to {release['tag_name']}"
+
+
+async def handle_release(redis_client: aioredis.Redis, payload: dict) -> str:
+    repository = payload["repository"]["full_name"]
+    release = payload["release"]
+    if payload["action"] not in ("published", "released", "edited", "deleted"):
+        return f"Ignored {payload['action']} release"
+    if repository in WHITE_LIST_REPOSITORIES:
+        # The user agent allowlist is derived from the latest releases of these repositories
+        await scheduler.trigger(redis_client, "allowed-user-agents")
+    if release["draft"] or release["prerelease"]:
+        return f"Ignored draft or prerelease {release['tag_name']}"
+    if repository == "DGP-Studio/Snap.Hutao":
+        return await apply_release(redis_client, payload, "snap-hutao", update_snap_hutao_latest_version,
+                                   "snap-hutao-version", "Snap Hutao")
+    if repository == "DGP-Studio/Snap.Hutao.Deployment":
+        return await apply_release(redis_client, payload, "snap-hutao-deployment",
+                                   update_snap_hutao_deployment_version, "snap-hutao-deployment-version",
+                                   "Snap Hutao Deployment")
+    return f"Ignored release of {repository}"
+
+
+async def handle_workflow_run(redis_client: aioredis.Redis, payload: dict) -> str:
+    run = payload["workflow_run"]
+    if (payload["repository"]["full_name"] != "DGP-Studio/Snap.Hutao" or payload["action"] != "completed"
+            or run["conclusion"] != "success" or run["head_branch"] != "develop"
+            or not run["path"].endswith("alpha.yml")):
+        return "Ignored workflow run"
+    # Artifacts are not part of the payload; the job fetches them once on the scheduler leader
+    await scheduler.trigger(redis_client, "snap-hutao-alpha-version")
+    await scheduler.trigger(redis_client, "allowed-user-agents")
+    return f"Refreshing Snap Hutao Alpha from run {run['id']}"
+
+
+async def handle_push(redis_client: aioredis.Redis, payload: dict) -> str:
+    repository = payload["repository"]["full_name"]
+    if payload["ref"] != f"refs/heads/{payload['repository']['default_branch']}":
+        return f"Ignored push to {payload['ref']}"
+    if repository == "DGP-Studio/Snap.Metadata":
+        if payload.get("forced") or not await apply_metadata_repo_push(redis_client, payload["commits"]):
+            await scheduler.trigger(redis_client, "metadata-file-list")
+            return "Refreshing metadata file list"
+        return f"Applied {len(payload['commits'])} metadata commits"
+    if repository == "DGP-Studio/Snap.Static":
+        await scheduler.trigger(redis_client, "static-files-size")
+        return "Refreshing static files size"
+    return f"Ignored push to {repository}"
+
+
+async def handle_issues(redis_client: aioredis.Redis, payload: dict) -> str:
+    if payload["repository"]["full_name"] != "DGP-Studio/Snap.Hutao":
+        return "Ignored issue"
+    applied = await apply_issue_event(redis_client, payload["issue"])
+    return f"Applied issue #{payload['issue']['number']}" if applied else "No cached issues to update"
+
+
+EVENT_HANDLERS = {
+    "release": handle_release,
+    "workflow_run": handle_workflow_run,
+    "push": handle_push,
+    "issues": handle_issues,
+}
+
+
+@router.post("/github", response_model=StandardResponse)
+async def github_webhook(request: Request, response: Response,
+                         x_github_event: Optional[str] = Header(None),
+                         x_github_delivery: Optional[str] = Header(None),
+                         x_hub_signature_256: Optional[str] = Header(None)) -> StandardResponse:
+    """
+    ## GitHub Webhook
+
+    Receives release, workflow_run, push and issues events and updates the related Redis state right away. Payloads
+    of the latest release and of issues are applied directly; refreshes that need more data from GitHub, or that must
+    find out which release is the latest, are handed to the scheduler.
+
+    **Restrictions:**
+    - The payload must be signed with `GITHUB_WEBHOOK_SECRET` (X-Hub-Signature-256); returns HTTP 401 otherwise.
+    """
+    body = await request.body()
+    if not verify_github_signature(body, x_hub_signature_256):
+        logger.warning(f"Rejected GitHub webhook {x_github_delivery} with an invalid signature")
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        return StandardResponse(retcode=401, message="Invalid signature")
+
+    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
+    if x_github_delivery and not await redis_client.set(f"webhook:github:delivery:{x_github_delivery}", 1, nx=True,
+                                                        ex=DELIVERY_KEY_TTL):
+        return StandardResponse(message=f"Delivery {x_github_delivery} already handled")
+
+    handler = EVENT_HANDLERS.get(x_github_event)
+    if handler is None:
+        return StandardResponse(message=f"Ignored {x_github_event} event")
+    try:
+        message = await handler(redis_client, json.loads(body))
+    except Exception:
+        # Let a redelivery of the failed event through
+        if x_github_delivery:
+            await redis_client.delete(f"webhook:github:delivery:{x_github_delivery}")
+        raise
+    logger.info(f"GitHub {x_github_event} webhook {x_github_delivery}: {message}")
+    return StandardResponse(message=message)
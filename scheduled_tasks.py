@@ -1,71 +1,171 @@
+import asyncio
 import datetime
-import time
-import os
-import redis
-from datetime import date, timedelta
-from scheduler import Scheduler
-import config  # DO NOT REMOVE
+from redis import asyncio as aioredis
 from base_logger import get_logger
-from mysql_app.schemas import DailyActiveUserStats, DailyEmailSentStats
+from mysql_app.schemas import DailyActiveUserStats, DailyEmailSentStats, ClientVersionStats
 from mysql_app.database import SessionLocal
-from mysql_app.crud import dump_daily_active_user_stats, dump_daily_email_sent_stats
+from mysql_app.crud import dump_daily_active_user_stats, dump_daily_email_sent_stats, dump_client_version_stats
+from routers.patch_next import (update_snap_hutao_latest_version, update_snap_hutao_deployment_version,
+                                fetch_snap_hutao_alpha_latest_version, refresh_project_version)
+from routers.metadata import fetch_metadata_repo_file_list
+from routers.static import (list_static_files_size_by_archive_json, upload_all_static_archive_to_cdn,
+                            fetch_static_raw_file_index)
+from routers.strategy import (refresh_miyoushe_avatar_strategy, refresh_hoyolab_avatar_strategy,
+                              refresh_avatar_strategy_cache)
+from utils.dgp_utils import update_recent_versions
+from utils.mirror_selection import probe_mirrors
+from utils.rollout import advance_rollout
+from utils.scheduler import Scheduler
+from utils.jobs import JobRunner
+from utils.edge_cache import purge_edge_cache
+from utils.stats import (stat_date, daily_stat_key, active_users_key, client_version_key, client_version_index_key,
+                         unlink_legacy_client_version_keys, DAU_REGIONS, DAU_KEY_RETENTION_DAYS)
 
 
 logger = get_logger(__name__)
-scan_duration = int(os.getenv("CENSOR_FILE_SCAN_DURATION", 30))  # Scan duration in *minutes*
-tz_shanghai = datetime.timezone(datetime.timedelta(hours=8))
-print(f"Scan duration: {scan_duration} minutes.")
-REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+CLIENT_VERSION_KEY_GRACE_SECONDS = 24 * 60 * 60
 
 
-def dump_daily_active_user_data() -> None:
+def _write_stats(dump_func, stats) -> None:
     db = SessionLocal()
-    redis_conn = redis.Redis(host=REDIS_HOST, port=6379, db=0)
+    try:
+        dump_func(db, stats)
+    finally:
+        db.close()
 
-    active_users_cn = redis_conn.scard("stat:active_users:cn")
-    delete_cn_result = redis_conn.delete("stat:active_users:cn")
-    logger.info(f"active_user_cn: {active_users_cn}, delete result: {delete_cn_result}")
 
-    active_users_global = redis_conn.scard("stat:active_users:global")
-    delete_global_result = redis_conn.delete("stat:active_users:global")
-    logger.info(f"active_users_global: {active_users_global}, delete result: {delete_global_result}")
+async def dump_daily_active_user_data(redis_client: aioredis.Redis,
+                                      day: datetime.date | None = None) -> DailyActiveUserStats:
+    """
+    Persist the active user counts of a finished day (yesterday by default) and drop day keys past retention.
 
-    active_users_unknown = redis_conn.scard("stat:active_users:unknown")
-    delete_unknown_result = redis_conn.delete("stat:active_users:unknown")
-    logger.info(f"active_users_unknown: {active_users_unknown}, delete result: {delete_unknown_result}")
+    Writers moved on to a new key at midnight, so counting yesterday's keys is race-free and the keys are left in
+    place for `DAU_KEY_RETENTION_DAYS` so a day can be recomputed.
+    """
+    day = day or stat_date(1)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for region in DAU_REGIONS:
+            pipe.scard(active_users_key(region, day))
+        active_users_cn, active_users_global, active_users_unknown = await pipe.execute()
+    logger.info(f"active_users_cn: {active_users_cn}, active_users_global: {active_users_global}, "
+                f"active_users_unknown: {active_users_unknown}")
 
-    yesterday_date = date.today() - timedelta(days=1)
-    daily_active_user_data = DailyActiveUserStats(date=yesterday_date, cn_user=active_users_cn,
+    daily_active_user_data = DailyActiveUserStats(date=day, cn_user=active_users_cn,
                                                   global_user=active_users_global, unknown=active_users_unknown)
-    logger.info(f"Daily active data of {yesterday_date}: {daily_active_user_data}; Data generated at {datetime.datetime.now()}.")
-    dump_daily_active_user_stats(db, daily_active_user_data)
-    db.close()
-    logger.info(f"Daily active user data dumped at {datetime.datetime.now()}.")
+    await asyncio.to_thread(_write_stats, dump_daily_active_user_stats, daily_active_user_data)
+    logger.info(f"Daily active user data dumped: {daily_active_user_data}")
 
+    # UNLINK frees the sets in a background thread; sweep a week past retention in case earlier runs were missed
+    expired_keys = [active_users_key(region, stat_date(days_ago))
+                    for days_ago in range(DAU_KEY_RETENTION_DAYS + 1, DAU_KEY_RETENTION_DAYS + 8)
+                    for region in DAU_REGIONS]
+    unlinked = await redis_client.unlink(*expired_keys)
+    logger.info(f"Unlinked {unlinked} active user keys older than {DAU_KEY_RETENTION_DAYS} days")
+    return daily_active_user_data
 
-def dump_daily_email_sent_data() -> None:
-    db = SessionLocal()
-    redis_conn = redis.Redis(host=REDIS_HOST, port=6379, db=0)
 
-    email_requested = redis_conn.getdel("stat:email_requested")
-    email_sent = redis_conn.getdel("stat:email_sent")
-    email_failed = redis_conn.getdel("stat:email_failed")
+async def dump_daily_email_sent_data(redis_client: aioredis.Redis) -> DailyEmailSentStats:
+    yesterday_date = stat_date(1)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for name in ("email_requested", "email_sent", "email_failed"):
+            pipe.getdel(daily_stat_key(name, yesterday_date))
+        email_requested, email_sent, email_failed = [int(value or 0) for value in await pipe.execute()]
     logger.info(f"email_requested: {email_requested}; email_sent: {email_sent}; email_failed: {email_failed}")
 
-    yesterday_date = date.today() - timedelta(days=1)
-    daily_email_sent_data = DailyEmailSentStats(date=yesterday_date, requested=email_requested, sent=email_sent, failed=email_failed)
-    logger.info(f"Daily email sent data of {yesterday_date}: {daily_email_sent_data}; Data generated at {datetime.datetime.now()}.")
-    dump_daily_email_sent_stats(db, daily_email_sent_data)
-    db.close()
-    logger.info(f"Daily email sent data dumped at {datetime.datetime.now()}.")
-
-
-if __name__ == "__main__":
-    schedule = Scheduler(tzinfo=tz_shanghai)
-    schedule.daily(datetime.time(hour=0, minute=0, tzinfo=tz_shanghai), dump_daily_active_user_data)
-    while True:
-        schedule.exec_jobs()
-        time.sleep(1)
-        current_minute = datetime.datetime.now().minute
-        if current_minute == 0 or current_minute == 30:
-            print(schedule)
+    daily_email_sent_data = DailyEmailSentStats(date=yesterday_date, requested=email_requested, sent=email_sent,
+                                                failed=email_failed)
+    await asyncio.to_thread(_write_stats, dump_daily_email_sent_stats, daily_email_sent_data)
+    logger.info(f"Daily email sent data dumped: {daily_email_sent_data}")
+    return daily_email_sent_data
+
+
+async def dump_daily_client_version_data(redis_client: aioredis.Redis,
+                                         day: datetime.date | None = None) -> list[ClientVersionStats]:
+    """
+    Persist per-version device counts of a finished day (yesterday by default), then let the day keys expire.
+    """
+    day = day or stat_date(1)
+    versions = sorted(version.decode("utf-8") for version in await redis_client.smembers(client_version_index_key(day)))
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for version in versions:
+            pipe.scard(client_version_key(version, day))
+        counts = await pipe.execute()
+    client_version_data = [ClientVersionStats(date=day, version=version, users=users)
+                           for version, users in zip(versions, counts) if users]
+    await asyncio.to_thread(_write_stats, dump_client_version_stats, client_version_data)
+    logger.info(f"Client version data of {day} dumped: {len(client_version_data)} versions")
+
+    # Keep the rolled-up sets for a day in case the rollup has to be rerun
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for version in versions:
+            pipe.expire(client_version_key(version, day), CLIENT_VERSION_KEY_GRACE_SECONDS)
+        pipe.expire(client_version_index_key(day), CLIENT_VERSION_KEY_GRACE_SECONDS)
+        await pipe.execute()
+    await unlink_legacy_client_version_keys(redis_client)
+    return client_version_data
+
+
+async def refresh_avatar_strategy(redis_client: aioredis.Redis) -> None:
+    for refresh in (refresh_miyoushe_avatar_strategy, refresh_hoyolab_avatar_strategy,
+                    refresh_avatar_strategy_cache):
+        db = SessionLocal()
+        try:
+            await refresh(redis_client, db)
+        finally:
+            db.close()
+
+
+async def purge_edge_cache_tags(redis_client: aioredis.Redis, tags: list[str]) -> dict:
+    # For data changed outside this service, e.g. the static URL templates
+    return {"tags": tags, "purged": await purge_edge_cache(*tags)}
+
+
+def register_jobs(scheduler: Scheduler) -> None:
+    """
+    Register all periodic upstream work. Jobs run on the scheduler leader only, once across the cluster.
+    """
+    # Release metadata
+    scheduler.add_job("snap-hutao-version", update_snap_hutao_latest_version, interval=10 * 60, jitter=30,
+                      timeout=120)
+    # Also computes the installer checksum that the startup refresh skips
+    scheduler.add_job("snap-hutao-deployment-version", update_snap_hutao_deployment_version, interval=30 * 60,
+                      jitter=60, timeout=120, run_at_startup=True)
+    # The alpha patch key expires after 10 minutes
+    scheduler.add_job("snap-hutao-alpha-version", fetch_snap_hutao_alpha_latest_version, interval=5 * 60, jitter=30,
+                      timeout=120)
+    # Grows the staged rollout of a new release by one step per step interval
+    scheduler.add_job("snap-hutao-rollout", advance_rollout, interval=60, timeout=30)
+    # Download redirects skip mirrors that failed their last probe
+    scheduler.add_job("mirror-health", probe_mirrors, interval=60, jitter=5, timeout=60, run_at_startup=True)
+    # The user agent allowlist expires after an hour
+    scheduler.add_job("allowed-user-agents", update_recent_versions, interval=30 * 60, jitter=60, timeout=120,
+                      run_at_startup=True)
+
+    # Resource caches
+    scheduler.add_job("metadata-file-list", fetch_metadata_repo_file_list, interval=10 * 60, jitter=30, timeout=120,
+                      run_at_startup=True)
+    scheduler.add_job("static-files-size", list_static_files_size_by_archive_json, interval=60 * 60, jitter=120,
+                      timeout=120, run_at_startup=True)
+    # The static raw file index expires after two hours
+    scheduler.add_job("static-raw-file-index", fetch_static_raw_file_index, interval=30 * 60, jitter=60,
+                      timeout=120, run_at_startup=True)
+    scheduler.add_job("avatar-strategy", refresh_avatar_strategy, interval=6 * 60 * 60, jitter=10 * 60,
+                      timeout=15 * 60, run_at_startup=True)
+
+    # Daily statistics rollup (UTC+8), a few minutes after midnight so late writes to yesterday's keys have landed
+    scheduler.add_job("dump-daily-active-users", dump_daily_active_user_data, at=datetime.time(0, 5), timeout=300)
+    scheduler.add_job("dump-daily-email-stats", dump_daily_email_sent_data, at=datetime.time(0, 1), timeout=300)
+    scheduler.add_job("dump-daily-client-versions", dump_daily_client_version_data, at=datetime.time(0, 10),
+                      timeout=600)
+
+
+def register_job_kinds(job_runner: JobRunner) -> None:
+    """
+    Register the admin operations that run as tracked jobs, queued through `/jobs` or their own endpoints.
+    """
+    # Streams every archive through this process; one upload at a time across the cluster
+    job_runner.add_kind("static-cdn-upload", upload_all_static_archive_to_cdn, concurrency=1, timeout=2 * 60 * 60)
+    job_runner.add_kind("project-version", refresh_project_version, concurrency=2, timeout=5 * 60)
+    job_runner.add_kind("static-files-size", list_static_files_size_by_archive_json, concurrency=1, timeout=120)
+    job_runner.add_kind("avatar-strategy", refresh_avatar_strategy, concurrency=1, timeout=15 * 60)
+    job_runner.add_kind("edge-cache-purge", purge_edge_cache_tags, concurrency=1, timeout=60)
@@ -0,0 +1,12 @@
+-- SQL script to create the client_version_stats table
+-- This can be used to manually create the table if needed
+-- One row per day and client version, written by the daily client version rollup job
+
+CREATE TABLE IF NOT EXISTS `client_version_stats` (
+  `date` date NOT NULL,
+  `version` varchar(64) NOT NULL,
+  `users` int NOT NULL,
+  PRIMARY KEY (`date`, `version`),
+  KEY `ix_client_version_stats_date` (`date`),
+  KEY `ix_client_version_stats_version` (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -7,7 +7,7 @@ def patch_test():
     while True:
         random_uuid = str(uuid.uuid4())
         headers = {
-            "x-device-id": random_uuid,
+            "x-hutao-device-id": random_uuid,
             "x-region": "cn",
             "user-agent": "Snap Hutao/12.0.0.0"
         }
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Literal
 
@@ -7,9 +7,12 @@ class MirrorMeta(BaseModel):
     url: str
     mirror_name: str
     mirror_type: Literal["direct", "archive", "browser"] = "direct"
+    # Relative share of download redirects; 0 keeps the mirror listed but never redirects to it
+    weight: int = Field(default=1, ge=0)
 
     def __str__(self):
-        return f"MirrorMeta(url={self.url}, mirror_name={self.mirror_name}, mirror_type={self.mirror_type})"
+        return (f"MirrorMeta(url={self.url}, mirror_name={self.mirror_name}, mirror_type={self.mirror_type}, "
+                f"weight={self.weight})")
 
 
 class PatchMeta(BaseModel):
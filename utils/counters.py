@@ -0,0 +1,62 @@
+import asyncio
+from collections import defaultdict
+from redis import asyncio as aioredis
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+COUNTER_FLUSH_INTERVAL = 5  # seconds
+
+
+class CounterBuffer:
+    """
+    In-process counter accumulator flushed to Redis in batches.
+
+    `incr` only touches a local dict, so counting costs nothing on the request path; a background task periodically
+    swaps the buffer out and writes it with a single INCRBY pipeline. Increments that fail to flush are merged back
+    and retried on the next cycle.
+    """
+
+    def __init__(self):
+        self._pending: defaultdict[str, int] = defaultdict(int)
+        self._task: asyncio.Task | None = None
+        self._redis_client: aioredis.Redis | None = None
+
+    def incr(self, key: str, amount: int = 1) -> None:
+        self._pending[key] += amount
+
+    async def flush(self, redis_client: aioredis.Redis) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, defaultdict(int)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, amount in pending.items():
+                    pipe.incrby(key, amount)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to flush {len(pending)} counters, keeping them for the next cycle: {e}")
+            for key, amount in pending.items():
+                self._pending[key] += amount
+            return 0
+        return len(pending)
+
+    def start(self, redis_pool: aioredis.ConnectionPool, interval: float = COUNTER_FLUSH_INTERVAL) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        self._task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush(self._redis_client)
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush(self._redis_client)
+
+
+counters = CounterBuffer()
@@ -0,0 +1,163 @@
+"""
+Edge caching of hot read endpoints behind the Cloudflare tunnel.
+
+Each route in `EDGE_CACHE_POLICIES` gets a Cache-Control header telling clients and the edge how long to keep the
+response, a strong ETag so clients can revalidate with If-None-Match and get a 304, and a Cache-Tag naming the data it
+is built from. Writers of that data call `purge_edge_cache` with the tag, so the edge drops the stale copies right
+away instead of waiting for them to expire.
+"""
+import hashlib
+import httpx
+from starlette.datastructures import MutableHeaders
+from config import CLOUDFLARE_API_URL, CLOUDFLARE_ZONE_ID, CLOUDFLARE_PURGE_TOKEN
+from utils.fast_redirect import REGION_ROUTE_PREFIX
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+# For responses that depend on more than the URL, e.g. on request headers; clients still revalidate with the ETag
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+PURGE_TIMEOUT = 10  # seconds
+# Headers of a 304 response, RFC 9110 section 15.4.5
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary")
+
+
+class EdgeCachePolicy:
+    """
+    How long a route's responses are kept.
+
+    :param max_age: seconds clients keep the response
+    :param s_maxage: seconds the edge keeps the response; longer than max_age because purges reach the edge only
+    :param stale_while_revalidate: seconds the edge keeps serving an expired response while refreshing it
+    :param stale_if_error: seconds the edge keeps serving an expired response while the origin fails
+    :param tag: Cache-Tag to purge the responses by
+    """
+
+    def __init__(self, max_age: int, s_maxage: int, stale_while_revalidate: int = 0, stale_if_error: int = 0,
+                 tag: str | None = None):
+        self.tag = tag
+        directives = ["public", f"max-age={max_age}", f"s-maxage={s_maxage}"]
+        if stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={stale_while_revalidate}")
+        if stale_if_error:
+            directives.append(f"stale-if-error={stale_if_error}")
+        self.cache_control = ", ".join(directives)
+
+
+# Route path (without the region prefix) -> policy
+EDGE_CACHE_POLICIES = {
+    # Private: the version depends on the rollout cohort of the device and every request records the device
+    "/patch/hutao": None,
+    # Private: an edge copy would skip the client version check of the route
+    "/metadata/template": None,
+    # The URL templates are changed by hand; purge them through the edge-cache-purge job
+    "/static/template": EdgeCachePolicy(max_age=300, s_maxage=3600, stale_while_revalidate=600,
+                                        stale_if_error=24 * 3600, tag="static-template"),
+    "/strategy/all": EdgeCachePolicy(max_age=600, s_maxage=24 * 3600, stale_while_revalidate=600,
+                                     stale_if_error=24 * 3600, tag="strategy"),
+    "/wallpaper/today": EdgeCachePolicy(max_age=600, s_maxage=3600, stale_while_revalidate=600,
+                                        stale_if_error=24 * 3600, tag="wallpaper-today"),
+}
+
+
+def compute_etag(body: bytes) -> str:
+    # Compressed variants have different bytes and so get different ETags
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison, as If-None-Match requires; the edge turns ETags weak when it recompresses a response.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+class EdgeCacheMiddleware:
+    """
+    Pure ASGI middleware adding the caching headers of `EDGE_CACHE_POLICIES` to successful GET responses, and answering
+    them with 304 Not Modified when the client already has the current version.
+
+    A route whose response depends on more than the URL sets `PRIVATE_CACHE_CONTROL` itself; its Cache-Control is
+    kept and no Cache-Tag is added, so the edge does not store it. Add it inside CORSMiddleware so 304 responses keep
+    the CORS headers.
+    """
+
+    def __init__(self, app, policies: dict[str, EdgeCachePolicy | None] = None):
+        self.app = app
+        self.policies = EDGE_CACHE_POLICIES if policies is None else policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        policy = None
+        chunks = []
+
+        async def buffered_send(message) -> None:
+            nonlocal start_message, policy
+            if start_message is None:
+                route_path = getattr(scope.get("route"), "path", "").removeprefix(REGION_ROUTE_PREFIX)
+                if message["status"] != 200 or route_path not in self.policies:
+                    start_message = False
+                else:
+                    start_message = message
+                    policy = self.policies[route_path]
+                    return
+            if start_message is False:
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self._send(scope, start_message, b"".join(chunks), policy, send)
+
+        await self.app(scope, receive, buffered_send)
+
+    @staticmethod
+    async def _send(scope, start_message, body: bytes, policy: EdgeCachePolicy | None, send) -> None:
+        headers = MutableHeaders(scope=start_message)
+        if "etag" not in headers:
+            headers["ETag"] = compute_etag(body)
+        if "cache-control" not in headers:
+            headers["Cache-Control"] = policy.cache_control if policy is not None else PRIVATE_CACHE_CONTROL
+        if policy is not None and policy.tag and not headers["cache-control"].startswith("private"):
+            headers["Cache-Tag"] = policy.tag
+
+        if_none_match = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"if-none-match"),
+                             None)
+        if if_none_match is not None and etag_matches(if_none_match, headers["etag"]):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(key, value) for key, value in start_message["headers"]
+                            if key.decode("latin-1").lower() in NOT_MODIFIED_HEADERS]
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
+
+
+async def purge_edge_cache(*tags: str) -> bool:
+    """
+    Drop the edge copies of every response with one of the Cache-Tags; skipped while Cloudflare is not configured.
+
+    Failures are logged and not raised: the copies still expire after the s-maxage of their policy.
+
+    :return: whether the edge accepted the purge
+    """
+    if not CLOUDFLARE_ZONE_ID or not CLOUDFLARE_PURGE_TOKEN:
+        logger.debug("Cloudflare is not configured, not purging edge cache tags %s", tags)
+        return False
+    try:
+        async with httpx.AsyncClient(timeout=PURGE_TIMEOUT) as client:
+            response = await client.post(f"{CLOUDFLARE_API_URL}/zones/{CLOUDFLARE_ZONE_ID}/purge_cache",
+                                         headers={"Authorization": f"Bearer {CLOUDFLARE_PURGE_TOKEN}"},
+                                         json={"tags": list(tags)})
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.error(f"Failed to purge edge cache tags {tags}: {e}")
+        return False
+    logger.info(f"Purged edge cache tags {tags}")
+    return True
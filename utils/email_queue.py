@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import random
+import asyncio
+import smtplib
+import threading
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from redis import asyncio as aioredis
+from utils.redis_queue import RedisQueue
+from utils.stats import add_email_sent_count, add_email_failed_count
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+SERVER_TYPE = os.getenv("SERVER_TYPE", "dev")
+EMAIL_WORKER_COUNT = int(os.getenv("EMAIL_WORKER_COUNT", "1" if SERVER_TYPE == "dev" else "5"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "10"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_STATUS_TTL = 7 * 24 * 60 * 60
+
+email_queue = RedisQueue("email", lease_seconds=300)
+
+
+class SMTPConnectionPool:
+    """
+    Lazily connected pool of logged-in SMTP sessions.
+
+    Connections are opened on first use instead of at import time, so the API still starts when the SMTP server is
+    unreachable; failures surface per message and are retried by the queue workers.
+    """
+
+    def __init__(self, pool_size: int = 5):
+        self.smtp_server = os.getenv("EMAIL_SERVER")
+        self.smtp_port = int(os.getenv("EMAIL_PORT", "465"))
+        self.username = os.getenv("EMAIL_USERNAME")
+        self.password = os.getenv("EMAIL_PASSWORD")
+        self.pool_size = pool_size
+        self.pool = []
+        self.lock = threading.Lock()
+
+    def _create_connection(self):
+        server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30)
+        server.login(self.username, self.password)
+        logger.info(f"Created SMTP connection: {self.smtp_server}")
+        return server
+
+    def get_connection(self):
+        with self.lock:
+            connection = self.pool.pop() if self.pool else None
+        if connection is not None:
+            try:
+                connection.noop()  # Check if connection is still active
+                return connection
+            except (smtplib.SMTPException, OSError):
+                self._close(connection)
+        return self._create_connection()
+
+    def release_connection(self, connection):
+        with self.lock:
+            if len(self.pool) < self.pool_size:
+                self.pool.append(connection)
+                return
+        self._close(connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def build_message(self, subject: str, content: str, recipient: str) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = self.username
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(content, 'plain'))
+        return msg.as_string()
+
+    def send_batch(self, messages: list[dict]) -> list[tuple[str, bool] | None]:
+        """
+        Send a batch of messages over one pooled connection.
+
+        :param messages: list of dicts with subject, content and recipient
+
+        :return: one entry per message, None on success or the error text and whether the message can be retried
+        """
+        results = []
+        try:
+            connection = self.get_connection()
+        except (smtplib.SMTPException, OSError) as e:
+            return [(f"SMTP connection failed: {e}", True)] * len(messages)
+        healthy = True
+        for message in messages:
+            if not healthy:
+                results.append(("SMTP connection lost", True))
+                continue
+            try:
+                connection.sendmail(self.username, message["recipient"],
+                                    self.build_message(message["subject"], message["content"], message["recipient"]))
+                results.append(None)
+            except smtplib.SMTPRecipientsRefused as e:
+                results.append((f"Recipient refused: {e}", False))
+            except smtplib.SMTPServerDisconnected as e:
+                results.append((str(e), True))
+                healthy = False
+            except smtplib.SMTPResponseException as e:
+                # 5xx replies are permanent; 421 means the server is closing the connection
+                results.append((str(e), not 500 <= e.smtp_code < 600))
+                healthy = e.smtp_code != 421
+            except smtplib.SMTPException as e:
+                results.append((str(e), True))
+            except OSError as e:
+                # SMTPException is an OSError too, so only socket errors get here
+                results.append((str(e), True))
+                healthy = False
+        if healthy:
+            self.release_connection(connection)
+        else:
+            self._close(connection)
+        return results
+
+
+smtp_pool = SMTPConnectionPool(pool_size=EMAIL_WORKER_COUNT)
+
+
+async def set_email_status(redis_client: aioredis.Redis, message_id: str, **fields) -> None:
+    fields["updated_at"] = datetime.now().isoformat()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(f"email:message:{message_id}", mapping={k: str(v) for k, v in fields.items()})
+        pipe.expire(f"email:message:{message_id}", EMAIL_STATUS_TTL)
+        await pipe.execute()
+
+
+async def enqueue_email(redis_client: aioredis.Redis, subject: str, content: str, recipient: str) -> str:
+    """
+    Queue an email for delivery and return its message ID.
+    """
+    message_id = uuid.uuid4().hex
+    payload = json.dumps({
+        "id": message_id,
+        "subject": subject,
+        "content": content,
+        "recipient": recipient,
+        "attempts": 0
+    })
+    await set_email_status(redis_client, message_id, status="queued", recipient=recipient, attempts=0,
+                           created_at=datetime.now().isoformat())
+    await email_queue.push(redis_client, payload)
+    return message_id
+
+
+async def get_email_status(redis_client: aioredis.Redis, message_id: str) -> dict | None:
+    status = await redis_client.hgetall(f"email:message:{message_id}")
+    if not status:
+        return None
+    return {k.decode("utf-8"): v.decode("utf-8") for k, v in status.items()}
+
+
+class EmailWorkerPool:
+    """
+    Background workers draining the email queue.
+
+    Each worker claims a batch, sends it through the SMTP pool in a thread, and then acks or schedules a retry with
+    exponential backoff per message. The event loop never waits on SMTP.
+    """
+
+    def __init__(self, redis_pool: aioredis.ConnectionPool, worker_count: int = EMAIL_WORKER_COUNT,
+                 batch_size: int = EMAIL_BATCH_SIZE):
+        self.redis_client = aioredis.Redis.from_pool(redis_pool)
+        self.worker_count = worker_count
+        self.batch_size = batch_size
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self.tasks = [asyncio.create_task(self._maintenance_loop())]
+        self.tasks += [asyncio.create_task(self._worker_loop(i)) for i in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} email workers")
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            try:
+                await email_queue.promote_due(self.redis_client)
+                await email_queue.requeue_expired(self.redis_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email queue maintenance failed: {e}")
+            await asyncio.sleep(5)
+
+    async def _worker_loop(self, worker_id: int) -> None:
+        while True:
+            try:
+                batch = await email_queue.claim(self.redis_client, self.batch_size, timeout=5)
+                if batch:
+                    await self._process_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email worker {worker_id} failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _process_batch(self, batch: list[str]) -> None:
+        messages = [json.loads(payload) for payload in batch]
+        for message in messages:
+            await set_email_status(self.redis_client, message["id"], status="sending", attempts=message["attempts"] + 1)
+        results = await asyncio.to_thread(smtp_pool.send_batch, messages)
+        for payload, message, result in zip(batch, messages, results):
+            attempts = message["attempts"] + 1
+            error, retryable = result or (None, False)
+            if error is None:
+                await email_queue.ack(self.redis_client, payload)
+                await set_email_status(self.redis_client, message["id"], status="sent", attempts=attempts,
+                                       last_error="")
+                await add_email_sent_count()
+                logger.info(f"Email {message['id']} sent: {message['subject']}")
+            elif not retryable or attempts >= EMAIL_MAX_ATTEMPTS:
+                await email_queue.ack(self.redis_client, payload)
+                await set_email_status(self.redis_client, message["id"], status="failed", attempts=attempts,
+                                       last_error=error)
+                await add_email_failed_count()
+                logger.error(f"Email {message['id']} failed permanently after {attempts} attempts: {error}")
+            else:
+                delay = EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                message["attempts"] = attempts
+                await email_queue.retry(self.redis_client, payload, json.dumps(message), delay)
+                await set_email_status(self.redis_client, message["id"], status="retrying", attempts=attempts,
+                                       last_error=error)
+                logger.warning(f"Email {message['id']} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Any, Callable
+from fastapi.dependencies.utils import get_dependant
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import BaseRoute, Match
+from utils.region import REGIONS, resolve_region
+from base_logger import get_logger, get_rate_limited_logger
+
+
+logger = get_logger(__name__)
+fallback_logger = get_rate_limited_logger(f"{__name__}.fallback")
+FAST_REDIRECT_ATTR = "__fast_redirect__"
+REGION_ROUTE_PREFIX = "/{region:region}"
+
+
+def fast_redirect(*guards: Callable, **providers: Callable) -> Callable:
+    """
+    Mark a redirect endpoint to be served by `FastRedirectMiddleware` instead of going through FastAPI.
+
+    The middleware does not resolve the route's dependencies, so every check the route depends on must be listed here.
+
+    :param guards: checks the route declares in `dependencies`, run before the endpoint
+    :param providers: endpoint parameters filled with the result of a check, e.g. safety_check=enhanced_safety_check
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        setattr(endpoint, FAST_REDIRECT_ATTR, (guards, providers))
+        return endpoint
+    return decorator
+
+
+class _Check:
+    """
+    A dependency that only needs the request and headers, called without FastAPI's dependency solver.
+    """
+
+    def __init__(self, call: Callable):
+        dependant = get_dependant(path="", call=call)
+        if (dependant.dependencies or dependant.path_params or dependant.query_params or dependant.cookie_params
+                or dependant.body_params or dependant.security_requirements):
+            raise ValueError(f"{call.__name__} needs more than the request and headers")
+        self.call = call
+        self.is_coroutine = asyncio.iscoroutinefunction(call)
+        self.request_param = dependant.request_param_name
+        self.headers = [(field.name, field.alias, field.default) for field in dependant.header_params]
+
+    async def __call__(self, request: Request) -> Any:
+        kwargs = {name: request.headers.get(alias, default) for name, alias, default in self.headers}
+        if self.request_param:
+            kwargs[self.request_param] = request
+        if self.is_coroutine:
+            return await self.call(**kwargs)
+        return await run_in_threadpool(self.call, **kwargs)
+
+
+class _FastRoute:
+    def __init__(self, route: APIRoute):
+        guards, providers = getattr(route.endpoint, FAST_REDIRECT_ATTR)
+        self.route = route
+        self.guards = [_Check(guard) for guard in guards]
+        self.providers = {name: _Check(provider) for name, provider in providers.items()}
+        self.request_param = route.dependant.request_param_name
+
+    async def handle(self, request: Request, path_params: dict) -> Any:
+        await resolve_region(request, path_params.pop("region"))
+        for guard in self.guards:
+            await guard(request)
+        kwargs = {name: await provider(request) for name, provider in self.providers.items()}
+        kwargs[self.request_param] = request
+        return await self.route.endpoint(**path_params, **kwargs)
+
+
+class FastRedirectMiddleware:
+    """
+    Pure ASGI middleware serving the regional redirect endpoints marked with `fast_redirect`.
+
+    Those endpoints only look up a URL template and answer 301; scanning the whole route table and solving the route
+    and global dependencies cost more than the redirect itself. Requests are bucketed by the first path segment after
+    the region and only the routes of that bucket are matched, in app order, so a fast route is used only when FastAPI
+    would pick the same one. Anything else, and any handler error that is not an HTTPException, falls through to the
+    app unchanged. Add it inside CORSMiddleware so cross-origin responses keep their headers.
+    """
+
+    def __init__(self, app, routes: list[BaseRoute]):
+        self.app = app
+        self._sections: dict[str, list[tuple[BaseRoute, _FastRoute | None]]] = {}
+        for route in routes:
+            path = getattr(route, "path", "")
+            if not path.startswith(REGION_ROUTE_PREFIX):
+                if path.startswith("/{"):
+                    logger.warning(f"Fast redirect disabled: route {path} may shadow regional routes")
+                    self._sections = {}
+                    return
+                continue
+            section = path[len(REGION_ROUTE_PREFIX):].split("/", 2)[1]
+            if section.startswith("{"):
+                logger.warning(f"Fast redirect disabled: route {path} has no literal section after the region")
+                self._sections = {}
+                return
+            fast_route = None
+            if isinstance(route, APIRoute) and hasattr(route.endpoint, FAST_REDIRECT_ATTR):
+                try:
+                    fast_route = _FastRoute(route)
+                except ValueError as e:
+                    logger.warning(f"Serving {path} through FastAPI: {e}")
+            self._sections.setdefault(section, []).append((route, fast_route))
+        # Sections without any fast route always fall through
+        self._sections = {section: section_routes for section, section_routes in self._sections.items()
+                          if any(fast_route for _, fast_route in section_routes)}
+        logger.info(f"Fast redirect enabled for sections: {', '.join(self._sections)}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        segments = scope["path"].split("/", 3)
+        section_routes = self._sections.get(segments[2]) if len(segments) > 3 and segments[1] in REGIONS else None
+        if section_routes is None:
+            return await self.app(scope, receive, send)
+        for route, fast_route in section_routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.NONE:
+                continue
+            if match == Match.FULL and fast_route is not None:
+                return await self._serve(fast_route, child_scope, scope, receive, send)
+            break
+        return await self.app(scope, receive, send)
+
+    async def _serve(self, fast_route: _FastRoute, child_scope, scope, receive, send) -> None:
+        # Same as the router does, so the route is visible to the outer middleware, e.g. for metrics labels
+        scope.update(child_scope)
+        request = Request(scope, receive)
+        try:
+            response = await fast_route.handle(request, dict(scope["path_params"]))
+        except HTTPException as exc:
+            handler = scope["app"].exception_handlers.get(HTTPException, http_exception_handler)
+            response = await handler(request, exc)
+        except Exception as e:
+            fallback_logger.warning("Fast redirect of %s failed, falling back to FastAPI: %r", scope["path"], e)
+            response = None
+        if not isinstance(response, Response):
+            return await self.app(scope, receive, send)
+        await response(scope, receive, send)
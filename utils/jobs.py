@@ -0,0 +1,286 @@
+"""
+Tracked background jobs for long admin operations.
+
+An admin request only records a job in the `job:{id}` hash and pushes its ID onto the `jobs` Redis queue; job workers
+in every API process claim it from there, so the request returns right away and the work is not tied to the process
+that received it. Each job kind has a cluster-wide concurrency limit, enforced by a sorted set of running job IDs
+scored by their lease deadline. A job whose worker crashes is requeued when its lease expires; one interrupted by a
+shutdown is handed back right away. Status, progress and result stay readable for a week.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import hashlib
+import contextvars
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+from redis import asyncio as aioredis
+from utils.redis_queue import RedisQueue
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+JOB_WORKER_COUNT = int(os.getenv("JOB_WORKER_COUNT", "2"))
+# Runs cut short by a crashed worker count as attempts; a job crashing its worker every time is given up on
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_SECONDS = 60  # renewed while the job runs
+JOB_STATUS_TTL = 7 * 24 * 60 * 60
+JOB_HISTORY_LENGTH = 200
+JOB_INDEX_KEY = "jobs:index"
+JOB_BUSY_RETRY_DELAY = 5  # seconds
+
+job_queue = RedisQueue("jobs", lease_seconds=JOB_LEASE_SECONDS)
+
+JobFunc = Callable[..., Awaitable[Any]]
+_progress: contextvars.ContextVar[Callable[[int, int], Awaitable[None]] | None] = contextvars.ContextVar(
+    "job_progress", default=None)
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def running_jobs_key(kind: str) -> str:
+    return f"jobs:running:{kind}"
+
+
+def active_job_key(kind: str, params: dict) -> str:
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    return f"jobs:active:{kind}:{digest}"
+
+
+async def report_progress(done: int, total: int) -> None:
+    """
+    Record the progress of the job running in the current task; does nothing outside a job.
+    """
+    progress = _progress.get()
+    if progress is not None:
+        await progress(done, total)
+
+
+async def get_job(redis_client: aioredis.Redis, job_id: str) -> dict | None:
+    job = await redis_client.hgetall(job_key(job_id))
+    if not job:
+        return None
+    job = {k.decode("utf-8"): v.decode("utf-8") for k, v in job.items()}
+    for field in ("params", "progress", "result"):
+        job[field] = json.loads(job[field]) if job.get(field) else None
+    job["attempts"] = int(job["attempts"])
+    return job
+
+
+async def list_jobs(redis_client: aioredis.Redis, limit: int = 20) -> list[dict]:
+    """
+    :return: the most recently queued jobs, newest first
+    """
+    job_ids = await redis_client.zrevrange(JOB_INDEX_KEY, 0, limit - 1)
+    jobs = [await get_job(redis_client, job_id.decode("utf-8")) for job_id in job_ids]
+    return [job for job in jobs if job is not None]
+
+
+class JobKind:
+    """
+    An operation admins can run as a tracked job: `func(redis_client, **params)`, at most `concurrency` at a time
+    across the cluster and bounded by `timeout` seconds.
+    """
+
+    def __init__(self, name: str, func: JobFunc, concurrency: int = 1, timeout: float = 30 * 60):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "timeout": self.timeout
+        }
+
+
+class JobRunner:
+    """
+    Queue and run tracked jobs.
+
+    Every process runs `worker_count` workers and a maintenance loop that promotes delayed jobs and requeues jobs
+    whose lease expired. A worker that finds the concurrency limit of a job's kind reached puts the job back for a
+    few seconds instead of waiting on it.
+    """
+
+    def __init__(self, worker_count: int = JOB_WORKER_COUNT):
+        self.kinds: dict[str, JobKind] = {}
+        self.worker_count = worker_count
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.tasks: list[asyncio.Task] = []
+        self._redis_client: aioredis.Redis | None = None
+
+    def add_kind(self, name: str, func: JobFunc, **kwargs) -> JobKind:
+        kind = JobKind(name, func, **kwargs)
+        self.kinds[name] = kind
+        return kind
+
+    async def enqueue(self, redis_client: aioredis.Redis, kind: str, params: dict | None = None) -> tuple[str, bool]:
+        """
+        Queue a job, unless the same kind with the same parameters is already queued or running.
+
+        :return: ID of the job, and whether it was newly queued
+        """
+        if kind not in self.kinds:
+            raise KeyError(kind)
+        params = params or {}
+        job_id = uuid.uuid4().hex
+        active_key = active_job_key(kind, params)
+        if not await redis_client.set(active_key, job_id, nx=True, ex=JOB_STATUS_TTL):
+            existing = await redis_client.get(active_key)
+            if existing is not None:
+                return existing.decode("utf-8"), False
+            await redis_client.set(active_key, job_id, ex=JOB_STATUS_TTL)
+
+        now = time.time()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job_id), mapping={
+                "id": job_id,
+                "kind": kind,
+                "params": json.dumps(params),
+                "status": "queued",
+                "attempts": 0,
+                "created_at": datetime.now().isoformat()
+            })
+            pipe.expire(job_key(job_id), JOB_STATUS_TTL)
+            pipe.zadd(JOB_INDEX_KEY, {job_id: now})
+            pipe.zremrangebyrank(JOB_INDEX_KEY, 0, -JOB_HISTORY_LENGTH - 1)
+            await pipe.execute()
+        await job_queue.push(redis_client, json.dumps({"id": job_id}))
+        logger.info(f"Queued {kind} job {job_id} with {params}")
+        return job_id, True
+
+    def start(self, redis_pool: aioredis.ConnectionPool) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        self.tasks = [asyncio.create_task(self._maintenance_loop())]
+        self.tasks += [asyncio.create_task(self._worker_loop(i)) for i in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} job workers for {len(self.kinds)} job kinds")
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            try:
+                await job_queue.promote_due(self._redis_client)
+                await job_queue.requeue_expired(self._redis_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job queue maintenance failed: {e}")
+            await asyncio.sleep(5)
+
+    async def _worker_loop(self, worker_id: int) -> None:
+        while True:
+            try:
+                claimed = await job_queue.claim(self._redis_client, 1, timeout=5)
+                if claimed:
+                    await self._process(claimed[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _acquire_slot(self, kind: JobKind, job_id: str) -> bool:
+        key = running_jobs_key(kind.name)
+
+        async def acquire(pipe) -> bool:
+            now = time.time()
+            # Slots of crashed workers free up once their deadline passes
+            if len(await pipe.zrangebyscore(key, now, "+inf")) >= kind.concurrency:
+                return False
+            pipe.multi()
+            pipe.zremrangebyscore(key, 0, now)
+            pipe.zadd(key, {job_id: now + JOB_LEASE_SECONDS})
+            return True
+
+        return await self._redis_client.transaction(acquire, key, value_from_callable=True)
+
+    async def _heartbeat(self, payload: str, kind: JobKind, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await job_queue.extend(self._redis_client, payload)
+                await self._redis_client.zadd(running_jobs_key(kind.name),
+                                              {job_id: time.time() + JOB_LEASE_SECONDS}, xx=True)
+            except aioredis.RedisError as e:
+                # The lease outlives two missed beats; stopping here would let another worker rerun the job
+                logger.warning(f"Failed to renew the lease of {kind.name} job {job_id}: {e}")
+
+    async def _finish(self, payload: str, job: dict, **fields) -> None:
+        fields["finished_at"] = datetime.now().isoformat()
+        async with self._redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key(job["id"]), mapping=fields)
+            pipe.expire(job_key(job["id"]), JOB_STATUS_TTL)
+            pipe.delete(active_job_key(job["kind"], job["params"] or {}))
+            await pipe.execute()
+        await job_queue.ack(self._redis_client, payload)
+
+    async def _process(self, payload: str) -> None:
+        job = await get_job(self._redis_client, json.loads(payload)["id"])
+        if job is None or job["status"] in ("succeeded", "failed"):
+            await job_queue.ack(self._redis_client, payload)
+            return
+        kind = self.kinds.get(job["kind"])
+        if kind is None:
+            await self._finish(payload, job, status="failed", error=f"Unknown job kind {job['kind']}")
+            return
+        if not await self._acquire_slot(kind, job["id"]):
+            await job_queue.retry(self._redis_client, payload, payload, JOB_BUSY_RETRY_DELAY)
+            return
+
+        try:
+            attempts = await self._redis_client.hincrby(job_key(job["id"]), "attempts", 1)
+            if attempts > JOB_MAX_ATTEMPTS:
+                logger.error(f"Giving up {kind.name} job {job['id']} after {JOB_MAX_ATTEMPTS} interrupted attempts")
+                await self._finish(payload, job, status="failed",
+                                   error=f"Interrupted {JOB_MAX_ATTEMPTS} times, giving up")
+                return
+            await self._redis_client.hset(job_key(job["id"]), mapping={
+                "status": "running",
+                "worker": self.instance_id,
+                "started_at": datetime.now().isoformat()
+            })
+            await self._run(payload, kind, job)
+        finally:
+            await self._redis_client.zrem(running_jobs_key(kind.name), job["id"])
+
+    async def _run(self, payload: str, kind: JobKind, job: dict) -> None:
+        async def progress(done: int, total: int) -> None:
+            await self._redis_client.hset(job_key(job["id"]), "progress", json.dumps({"done": done, "total": total}))
+
+        heartbeat = asyncio.create_task(self._heartbeat(payload, kind, job["id"]))
+        token = _progress.set(progress)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(kind.func(self._redis_client, **(job["params"] or {})), kind.timeout)
+        except asyncio.CancelledError:
+            # Shutting down; hand the job to another worker right away, without counting this attempt
+            await self._redis_client.hset(job_key(job["id"]), "status", "queued")
+            await self._redis_client.hincrby(job_key(job["id"]), "attempts", -1)
+            await job_queue.retry(self._redis_client, payload, payload, 0)
+            raise
+        except Exception as e:
+            error = f"Timed out after {kind.timeout:g}s" if isinstance(e, asyncio.TimeoutError) else repr(e)
+            logger.exception(f"{kind.name} job {job['id']} failed: {error}")
+            await self._finish(payload, job, status="failed", error=error)
+        else:
+            logger.info(f"{kind.name} job {job['id']} succeeded in {time.perf_counter() - start:.1f}s")
+            await self._finish(payload, job, status="succeeded", result=json.dumps(result, default=str), error="")
+        finally:
+            _progress.reset(token)
+            heartbeat.cancel()
+
+
+job_runner = JobRunner()
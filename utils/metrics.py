@@ -0,0 +1,427 @@
+"""
+In-process metrics registry rendered in the Prometheus text exposition format.
+
+Instruments the request path, Redis, MySQL, upstream HTTP calls, the SQLAlchemy pool, Redis-backed caches and the
+event loop, and exposes everything on `/metrics` for scraping without going through Sentry.
+"""
+import os
+import time
+import json
+import socket
+import asyncio
+import functools
+import httpx
+from typing import Callable
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REGION_PREFIXES = {"cn", "global", "fj"}
+# Per-host hash of worker pid -> latest metrics snapshot, so any worker can answer a scrape for all of them
+WORKER_METRICS_KEY = f"metrics:workers:{socket.gethostname()}"
+WORKER_METRICS_INTERVAL = 10  # seconds
+WORKER_METRICS_MAX_AGE = 60  # seconds; snapshots of exited workers are dropped after this
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple) -> str:
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> list[tuple[str, tuple, tuple, float]]:
+        """
+        :return: list of (sample name, label names, label values, value)
+        """
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [(self.name, self.labelnames, key, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback: Callable[[], float] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                return [(self.name, (), (), float(self.callback()))]
+            except Exception as e:
+                logger.debug("Gauge %s callback failed: %s", self.name, e)
+                return []
+        return [(self.name, self.labelnames, key, value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        result = []
+        bucket_labelnames = self.labelnames + ("le",)
+        for key, state in self._values.items():
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                result.append((f"{self.name}_bucket", bucket_labelnames, key + (repr(bound),), cumulative))
+            result.append((f"{self.name}_bucket", bucket_labelnames, key + ("+Inf",), state[-1]))
+            result.append((f"{self.name}_sum", self.labelnames, key, state[-2]))
+            result.append((f"{self.name}_count", self.labelnames, key, state[-1]))
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self) -> list[tuple[_Metric, list]]:
+        return [(metric, metric.samples()) for metric in self._metrics]
+
+    def render(self) -> str:
+        lines = []
+        for metric, samples in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample_name, labelnames, values, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labelnames, values)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, list]:
+        """
+        JSON-serializable samples of every metric, for publishing to other workers.
+        """
+        return {metric.name: [[sample_name, list(labelnames), list(values), value]
+                              for sample_name, labelnames, values, value in samples]
+                for metric, samples in self.collect()}
+
+    def render_workers(self, worker_snapshots: dict[str, dict]) -> str:
+        """
+        Render the snapshots of several worker processes, with a `worker` label added to every sample.
+
+        :param worker_snapshots: worker id -> `snapshot()` of that worker
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for worker, snapshot in worker_snapshots.items():
+                for sample_name, labelnames, values, value in snapshot.get(metric.name, []):
+                    labels = _format_labels(("worker", *labelnames), (worker, *values))
+                    lines.append(f"{sample_name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and region",
+    ("method", "route", "region", "status")))
+REDIS_COMMAND_DURATION = registry.register(Histogram(
+    "redis_command_duration_seconds", "Redis command latency", ("command",)))
+REDIS_ERRORS = registry.register(Counter(
+    "redis_errors_total", "Redis commands that raised an error", ("command",)))
+MYSQL_QUERY_DURATION = registry.register(Histogram(
+    "mysql_query_duration_seconds", "MySQL statement latency", ("statement",)))
+MYSQL_ERRORS = registry.register(Counter(
+    "mysql_errors_total", "MySQL statements that raised an error", ("statement",)))
+UPSTREAM_REQUEST_DURATION = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Outgoing HTTP request latency by upstream host", ("host",)))
+UPSTREAM_ERRORS = registry.register(Counter(
+    "upstream_errors_total", "Outgoing HTTP requests that failed or returned 5xx", ("host",)))
+DB_POOL_CHECKOUTS = registry.register(Counter(
+    "sqlalchemy_pool_checkouts_total", "Connections checked out of the SQLAlchemy pool"))
+DB_POOL_OVERFLOW_CHECKOUTS = registry.register(Counter(
+    "sqlalchemy_pool_overflow_checkouts_total", "Checkouts served while the pool was in overflow"))
+CACHE_REQUESTS = registry.register(Counter(
+    "cache_requests_total", "Redis-backed cache lookups by cache and result", ("cache", "result")))
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled event loop wakeup and when it actually ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+
+# Blocking queue pops wait by design and would drown out real command latency
+_UNTIMED_REDIS_COMMANDS = {"BLMOVE", "BRPOP", "BLPOP", "BZPOPMIN", "BZPOPMAX", "SUBSCRIBE", "PSUBSCRIBE"}
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def instrument_redis() -> None:
+    """
+    Wrap redis.asyncio command and pipeline execution with latency and error metrics.
+    """
+    if getattr(aioredis.Redis.execute_command, "_metrics_wrapped", False):
+        return
+    original_execute_command = aioredis.Redis.execute_command
+    original_pipeline_execute = aioredis.client.Pipeline.execute
+
+    @functools.wraps(original_execute_command)
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            return await original_execute_command(self, *args, **options)
+        except (RedisError, OSError):
+            REDIS_ERRORS.inc(command=command)
+            raise
+        finally:
+            if command not in _UNTIMED_REDIS_COMMANDS:
+                REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, command=command)
+
+    @functools.wraps(original_pipeline_execute)
+    async def pipeline_execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original_pipeline_execute(self, *args, **kwargs)
+        except (RedisError, OSError):
+            REDIS_ERRORS.inc(command="PIPELINE")
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, command="PIPELINE")
+
+    execute_command._metrics_wrapped = True
+    aioredis.Redis.execute_command = execute_command
+    aioredis.client.Pipeline.execute = pipeline_execute
+
+
+def instrument_httpx() -> None:
+    """
+    Wrap httpx sync and async clients (including the module-level helpers) with per-host latency and error metrics.
+    """
+    if getattr(httpx.Client.send, "_metrics_wrapped", False):
+        return
+    original_send = httpx.Client.send
+    original_async_send = httpx.AsyncClient.send
+
+    @functools.wraps(original_send)
+    def send(self, request, *args, **kwargs):
+        host = request.url.host
+        start = time.perf_counter()
+        try:
+            response = original_send(self, request, *args, **kwargs)
+        except httpx.HTTPError:
+            UPSTREAM_ERRORS.inc(host=host)
+            raise
+        finally:
+            UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - start, host=host)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(host=host)
+        return response
+
+    @functools.wraps(original_async_send)
+    async def async_send(self, request, *args, **kwargs):
+        host = request.url.host
+        start = time.perf_counter()
+        try:
+            response = await original_async_send(self, request, *args, **kwargs)
+        except httpx.HTTPError:
+            UPSTREAM_ERRORS.inc(host=host)
+            raise
+        finally:
+            UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - start, host=host)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(host=host)
+        return response
+
+    send._metrics_wrapped = True
+    httpx.Client.send = send
+    httpx.AsyncClient.send = async_send
+
+
+def instrument_sqlalchemy(engine) -> None:
+    """
+    Attach statement latency, error and pool checkout metrics to a SQLAlchemy engine.
+    """
+    from sqlalchemy import event
+
+    def statement_type(statement: str) -> str:
+        return statement.lstrip().split(" ", 1)[0].upper() if statement else "UNKNOWN"
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics_query_start"].pop()
+        MYSQL_QUERY_DURATION.observe(time.perf_counter() - start, statement=statement_type(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        MYSQL_ERRORS.inc(statement=statement_type(exception_context.statement))
+        starts = exception_context.connection.info.get("metrics_query_start") \
+            if exception_context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        if engine.pool.overflow() > 0:
+            DB_POOL_OVERFLOW_CHECKOUTS.inc()
+
+    registry.register(Gauge("sqlalchemy_pool_checked_out", "Connections currently checked out of the pool",
+                            callback=lambda: engine.pool.checkedout()))
+    registry.register(Gauge("sqlalchemy_pool_overflow", "Connections currently open beyond pool_size",
+                            callback=lambda: max(engine.pool.overflow(), 0)))
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - expected, 0))
+
+
+class WorkerMetricsPublisher:
+    """
+    Publishes this worker's metrics to Redis when the server runs several processes on one host.
+
+    Each process keeps its own registry and a scrape reaches only one of them, so every worker writes a snapshot to
+    `WORKER_METRICS_KEY` and `/metrics` renders all of them, labelled by worker.
+    """
+
+    def __init__(self):
+        self.worker_id = str(os.getpid())
+        self._task: asyncio.Task | None = None
+        self._redis_client: aioredis.Redis | None = None
+
+    async def publish(self, redis_client: aioredis.Redis) -> None:
+        payload = json.dumps({"time": time.time(), "metrics": registry.snapshot()})
+        await redis_client.hset(WORKER_METRICS_KEY, self.worker_id, payload)
+
+    async def collect(self, redis_client: aioredis.Redis) -> dict[str, dict]:
+        """
+        :return: worker id -> metrics snapshot of every live worker on this host, this one always current
+        """
+        snapshots = {}
+        stale = []
+        now = time.time()
+        for worker_id, payload in (await redis_client.hgetall(WORKER_METRICS_KEY)).items():
+            worker_id = worker_id.decode("utf-8")
+            published = json.loads(payload)
+            if now - published["time"] > WORKER_METRICS_MAX_AGE:
+                stale.append(worker_id)
+            else:
+                snapshots[worker_id] = published["metrics"]
+        if stale:
+            await redis_client.hdel(WORKER_METRICS_KEY, *stale)
+        snapshots[self.worker_id] = registry.snapshot()
+        return snapshots
+
+    def start(self, redis_pool: aioredis.ConnectionPool, interval: float = WORKER_METRICS_INTERVAL) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        self._task = asyncio.create_task(self._publish_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self._redis_client.hdel(WORKER_METRICS_KEY, self.worker_id)
+        except RedisError as e:
+            logger.warning(f"Failed to remove metrics of worker {self.worker_id}: {e}")
+
+    async def _publish_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.publish(self._redis_client)
+            except RedisError as e:
+                logger.warning(f"Failed to publish metrics of worker {self.worker_id}: {e}")
+            await asyncio.sleep(interval)
+
+
+worker_metrics = WorkerMetricsPublisher()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency labelled with the matched route template and region prefix.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            prefix = scope["path"].split("/", 2)[1]
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=scope["method"], route=route_path,
+                                          region=prefix if prefix in REGION_PREFIXES else "none",
+                                          status=status_code)
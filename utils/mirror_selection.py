@@ -0,0 +1,130 @@
+"""
+Health-aware mirror selection for the patch download redirects.
+
+A scheduler job probes every mirror of the published patch payloads with a HEAD request (falling back to a one-byte
+range GET) and stores the result in the `mirror-health` Redis hash; the runtime config watcher keeps a copy of it in
+every worker. Download redirects then pick a healthy mirror by weighted rendezvous hashing of the device ID, so each
+device sticks to one mirror while the load spreads across all of them in proportion to their weights, and only the
+devices of a mirror that goes down move elsewhere.
+"""
+import math
+import time
+import json
+import asyncio
+import hashlib
+import httpx
+from redis import asyncio as aioredis
+from utils.runtime_config import runtime_config
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+MIRROR_HEALTH_REDIS_KEY = "mirror-health"
+MIRROR_PROBE_TIMEOUT = 5  # seconds
+# Probe results older than this are ignored, e.g. when the prober stopped running
+MIRROR_HEALTH_MAX_AGE = 10 * 60  # seconds
+PROBED_PATCH_KEYS = ("snap-hutao:patch", "snap-hutao-deployment:patch")
+
+# url -> {"healthy": bool, "latency": seconds, "checked_at": unix time}
+_mirror_health: dict[str, dict] = {}
+
+
+def _load_mirror_health(data: dict[str, str]) -> None:
+    global _mirror_health
+    _mirror_health = {url: json.loads(value) for url, value in data.items()}
+
+
+runtime_config.register(MIRROR_HEALTH_REDIS_KEY, _load_mirror_health)
+
+
+def mirror_health(url: str) -> dict | None:
+    """
+    :return: latest probe result of the mirror, or None if it was not probed recently
+    """
+    health = _mirror_health.get(url)
+    if health is None or time.time() - health["checked_at"] > MIRROR_HEALTH_MAX_AGE:
+        return None
+    return health
+
+
+def rank_mirrors(mirrors: list[dict]) -> list[dict]:
+    """
+    Order mirrors for clients: healthy ones by latency, then unprobed ones, then unhealthy ones; within each group
+    zero-weight fallback mirrors come last. Ties keep the newest mirror first, as the unranked list did.
+
+    :param mirrors: mirrors of a patch payload, oldest first
+    """
+    def sort_key(indexed_mirror):
+        index, mirror = indexed_mirror
+        health = mirror_health(mirror["url"])
+        fallback = mirror.get("weight", 1) == 0
+        if health is None:
+            return 1, fallback, 0, -index
+        if health["healthy"]:
+            return 0, fallback, health["latency"], -index
+        return 2, fallback, 0, -index
+
+    return [mirror for _, mirror in sorted(enumerate(mirrors), key=sort_key)]
+
+
+def _rendezvous_score(key: str, url: str, weight: float) -> float:
+    digest = hashlib.sha256(f"{key}:{url}".encode()).digest()
+    # Uniform in (0, 1); the weighted score -weight / ln(u) gives each mirror a weight-proportional share of keys
+    u = (int.from_bytes(digest[:8], "big") + 1) / (2 ** 64 + 2)
+    return -weight / math.log(u)
+
+
+def select_mirror(mirrors: list[dict], key: str) -> dict:
+    """
+    Pick the download mirror for a client, deterministically for the same key and mirror set.
+
+    Healthy and unprobed mirrors with a positive weight are preferred. Zero-weight mirrors are only used as a fallback
+    when none of those is left, and if every mirror is down they are all eligible, so a download is always offered.
+
+    :param mirrors: mirrors of a patch payload
+    :param key: stable client identifier, e.g. the device ID
+    """
+    available = [m for m in mirrors if (mirror_health(m["url"]) or {}).get("healthy", True)]
+    candidates = ([m for m in available if m.get("weight", 1) > 0] or available
+                  or [m for m in mirrors if m.get("weight", 1) > 0] or mirrors)
+    return max(candidates, key=lambda m: _rendezvous_score(key, m["url"], m.get("weight", 1) or 1))
+
+
+async def _probe(client: httpx.AsyncClient, url: str) -> dict:
+    start = time.perf_counter()
+    try:
+        response = await client.head(url)
+        if response.status_code in (403, 405, 501):
+            # Some CDNs reject HEAD; fetch a single byte instead
+            response = await client.get(url, headers={"Range": "bytes=0-0"})
+        healthy = response.status_code < 400
+    except httpx.HTTPError as e:
+        logger.info(f"Mirror {url} probe failed: {e!r}")
+        healthy = False
+    return {"healthy": healthy, "latency": round(time.perf_counter() - start, 4), "checked_at": time.time()}
+
+
+async def probe_mirrors(redis_client: aioredis.Redis) -> dict[str, dict]:
+    """
+    Probe every mirror of the published patch payloads and replace the `mirror-health` hash with the results.
+    """
+    urls = set()
+    for patch_key in PROBED_PATCH_KEYS:
+        payload = await redis_client.get(patch_key)
+        if payload is None:
+            continue
+        payload = json.loads(payload)
+        for region in ("cn", "global"):
+            urls.update(m["url"] for m in payload.get(region, {}).get("mirrors", []))
+    if not urls:
+        return {}
+
+    async with httpx.AsyncClient(timeout=MIRROR_PROBE_TIMEOUT, follow_redirects=True) as client:
+        results = dict(zip(urls, await asyncio.gather(*[_probe(client, url) for url in urls])))
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(MIRROR_HEALTH_REDIS_KEY)
+        pipe.hset(MIRROR_HEALTH_REDIS_KEY, mapping={url: json.dumps(result) for url, result in results.items()})
+        await pipe.execute()
+    unhealthy = [url for url, result in results.items() if not result["healthy"]]
+    logger.info(f"Probed {len(results)} mirrors, {len(unhealthy)} unhealthy: {unhealthy}")
+    return results
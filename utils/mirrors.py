@@ -0,0 +1,68 @@
+"""
+Overridden mirror URLs of a project version, stored in the Redis hash `{project}:mirrors:{version}`.
+
+Fields are mirror names and values the mirror as JSON, so adding, updating and deleting a mirror are single atomic
+HSET/HDEL commands. Each value carries the time it was last written; mirrors are listed oldest first, matching the
+order of the JSON lists used before.
+"""
+import time
+import json
+from redis import asyncio as aioredis
+from utils.PatchMeta import MirrorMeta
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def mirrors_key(project: str, version: str) -> str:
+    return f"{project}:mirrors:{version}"
+
+
+def parse_mirrors(fields: dict) -> list[MirrorMeta]:
+    stored = sorted((json.loads(value) for value in fields.values()), key=lambda m: m.get("updated_at", 0))
+    return [MirrorMeta(**m) for m in stored]
+
+
+async def get_mirrors(redis_client: aioredis.Redis, project: str, version: str) -> list[MirrorMeta]:
+    return parse_mirrors(await redis_client.hgetall(mirrors_key(project, version)))
+
+
+async def set_mirror(redis_client: aioredis.Redis, project: str, version: str, mirror: MirrorMeta) -> bool:
+    """
+    Add a mirror, or replace the mirror with the same name.
+
+    :return: True if the mirror was added, False if an existing one was updated
+    """
+    value = json.dumps({**mirror.model_dump(), "updated_at": time.time()})
+    return bool(await redis_client.hset(mirrors_key(project, version), mirror.mirror_name, value))
+
+
+async def delete_mirror(redis_client: aioredis.Redis, project: str, version: str, mirror_name: str) -> bool:
+    """
+    :return: True if the mirror existed
+    """
+    return bool(await redis_client.hdel(mirrors_key(project, version), mirror_name))
+
+
+async def clear_mirrors(redis_client: aioredis.Redis, project: str, version: str) -> bool:
+    return bool(await redis_client.delete(mirrors_key(project, version)))
+
+
+async def migrate_legacy_mirrors(redis_client: aioredis.Redis, project: str, version: str) -> None:
+    """
+    Convert a mirror list stored as a JSON string by earlier releases into the hash layout, in place.
+    """
+    key = mirrors_key(project, version)
+    if await redis_client.type(key) != b"string":
+        return
+    legacy_mirrors = json.loads(await redis_client.get(key) or "[]")
+    now = time.time()
+    fields = {m["mirror_name"]: json.dumps({**MirrorMeta(**m).model_dump(), "updated_at": now + i / 1000})
+              for i, m in enumerate(legacy_mirrors)}
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        if fields:
+            pipe.hset(key, mapping=fields)
+        await pipe.execute()
+    logger.info(f"Migrated {len(fields)} mirrors of {key} from a JSON list to a hash")
@@ -0,0 +1,84 @@
+import asyncio
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+PATCH_CHANGED_CHANNEL = "snap-hutao:patch:changed"
+RESUBSCRIBE_DELAY = 5  # seconds
+
+
+async def publish_patch_change(redis_client: aioredis.Redis, version: str) -> None:
+    """
+    Tell every worker that the Snap Hutao patch payload, or the rollout deciding who gets it, has changed.
+    """
+    receivers = await redis_client.publish(PATCH_CHANGED_CHANNEL, version)
+    logger.debug("Published Snap Hutao patch change %s to %d workers", version, receivers)
+
+
+class PatchChangeNotifier:
+    """
+    Wakes up the long-poll and event stream clients of this worker when the Snap Hutao patch changes.
+
+    Each worker holds a single Redis subscription to `PATCH_CHANGED_CHANNEL`, however many clients are waiting; a
+    message sets the current event and replaces it, so every waiter wakes up once and then rechecks its version.
+    Waiters take the event with `next_change` before reading the patch, so a change made in between is not missed.
+    """
+
+    def __init__(self):
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._redis_client: aioredis.Redis | None = None
+
+    def next_change(self) -> asyncio.Event:
+        """
+        :return: event set on the next change of the patch
+        """
+        return self._changed
+
+    @staticmethod
+    async def wait(change: asyncio.Event, timeout: float) -> bool:
+        """
+        :param change: event taken from `next_change`
+        :return: True if the patch changed within `timeout` seconds
+        """
+        try:
+            await asyncio.wait_for(change.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def start(self, redis_pool: aioredis.ConnectionPool) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _listen_loop(self) -> None:
+        while True:
+            try:
+                async with self._redis_client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(PATCH_CHANGED_CHANNEL)
+                    # Changes published while not subscribed were missed; let waiters recheck
+                    self.notify()
+                    async for message in pubsub.listen():
+                        logger.debug("Snap Hutao patch changed: %s", message["data"])
+                        self.notify()
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                logger.warning(f"Snap Hutao patch subscription lost, resubscribing in {RESUBSCRIBE_DELAY}s: {e}")
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+
+patch_notifier = PatchChangeNotifier()
@@ -0,0 +1,103 @@
+import time
+from redis import asyncio as aioredis
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class RedisQueue:
+    """
+    Durable at-least-once queue stored in Redis.
+
+    Messages move from the ready list to a processing list when claimed and are only removed on ack, so a worker
+    that dies mid-batch leaves its messages behind to be requeued once their lease expires. Delayed retries are kept
+    in a sorted set scored by the time they become due. Payloads must be unique strings (e.g. carry a message ID).
+    """
+
+    def __init__(self, name: str, lease_seconds: int = 300):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.ready_key = f"queue:{name}:ready"
+        self.processing_key = f"queue:{name}:processing"
+        self.delayed_key = f"queue:{name}:delayed"
+        self.leases_key = f"queue:{name}:leases"
+
+    async def push(self, redis_client: aioredis.Redis, payload: str) -> None:
+        await redis_client.lpush(self.ready_key, payload)
+
+    async def claim(self, redis_client: aioredis.Redis, count: int = 1, timeout: float = 5) -> list[str]:
+        """
+        Claim up to `count` messages, blocking at most `timeout` seconds for the first one.
+        """
+        first = await redis_client.blmove(self.ready_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        claimed = [first]
+        while len(claimed) < count:
+            item = await redis_client.lmove(self.ready_key, self.processing_key, "RIGHT", "LEFT")
+            if item is None:
+                break
+            claimed.append(item)
+        deadline = time.time() + self.lease_seconds
+        await redis_client.zadd(self.leases_key, {item: deadline for item in claimed})
+        return [item.decode("utf-8") for item in claimed]
+
+    async def extend(self, redis_client: aioredis.Redis, payload: str) -> None:
+        """
+        Renew the lease of a claimed message that is still being worked on.
+        """
+        await redis_client.zadd(self.leases_key, {payload: time.time() + self.lease_seconds}, xx=True)
+
+    async def ack(self, redis_client: aioredis.Redis, payload: str) -> None:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, payload)
+            pipe.zrem(self.leases_key, payload)
+            await pipe.execute()
+
+    async def retry(self, redis_client: aioredis.Redis, old_payload: str, new_payload: str, delay: float) -> None:
+        """
+        Replace a claimed message with `new_payload` and make it available again after `delay` seconds.
+        """
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, old_payload)
+            pipe.zrem(self.leases_key, old_payload)
+            pipe.zadd(self.delayed_key, {new_payload: time.time() + delay})
+            await pipe.execute()
+
+    async def promote_due(self, redis_client: aioredis.Redis) -> int:
+        """
+        Move delayed messages whose retry time has passed back onto the ready list.
+        """
+        due = await redis_client.zrangebyscore(self.delayed_key, 0, time.time())
+        moved = 0
+        for item in due:
+            # ZREM is the arbiter when several workers promote at the same time
+            if await redis_client.zrem(self.delayed_key, item):
+                await redis_client.lpush(self.ready_key, item)
+                moved += 1
+        return moved
+
+    async def requeue_expired(self, redis_client: aioredis.Redis) -> int:
+        """
+        Return messages whose lease has expired (their worker crashed or hung) to the ready list.
+        """
+        expired = await redis_client.zrangebyscore(self.leases_key, 0, time.time())
+        requeued = 0
+        for item in expired:
+            if not await redis_client.zrem(self.leases_key, item):
+                continue
+            if await redis_client.lrem(self.processing_key, 1, item):
+                await redis_client.rpush(self.ready_key, item)
+                requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} expired messages on queue {self.name}")
+        return requeued
+
+    async def size(self, redis_client: aioredis.Redis) -> dict:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.llen(self.ready_key)
+            pipe.llen(self.processing_key)
+            pipe.zcard(self.delayed_key)
+            ready, processing, delayed = await pipe.execute()
+        return {"ready": ready, "processing": processing, "delayed": delayed}
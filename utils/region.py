@@ -0,0 +1,47 @@
+from typing import Literal
+from fastapi import Request
+from starlette.convertors import Convertor, register_url_convertor
+
+
+# URL prefix -> region name used in Redis keys, e.g. url:{region}:metadata
+REGIONS = {
+    "cn": "china",
+    "global": "global",
+    "fj": "fujian"
+}
+
+
+class RegionConvertor(Convertor):
+    """
+    Path convertor matching only the known region prefixes, so `/{region:region}` never shadows other top-level routes.
+    """
+    regex = "|".join(REGIONS)
+
+    def convert(self, value: str) -> str:
+        return value
+
+    def to_string(self, value: str) -> str:
+        return value
+
+
+register_url_convertor("region", RegionConvertor())
+
+
+async def resolve_region(request: Request, region: Literal["cn", "global", "fj"]) -> str:
+    """
+    Resolve the region of a request from its URL prefix once and store it on `request.state`.
+
+    - `region`: URL prefix, cn/global/fj
+    - `redis_region`: region name in Redis keys, china/global/fujian
+    - `region_group`: cn or global; Fujian is served the same data as China unless it has its own Redis keys
+
+    :param request: Request object from FastAPI
+
+    :param region: Region prefix of the URL
+
+    :return: Region prefix of the URL
+    """
+    request.state.region = region
+    request.state.redis_region = REGIONS[region]
+    request.state.region_group = "global" if region == "global" else "cn"
+    return region
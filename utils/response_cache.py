@@ -0,0 +1,127 @@
+"""
+Precompressed response bodies for large, rarely changing JSON endpoints.
+
+Each cached response is a Redis hash `response:{name}` whose fields are `{variant}:{encoding}`, e.g.
+`CN:ZH-CN:br` for one language of the metadata list. A miss renders the body once and stores it in every supported
+encoding, so compression runs once per data change instead of once per request; requests then only fetch the
+encoding they accept. Writers of the underlying data call `invalidate`, which drops every variant of the response and
+bumps `response:{name}:generation`, so a body rendered from the old data while the invalidation ran is not stored.
+"""
+import gzip
+import asyncio
+from typing import Any, Awaitable, Callable
+from fastapi import Response
+from redis import asyncio as aioredis
+from utils.responses import dump_json
+from utils.metrics import record_cache
+from base_logger import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = get_logger(__name__)
+RESPONSE_CACHE_TTL = 60 * 60  # seconds; a safety net, writers invalidate on change
+# Compressing tiny bodies only adds headers
+MIN_COMPRESS_SIZE = 1024  # bytes
+
+# Preferred first
+ENCODERS: dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, compresslevel=9)}
+if brotli is not None:
+    ENCODERS = {"br": lambda body: brotli.compress(body, quality=11), **ENCODERS}
+
+
+def response_cache_key(name: str) -> str:
+    return f"response:{name}"
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str:
+    """
+    :return: the preferred encoding the client accepts, or "identity"
+    """
+    accepted = set()
+    for item in (accept_encoding or "").lower().split(","):
+        coding, _, params = item.partition(";")
+        try:
+            quality = float(params.strip().removeprefix("q=")) if params.strip() else 1
+        except ValueError:
+            quality = 1
+        if quality > 0:
+            accepted.add(coding.strip())
+    for encoding in ENCODERS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return "identity"
+
+
+def render_standard_response(data: Any, retcode: int = 0, message: str = "ok") -> bytes:
+    """
+    Serialize a StandardResponse body the same way `standard_response` does.
+    """
+    return dump_json({"retcode": retcode, "message": message, "data": data})
+
+
+def _compressed_variants(body: bytes) -> dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants.update({encoding: encode(body) for encoding, encode in ENCODERS.items()})
+    return variants
+
+
+async def cached_response(redis_client: aioredis.Redis, request_headers, name: str, variant: str,
+                          render: Callable[[], Awaitable[bytes]], ttl: int = RESPONSE_CACHE_TTL) -> Response:
+    """
+    Serve a cached response body in the encoding the client prefers, rendering and compressing it on a miss.
+
+    :param request_headers: headers of the request, for Accept-Encoding
+    :param name: response name, invalidated as a whole
+    :param variant: the variant of the response requested, e.g. region and language
+    :param render: builds the uncompressed JSON body from the underlying data
+    :param ttl: lifetime of the cached variants; no longer than the data they are built from is cached
+    """
+    encoding = negotiate_encoding(request_headers.get("accept-encoding"))
+    key = response_cache_key(name)
+    # Variants too small to compress are stored without the compressed fields
+    body, identity = await redis_client.hmget(key, f"{variant}:{encoding}", f"{variant}:identity")
+    record_cache(f"response:{name}", identity is not None)
+    if body is None and identity is not None:
+        body, encoding = identity, "identity"
+    if body is None:
+        generation = await redis_client.get(f"{key}:generation")
+        variants = await asyncio.to_thread(_compressed_variants, await render())
+        await _store(redis_client, key, generation, variant, variants, ttl)
+        if encoding not in variants:
+            encoding = "identity"
+        body = variants[encoding]
+
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _store(redis_client: aioredis.Redis, key: str, generation: bytes | None, variant: str,
+                 variants: dict[str, bytes], ttl: int) -> None:
+    async def store(pipe) -> None:
+        if await pipe.get(f"{key}:generation") != generation:
+            # Invalidated while rendering; the body may be stale
+            return
+        pipe.multi()
+        pipe.hset(key, mapping={f"{variant}:{encoding}": body for encoding, body in variants.items()})
+        pipe.expire(key, ttl)
+
+    await redis_client.transaction(store, f"{key}:generation")
+
+
+async def invalidate(redis_client: aioredis.Redis, *names: str) -> None:
+    """
+    Drop every cached variant of the responses, after the data they are built from changed.
+    """
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for name in names:
+            pipe.delete(response_cache_key(name))
+            pipe.incr(f"{response_cache_key(name)}:generation")
+        await pipe.execute()
+    logger.debug("Invalidated cached responses: %s", names)
@@ -0,0 +1,42 @@
+import orjson
+from typing import Any
+from fastapi import responses
+from pydantic import BaseModel
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """
+    Default response class of the app.
+
+    Same as FastAPI's ORJSONResponse, but also accepts non-string dict keys (serialized as strings, like the standard
+    json module) and pydantic models nested anywhere in the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def standard_response(data: dict | list | None = None, retcode: int = 0, message: str = "ok",
+                      status_code: int = 200, headers: dict | None = None) -> ORJSONResponse:
+    """
+    Serialize a StandardResponse body straight to JSON.
+
+    Use it for payloads the server built itself, e.g. cached data read from Redis. Returning a Response makes FastAPI
+    skip the response_model round trip (dump, validate, serialize again); keep `response_model=StandardResponse` on
+    the route so the schema stays documented.
+    """
+    return ORJSONResponse({"retcode": retcode, "message": message, "data": data}, status_code=status_code,
+                          headers=headers)
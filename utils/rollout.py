@@ -0,0 +1,115 @@
+"""
+Staged rollout of new Snap Hutao versions.
+
+When a new release is published, the payload it replaces is kept in `snap-hutao:patch:previous` and
+`snap-hutao:rollout` records which share of devices gets the new version. Devices are placed by a hash of their
+device ID, so a device stays in the cohort as the share grows; the scheduler grows it by `step` percent every
+`interval` seconds until everyone is on the new version, and admins can set it by hand at any time.
+"""
+import os
+import time
+import json
+import hashlib
+from redis import asyncio as aioredis
+from utils.patch_notifier import publish_patch_change
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+ROLLOUT_REDIS_KEY = "snap-hutao:rollout"
+PREVIOUS_PATCH_REDIS_KEY = "snap-hutao:patch:previous"
+# Share of devices offered a new release right away; 100 disables staged rollouts
+ROLLOUT_INITIAL_PERCENT = float(os.getenv("ROLLOUT_INITIAL_PERCENT", "10"))
+ROLLOUT_STEP_PERCENT = float(os.getenv("ROLLOUT_STEP_PERCENT", "10"))
+ROLLOUT_STEP_INTERVAL = int(os.getenv("ROLLOUT_STEP_INTERVAL", str(30 * 60)))  # seconds
+
+
+def device_bucket(device_id: str) -> float:
+    """
+    :return: position of the device in the rollout, uniform in [0, 100)
+    """
+    digest = hashlib.sha256(device_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 * 100
+
+
+def serves_new_version(rollout: dict | None, version: str, device_id: str | None) -> bool:
+    """
+    Whether a device gets `version`, the version of the current patch payload.
+
+    Devices without an ID, e.g. browsers, always get the current version.
+    """
+    if rollout is None or rollout["version"] != version or rollout["percent"] >= 100 or not device_id:
+        return True
+    return device_bucket(device_id) < rollout["percent"]
+
+
+async def get_rollout(redis_client: aioredis.Redis) -> dict | None:
+    rollout = await redis_client.get(ROLLOUT_REDIS_KEY)
+    return json.loads(rollout) if rollout else None
+
+
+async def start_rollout(redis_client: aioredis.Redis, previous_patch: bytes | None, version: str) -> dict | None:
+    """
+    Start rolling out `version`; call before the new payload is written so no device sees it early.
+
+    :param previous_patch: the `snap-hutao:patch` payload being replaced; nothing to roll out from if None
+    """
+    if previous_patch is None or ROLLOUT_INITIAL_PERCENT >= 100:
+        return None
+    rollout = {
+        "version": version,
+        "percent": ROLLOUT_INITIAL_PERCENT,
+        "step": ROLLOUT_STEP_PERCENT,
+        "interval": ROLLOUT_STEP_INTERVAL,
+        "updated_at": time.time()
+    }
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(PREVIOUS_PATCH_REDIS_KEY, previous_patch)
+        pipe.set(ROLLOUT_REDIS_KEY, json.dumps(rollout))
+        await pipe.execute()
+    logger.info(f"Started rollout of Snap Hutao {version} at {ROLLOUT_INITIAL_PERCENT}%")
+    return rollout
+
+
+async def update_rollout(redis_client: aioredis.Redis, percent: float | None = None, step: float | None = None,
+                         interval: int | None = None) -> dict | None:
+    """
+    Change the current rollout by hand.
+
+    :return: the updated rollout, or None if no rollout was started
+    """
+    async def update(pipe) -> dict | None:
+        rollout = await pipe.get(ROLLOUT_REDIS_KEY)
+        if rollout is None:
+            return None
+        rollout = json.loads(rollout)
+        if percent is not None:
+            rollout["percent"] = min(percent, 100)
+        if step is not None:
+            rollout["step"] = step
+        if interval is not None:
+            rollout["interval"] = interval
+        rollout["updated_at"] = time.time()
+        pipe.multi()
+        pipe.set(ROLLOUT_REDIS_KEY, json.dumps(rollout))
+        return rollout
+
+    # Watched, so a scheduled step and a manual change cannot overwrite each other
+    rollout = await redis_client.transaction(update, ROLLOUT_REDIS_KEY, value_from_callable=True)
+    if rollout is not None:
+        logger.info(f"Updated rollout of Snap Hutao {rollout['version']}: {rollout}")
+        # Devices that joined the cohort are waiting on the new version
+        await publish_patch_change(redis_client, rollout["version"])
+    return rollout
+
+
+async def advance_rollout(redis_client: aioredis.Redis) -> dict | None:
+    """
+    Scheduled job growing the cohort by one step once the step interval has passed.
+    """
+    rollout = await get_rollout(redis_client)
+    if rollout is None or rollout["percent"] >= 100 or rollout["step"] <= 0:
+        return rollout
+    if time.time() - rollout["updated_at"] < rollout["interval"]:
+        return rollout
+    return await update_rollout(redis_client, percent=rollout["percent"] + rollout["step"])
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Callable
+from redis import asyncio as aioredis
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+RUNTIME_CONFIG_REFRESH_INTERVAL = 10  # seconds
+
+
+class RuntimeConfigWatcher:
+    """
+    Keeps per-process settings in sync with Redis hashes.
+
+    Each registered hash is polled on an interval and its handler is called with the decoded mapping whenever the
+    content changes, so a change written by one worker reaches every worker without a restart.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, Callable[[dict[str, str]], None]] = {}
+        self._snapshots: dict[str, dict[str, str]] = {}
+        self._task: asyncio.Task | None = None
+        self._redis_client: aioredis.Redis | None = None
+
+    def register(self, key: str, handler: Callable[[dict[str, str]], None]) -> None:
+        self._handlers[key] = handler
+
+    async def refresh(self, redis_client: aioredis.Redis) -> None:
+        for key, handler in self._handlers.items():
+            try:
+                raw = await redis_client.hgetall(key)
+                data = {k.decode("utf-8"): v.decode("utf-8") for k, v in raw.items()}
+                if data == self._snapshots.get(key):
+                    continue
+                handler(data)
+                self._snapshots[key] = data
+            except Exception as e:
+                logger.error(f"Failed to refresh runtime config {key}: {e}")
+
+    async def start(self, redis_pool: aioredis.ConnectionPool,
+                    interval: float = RUNTIME_CONFIG_REFRESH_INTERVAL) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        await self.refresh(self._redis_client)
+        self._task = asyncio.create_task(self._refresh_loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh(self._redis_client)
+
+
+runtime_config = RuntimeConfigWatcher()
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import datetime
+from typing import Any, Awaitable, Callable
+from redis import asyncio as aioredis
+from utils.stats import STAT_TIMEZONE
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+SCHEDULER_LEADER_KEY = "scheduler:leader"
+SCHEDULER_NEXT_RUN_KEY = "scheduler:next-run"
+SCHEDULER_HISTORY_LENGTH = 50
+SCHEDULER_LEADER_TTL = 30  # seconds
+SCHEDULER_TICK_INTERVAL = 1  # seconds
+
+# Only the current holder may extend or release the leader lock
+_RENEW_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+JobFunc = Callable[[aioredis.Redis], Awaitable[Any]]
+
+
+def history_key(job_name: str) -> str:
+    return f"scheduler:history:{job_name}"
+
+
+class ScheduledJob:
+    """
+    A periodic job, run every `interval` seconds or daily at `at` (UTC+8), delayed by up to `jitter` seconds.
+    """
+
+    def __init__(self, name: str, func: JobFunc, interval: float | None = None, at: datetime.time | None = None,
+                 jitter: float = 0, timeout: float = 300, run_at_startup: bool = False):
+        if (interval is None) == (at is None):
+            raise ValueError(f"Job {name} needs exactly one of interval or at")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.at = at
+        self.jitter = jitter
+        self.timeout = timeout
+        self.run_at_startup = run_at_startup
+
+    def next_run_after(self, now: float) -> float:
+        if self.interval is not None:
+            next_run = now + self.interval
+        else:
+            local_now = datetime.datetime.fromtimestamp(now, STAT_TIMEZONE)
+            candidate = local_now.replace(hour=self.at.hour, minute=self.at.minute, second=self.at.second,
+                                          microsecond=0)
+            if candidate.timestamp() <= now:
+                candidate += datetime.timedelta(days=1)
+            next_run = candidate.timestamp()
+        return next_run + random.uniform(0, self.jitter)
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "schedule": f"every {self.interval:g}s" if self.interval is not None else f"daily at {self.at} UTC+8",
+            "jitter": self.jitter,
+            "timeout": self.timeout
+        }
+
+
+class Scheduler:
+    """
+    Cluster-wide job scheduler.
+
+    Every process runs the scheduler loop, but only the one holding the Redis leader lock executes jobs. Next-run
+    times live in Redis, so a new leader picks up where the previous one stopped instead of re-running everything.
+    Each run is bounded by its job timeout and recorded in a capped per-job history list.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, ScheduledJob] = {}
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._running: dict[str, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+        self._redis_client: aioredis.Redis | None = None
+
+    def add_job(self, name: str, func: JobFunc, **kwargs) -> ScheduledJob:
+        job = ScheduledJob(name, func, **kwargs)
+        self.jobs[name] = job
+        return job
+
+    def job(self, name: str, **kwargs) -> Callable[[JobFunc], JobFunc]:
+        def decorator(func: JobFunc) -> JobFunc:
+            self.add_job(name, func, **kwargs)
+            return func
+        return decorator
+
+    def start(self, redis_pool: aioredis.ConnectionPool) -> None:
+        self._redis_client = aioredis.Redis.from_pool(redis_pool)
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs as {self.instance_id}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in self._running.values():
+            task.cancel()
+        await asyncio.gather(self._task, *self._running.values(), return_exceptions=True)
+        self._task = None
+        self._running = {}
+        if self.is_leader:
+            await self._redis_client.eval(_RELEASE_LEADER_SCRIPT, 1, SCHEDULER_LEADER_KEY, self.instance_id)
+            self.is_leader = False
+
+    async def trigger(self, redis_client: aioredis.Redis, name: str) -> None:
+        """
+        Make a job due immediately; the current leader runs it on its next tick.
+        """
+        await redis_client.hset(SCHEDULER_NEXT_RUN_KEY, name, 0)
+
+    async def status(self, redis_client: aioredis.Redis) -> dict:
+        leader = await redis_client.get(SCHEDULER_LEADER_KEY)
+        next_runs = await redis_client.hgetall(SCHEDULER_NEXT_RUN_KEY)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for name in self.jobs:
+                pipe.lindex(history_key(name), 0)
+            last_runs = await pipe.execute()
+        jobs = []
+        for job, last_run in zip(self.jobs.values(), last_runs):
+            next_run = next_runs.get(job.name.encode("utf-8"))
+            jobs.append({
+                **job.describe(),
+                "next_run": datetime.datetime.fromtimestamp(float(next_run), STAT_TIMEZONE).isoformat()
+                if next_run is not None else None,
+                "last_run": json.loads(last_run) if last_run else None
+            })
+        return {
+            "leader": leader.decode("utf-8") if leader else None,
+            "jobs": jobs
+        }
+
+    @staticmethod
+    async def history(redis_client: aioredis.Redis, name: str, limit: int = SCHEDULER_HISTORY_LENGTH) -> list[dict]:
+        return [json.loads(entry) for entry in await redis_client.lrange(history_key(name), 0, limit - 1)]
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self._elect()
+                if self.is_leader:
+                    await self._run_due_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(SCHEDULER_TICK_INTERVAL)
+
+    async def _elect(self) -> None:
+        ttl_ms = SCHEDULER_LEADER_TTL * 1000
+        if self.is_leader:
+            renewed = await self._redis_client.eval(_RENEW_LEADER_SCRIPT, 1, SCHEDULER_LEADER_KEY, self.instance_id,
+                                                    ttl_ms)
+            if not renewed:
+                self.is_leader = False
+                logger.warning("Lost scheduler leadership")
+        elif await self._redis_client.set(SCHEDULER_LEADER_KEY, self.instance_id, nx=True, px=ttl_ms):
+            self.is_leader = True
+            logger.info(f"Became scheduler leader as {self.instance_id}")
+
+    async def _run_due_jobs(self) -> None:
+        now = time.time()
+        next_runs = await self._redis_client.hgetall(SCHEDULER_NEXT_RUN_KEY)
+        for job in self.jobs.values():
+            running = self._running.get(job.name)
+            if running is not None and not running.done():
+                continue
+            next_run = next_runs.get(job.name.encode("utf-8"))
+            if next_run is None:
+                # First time this job is seen by the cluster
+                next_run = now if job.run_at_startup else job.next_run_after(now)
+                await self._redis_client.hset(SCHEDULER_NEXT_RUN_KEY, job.name, next_run)
+            if float(next_run) > now:
+                continue
+            await self._redis_client.hset(SCHEDULER_NEXT_RUN_KEY, job.name, job.next_run_after(now))
+            self._running[job.name] = asyncio.create_task(self._execute(job))
+
+    async def _execute(self, job: ScheduledJob) -> None:
+        started_at = time.time()
+        status, error = "success", None
+        try:
+            await asyncio.wait_for(job.func(self._redis_client), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"Timed out after {job.timeout}s"
+        except asyncio.CancelledError:
+            status, error = "cancelled", "Scheduler stopped"
+            raise
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            duration = time.time() - started_at
+            if status == "success":
+                logger.info(f"Job {job.name} finished in {duration:.2f}s")
+            else:
+                logger.error(f"Job {job.name} {status} after {duration:.2f}s: {error}")
+            entry = json.dumps({
+                "started_at": datetime.datetime.fromtimestamp(started_at, STAT_TIMEZONE).isoformat(),
+                "duration": round(duration, 3),
+                "status": status,
+                "error": error,
+                "instance": self.instance_id
+            })
+            try:
+                async with self._redis_client.pipeline(transaction=False) as pipe:
+                    pipe.lpush(history_key(job.name), entry)
+                    pipe.ltrim(history_key(job.name), 0, SCHEDULER_HISTORY_LENGTH - 1)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to record run history of job {job.name}: {e}")
+
+
+scheduler = Scheduler()
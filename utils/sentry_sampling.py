@@ -0,0 +1,85 @@
+from utils.runtime_config import runtime_config
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+SENTRY_SAMPLE_RATES_REDIS_KEY = "config:sentry-sample-rates"
+REGION_PREFIXES = {"cn", "global", "fj"}
+
+# Route prefix (without the region segment) -> traces sample rate; the longest matching prefix wins.
+# Error events are not affected; only performance transactions are sampled.
+DEFAULT_SAMPLE_RATES = {
+    "default": 0.1,
+    # Hot redirects and polling endpoints
+    "/static/raw": 0.001,
+    "/static/zip": 0.01,
+    "/metadata": 0.01,
+    "/enka": 0.01,
+    "/client": 0.01,
+    "/patch/hutao": 0.02,
+    "/patch/hutao/events": 0.0,
+    "/metrics": 0.0,
+    # Admin routes
+    "/email": 1.0,
+    "/logging": 1.0,
+    "/scheduler": 1.0,
+    "/jobs": 1.0,
+    "/stats": 1.0,
+    "/mgnt": 1.0,
+    "/webhook": 1.0,
+}
+
+
+class RouteSampler:
+    """
+    Sentry traces_sampler with a sample rate per route prefix.
+
+    Rates start from `DEFAULT_SAMPLE_RATES` and are overridden by the `config:sentry-sample-rates` Redis hash
+    (prefix -> rate, plus `default`), which the runtime config watcher keeps in sync on every worker.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        self.default_rate = 1.0
+        self._prefixes: list[tuple[str, float]] = []
+        self.update(rates)
+
+    def update(self, rates: dict[str, float]) -> None:
+        rates = dict(rates)
+        self.default_rate = rates.pop("default", 1.0)
+        self._prefixes = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for_path(self, path: str) -> float:
+        segments = path.split("/", 2)
+        if len(segments) > 1 and segments[1] in REGION_PREFIXES:
+            path = "/" + (segments[2] if len(segments) > 2 else "")
+        for prefix, rate in self._prefixes:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def __call__(self, sampling_context: dict) -> float:
+        # Keep distributed traces whole
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        scope = sampling_context.get("asgi_scope")
+        if not scope or scope.get("type") != "http":
+            return self.default_rate
+        return self.rate_for_path(scope.get("path", ""))
+
+
+route_sampler = RouteSampler(DEFAULT_SAMPLE_RATES)
+
+
+def apply_sample_rates(overrides: dict[str, str]) -> None:
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for prefix, rate in overrides.items():
+        try:
+            rates[prefix] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            logger.warning(f"Ignoring invalid Sentry sample rate for {prefix}: {rate}")
+    route_sampler.update(rates)
+    logger.info(f"Applied Sentry sample rates with {len(overrides)} overrides")
+
+
+runtime_config.register(SENTRY_SAMPLE_RATES_REDIS_KEY, apply_sample_rates)
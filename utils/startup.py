@@ -0,0 +1,61 @@
+import os
+import uuid
+import socket
+import asyncio
+from redis import asyncio as aioredis
+from base_logger import get_logger
+
+
+logger = get_logger(__name__)
+STARTUP_LEADER_KEY = "startup:leader"
+# Token of the last leader whose refresh finished, for the workers that waited on it
+STARTUP_DONE_KEY = "startup:done"
+# Bounds how long a crashed leader blocks the others
+STARTUP_LEADER_TTL = 300  # seconds
+STARTUP_POLL_INTERVAL = 1  # seconds
+
+
+async def claim_startup_refresh(redis_client: aioredis.Redis) -> str | None:
+    """
+    Elect the single worker that refreshes upstream versions and seeds Redis at startup.
+
+    Workers starting while the leader refreshes wait for it to finish, so none serves from an unseeded Redis, and then
+    skip the refresh; the scheduler keeps the data fresh afterwards. The leader releases the lock with
+    `finish_startup_refresh`, so the next launch refreshes again. If the leader dies, its lock expires after
+    `STARTUP_LEADER_TTL` and a waiting worker takes over.
+
+    :param redis_client: Redis client
+
+    :return: the token to pass to `finish_startup_refresh` if this worker should run the startup refresh, else None
+    """
+    instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while True:
+        if await redis_client.set(STARTUP_LEADER_KEY, instance_id, nx=True, ex=STARTUP_LEADER_TTL):
+            logger.info(f"Running startup refresh as {instance_id}")
+            return instance_id
+        leader = await redis_client.get(STARTUP_LEADER_KEY)
+        if leader is None:
+            continue
+        logger.info(f"Waiting for the startup refresh of {leader.decode('utf-8')}")
+        while await redis_client.get(STARTUP_LEADER_KEY) == leader:
+            await asyncio.sleep(STARTUP_POLL_INTERVAL)
+        if await redis_client.get(STARTUP_DONE_KEY) == leader:
+            logger.info(f"Skipping startup refresh, already done by {leader.decode('utf-8')}")
+            return None
+        logger.warning(f"Startup refresh of {leader.decode('utf-8')} did not finish")
+
+
+async def finish_startup_refresh(redis_client: aioredis.Redis, instance_id: str, succeeded: bool) -> None:
+    """
+    Release the startup lock, letting the waiting workers serve if the refresh succeeded or take over if it failed.
+    """
+    async def release(pipe) -> None:
+        if await pipe.get(STARTUP_LEADER_KEY) != instance_id.encode("utf-8"):
+            # Expired and taken over by another worker
+            return
+        pipe.multi()
+        if succeeded:
+            pipe.set(STARTUP_DONE_KEY, instance_id, ex=STARTUP_LEADER_TTL)
+        pipe.delete(STARTUP_LEADER_KEY)
+
+    await redis_client.transaction(release, STARTUP_LEADER_KEY)
@@ -1,59 +1,120 @@
-import time
+import re
+import datetime
 from fastapi import Header, Request
 from redis import asyncio as aioredis
 from typing import Optional
+from utils.counters import counters
 from base_logger import get_logger
 
 logger = get_logger(__name__)
+STAT_TIMEZONE = datetime.timezone(datetime.timedelta(hours=8))
+
+
+def stat_date(days_ago: int = 0) -> datetime.date:
+    """
+    Current statistics day (UTC+8, matching the daily rollup schedule), optionally shifted back by `days_ago`.
+    """
+    return datetime.datetime.now(STAT_TIMEZONE).date() - datetime.timedelta(days=days_ago)
+
+
+def daily_stat_key(name: str, day: datetime.date | None = None) -> str:
+    return f"stat:{name}:{(day or stat_date()).strftime('%Y%m%d')}"
+
+
+DAU_REGIONS = ("cn", "global", "unknown")
+DAU_KEY_RETENTION_DAYS = 7
+# Only real client versions are counted, so arbitrary user agents cannot add keys or break the rollup
+CLIENT_USER_AGENT_PATTERN = re.compile(r"^Snap Hutao/(\d+(?:\.\d+){2,3})$")
+# The rollup shortens this once a day is persisted; a failed or skipped rollup still lets the keys expire
+CLIENT_VERSION_KEY_TTL = 3 * 24 * 60 * 60  # seconds
+
+
+def active_users_key(region: str, day: datetime.date | None = None) -> str:
+    """
+    Per-day set of device IDs seen in a region. A new key starts at midnight, so the rollup never races the writers.
+    """
+    return daily_stat_key(f"active_users:{region}", day)
+
+
+def client_version_key(version: str, day: datetime.date | None = None) -> str:
+    """
+    Per-day set of device IDs seen with a client version; rolled up into MySQL by the scheduler.
+    """
+    return daily_stat_key(f"user_agent:{version}", day)
+
+
+def client_version_index_key(day: datetime.date | None = None) -> str:
+    """
+    Per-day set of client versions seen, so the rollup never has to scan the keyspace.
+    """
+    return daily_stat_key("user_agent_versions", day)
+
+
+async def migrate_legacy_active_user_keys(redis_client: aioredis.Redis) -> None:
+    """
+    Fold the rolling `stat:active_users:{region}` sets used before per-day keys into today's keys.
+    """
+    for region in DAU_REGIONS:
+        legacy_key = f"stat:active_users:{region}"
+        if not await redis_client.exists(legacy_key):
+            continue
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.sunionstore(active_users_key(region), [active_users_key(region), legacy_key])
+            pipe.unlink(legacy_key)
+            merged, _ = await pipe.execute()
+        logger.info(f"Migrated legacy {legacy_key} into {active_users_key(region)}: {merged} devices")
+
+
+async def unlink_legacy_client_version_keys(redis_client: aioredis.Redis) -> int:
+    """
+    Remove the undated `stat:user_agent:{version}` sets written before per-day keys; they were never expired.
+    """
+    legacy_keys = [key async for key in redis_client.scan_iter(match="stat:user_agent:*", count=1000)
+                   if not key.rsplit(b":", 1)[-1].isdigit()]
+    if not legacy_keys:
+        return 0
+    unlinked = await redis_client.unlink(*legacy_keys)
+    logger.info(f"Unlinked {unlinked} legacy client version keys")
+    return unlinked
 
 
 async def record_device_id(request: Request, x_region: Optional[str] = Header(None),
                            x_hutao_device_id: Optional[str] = Header(None),
                            user_agent: Optional[str] = Header(None)) -> bool:
     redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    start_time = time.time()
 
     if not x_hutao_device_id:
-        logger.info(f"Device ID not found in headers, not recording device ID")
+        logger.debug("Device ID not found in headers, not recording device ID")
         return False
 
-    redis_key_name = {
-        "cn": "stat:active_users:cn",
-        "global": "stat:active_users:global"
-    }.get((x_region or "").lower(), "stat:active_users:unknown")
-
-    await redis_client.sadd(redis_key_name, x_hutao_device_id)
+    region = (x_region or "").lower()
+    redis_key_name = active_users_key(region if region in ("cn", "global") else "unknown")
 
-    if user_agent:
-        user_agent = user_agent.replace("Snap Hutao/", "")
-        user_agent = f"stat:user_agent:{user_agent}"
-        await redis_client.sadd(user_agent, x_hutao_device_id)
+    version_match = CLIENT_USER_AGENT_PATTERN.match(user_agent or "")
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.sadd(redis_key_name, x_hutao_device_id)
+        if version_match:
+            version = version_match.group(1)
+            pipe.sadd(client_version_key(version), x_hutao_device_id)
+            pipe.expire(client_version_key(version), CLIENT_VERSION_KEY_TTL)
+            pipe.sadd(client_version_index_key(), version)
+            pipe.expire(client_version_index_key(), CLIENT_VERSION_KEY_TTL)
+        await pipe.execute()
 
-        end_time = time.time()
-        execution_time = (end_time - start_time) * 1000
-        print(f"Execution time[1]: {execution_time} ms")
-        return True
+    return bool(version_match)
 
-    end_time = time.time()
-    execution_time = (end_time - start_time) * 1000
-    print(f"Execution time[2]: {execution_time} ms")
 
-    return False
-
-
-def record_email_requested(request: Request) -> bool:
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    redis_client.incr("stat:email_requested")
+# Async, also as dependencies, so the counter buffer is only touched on the event loop
+async def record_email_requested() -> bool:
+    counters.incr(daily_stat_key("email_requested"))
     return True
 
 
-def add_email_sent_count(request: Request) -> bool:
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    redis_client.incr("stat:email_sent")
+async def add_email_sent_count() -> bool:
+    counters.incr(daily_stat_key("email_sent"))
     return True
 
 
-def add_email_failed_count(request: Request) -> bool:
-    redis_client = aioredis.Redis.from_pool(request.app.state.redis)
-    redis_client.incr("stat:email_failed")
+async def add_email_failed_count() -> bool:
+    counters.incr(daily_stat_key("email_failed"))
     return True